@@ -0,0 +1,54 @@
+import re
+import json
+import time
+import uuid
+import random
+import asyncio
+from os import getenv
+
+from fastapi import FastAPI, Request
+
+# openai compatible chat completions endpoint with configurable latency
+# used in place of LLM_BASE_URL while benchmarking
+app = FastAPI()
+
+LATENCY_MS = float(getenv("FAKE_LLM_LATENCY_MS", "300"))
+JITTER_MS = float(getenv("FAKE_LLM_JITTER_MS", "50"))
+
+BULK_COLUMNS = re.compile(r"sampled values\):\s*(\{.*\})\s*Return", re.DOTALL)
+
+
+def fake_content(prompt):
+    # bulk prompt carries column key --> values json, answer every key
+    match = BULK_COLUMNS.search(prompt)
+    if match:
+        try:
+            columns = json.loads(match.group(1))
+        except ValueError:
+            columns = {}
+        return {key: {"unknown": [str(value) for value in values]} for key, values in columns.items()}
+    return {"unknown": []}
+
+
+@app.post("/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    await asyncio.sleep(max(0.0, LATENCY_MS + random.uniform(-JITTER_MS, JITTER_MS)) / 1000)
+    prompt = body["messages"][-1]["content"]
+    return {
+        "id": "chatcmpl-" + uuid.uuid4().hex,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": json.dumps(fake_content(prompt))},
+            "finish_reason": "stop",
+        }],
+        # rough token counts, enough for llm_tokens_total
+        "usage": {
+            "prompt_tokens": len(prompt) // 4,
+            "completion_tokens": 10,
+            "total_tokens": len(prompt) // 4 + 10,
+        },
+    }
@@ -0,0 +1,84 @@
+import sys
+import json
+import time
+import uuid
+import zlib
+import random
+import optparse
+
+import orjson
+
+from src.db.metadata_codec import encode_metadata, decode_metadata
+
+TYPES = [
+    "integer", "bigint", "text", "character varying", "boolean", "numeric",
+    "timestamp without time zone", "date", "jsonb", "uuid",
+]
+
+
+def synthetic_metadata(table_count, column_count, schema_count):
+    return [
+        {
+            "schema_name": "public" if table_index % schema_count == 0 else "schema_{}".format(table_index % schema_count),
+            "table_name": "table_{}".format(table_index),
+            "columns": [
+                {
+                    "column_id": uuid.uuid4().hex,
+                    "name": "column_{}".format(position),
+                    "type": random.choice(TYPES),
+                    "nullable": random.random() < 0.5,
+                    "position": position,
+                }
+                for position in range(1, column_count + 1)
+            ],
+            "structure_hash": uuid.uuid4().hex,
+        }
+        for table_index in range(table_count)
+    ]
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started_at)
+    return round(min(timings) * 1000, 3)
+
+
+def compare(table_count, column_count, schema_count, repeat):
+    items = synthetic_metadata(table_count, column_count, schema_count)
+    json_bytes = json.dumps(items).encode("utf-8")
+    blob = encode_metadata(items)
+    assert decode_metadata(blob) == items
+    return {
+        "tables": table_count,
+        "columns_per_table": column_count,
+        "json_bytes": len(json_bytes),
+        # rough stand-in for toast compression of the json column
+        "json_zlib_bytes": len(zlib.compress(json_bytes, 1)),
+        "compressed_bytes": len(blob),
+        "json_loads_ms": best_of(lambda: json.loads(json_bytes), repeat),
+        "orjson_loads_ms": best_of(lambda: orjson.loads(json_bytes), repeat),
+        "decode_ms": best_of(lambda: decode_metadata(blob), repeat),
+        "encode_ms": best_of(lambda: encode_metadata(items), repeat),
+    }
+
+
+parser = optparse.OptionParser(usage="python -m benchmarks.metadata_codec [options]")
+parser.add_option("--tables", default="100,1000,10000", help="comma separated table counts")
+parser.add_option("--columns", type="int", default=12, help="columns per table")
+parser.add_option("--schemas", type="int", default=4, help="schemas tables are spread over")
+parser.add_option("--repeat", type="int", default=5, help="timing repetitions, best one reported")
+parser.add_option("--seed", type="int", default=0)
+
+
+if __name__ == "__main__":
+    options, args = parser.parse_args()
+    random.seed(options.seed)
+    results = [
+        compare(int(table_count), options.columns, options.schemas, options.repeat)
+        for table_count in options.tables.split(",")
+    ]
+    json.dump({"results": results}, sys.stdout, indent=2)
+    print()
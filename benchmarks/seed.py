@@ -0,0 +1,111 @@
+import asyncio
+import subprocess
+
+import asyncpg
+
+# column kinds cycled through synthetic tables
+# mixes values local rules decide with values sent to llm
+COLUMN_KINDS = {
+    "email": ("TEXT", "'user' || g || '@example.com'"),
+    "phone": ("TEXT", "'+90 5' || lpad((g % 1000000000)::text, 9, '0')"),
+    "ip": ("TEXT", "'10.' || (g % 256) || '.' || ((g / 256) % 256) || '.1'"),
+    "amount": ("INTEGER", "g"),
+    "created": ("DATE", "date '2020-01-01' + (g % 1000)"),
+    "note": ("TEXT", "md5(g::text)"),
+}
+
+
+class ExistingPostgres:
+    """
+    :: Already running postgres, admin_url in asyncpg form
+    """
+
+    def __init__(self, admin_url):
+        self.admin_url = admin_url
+
+    async def start(self):
+        await wait_for_postgres(self.admin_url)
+
+    async def stop(self):
+        return
+
+
+class DockerPostgres:
+    """
+    :: Throwaway postgres container, removed on stop
+    """
+
+    def __init__(self, image="postgres:16", port=55432, password="bench"):
+        self.image = image
+        self.port = port
+        self.password = password
+        self.container_id = None
+        self.admin_url = "postgresql://postgres:{}@127.0.0.1:{}/postgres".format(password, port)
+
+    async def start(self):
+        self.container_id = subprocess.check_output([
+            "docker", "run", "-d", "--rm",
+            "-e", "POSTGRES_PASSWORD={}".format(self.password),
+            "-p", "{}:5432".format(self.port),
+            self.image
+        ], text=True).strip()
+        await wait_for_postgres(self.admin_url, timeout=60)
+
+    async def stop(self):
+        if self.container_id:
+            subprocess.run(["docker", "stop", self.container_id], check=False, capture_output=True)
+
+
+async def wait_for_postgres(admin_url, timeout=30):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while True:
+        try:
+            connection = await asyncpg.connect(admin_url)
+            await connection.close()
+            return
+        except (OSError, asyncpg.PostgresError):
+            if asyncio.get_running_loop().time() > deadline:
+                raise
+            await asyncio.sleep(0.5)
+
+
+def database_url(admin_url, database_name):
+    return admin_url.rsplit("/", 1)[0] + "/" + database_name
+
+
+async def recreate_database(admin_url, database_name):
+    connection = await asyncpg.connect(admin_url)
+    try:
+        await connection.execute('DROP DATABASE IF EXISTS "{}" WITH (FORCE)'.format(database_name))
+        await connection.execute('CREATE DATABASE "{}"'.format(database_name))
+    finally:
+        await connection.close()
+
+
+async def seed_target_database(admin_url, database_name, table_count, column_count, row_count):
+    """
+    :: Creates membership database with synthetic tables
+    :return: table names
+    """
+    await recreate_database(admin_url, database_name)
+    kinds = list(COLUMN_KINDS)
+    table_names = []
+    connection = await asyncpg.connect(database_url(admin_url, database_name))
+    try:
+        for table_index in range(table_count):
+            table_name = "table_{}".format(table_index)
+            columns = [
+                ("{}_{}".format(kinds[index % len(kinds)], index), *COLUMN_KINDS[kinds[index % len(kinds)]])
+                for index in range(column_count)
+            ]
+            await connection.execute("CREATE TABLE {} (id BIGINT PRIMARY KEY, {})".format(
+                table_name, ", ".join("{} {}".format(name, column_type) for name, column_type, _ in columns)
+            ))
+            await connection.execute("INSERT INTO {} SELECT g, {} FROM generate_series(1, {}) g".format(
+                table_name, ", ".join(expression for _, _, expression in columns), row_count
+            ))
+            table_names.append(table_name)
+        await connection.execute("ANALYZE")
+    finally:
+        await connection.close()
+    return table_names
@@ -9,5 +9,54 @@ local_config = {
     "worker_count": int(getenv("WORKER_COUNT", "1")),
     "llm_api_key": getenv("LLM_API_KEY"),
     "llm_base_url": getenv("LLM_BASE_URL", "https://generativelanguage.googleapis.com/v1beta/openai/"),
+    "llm_enabled": getenv("LLM_ENABLED", "true") in ["true", "True"],
     "llm_model": getenv("LLM_MODEL", "gemini-2.5-flash"),
+    "membership_db_pool_size": int(getenv("MEMBERSHIP_DB_POOL_SIZE", "2")),
+    "membership_db_max_overflow": int(getenv("MEMBERSHIP_DB_MAX_OVERFLOW", "3")),
+    "membership_db_max_engines": int(getenv("MEMBERSHIP_DB_MAX_ENGINES", "32")),
+    "membership_db_idle_timeout": int(getenv("MEMBERSHIP_DB_IDLE_TIMEOUT", "300")),
+    "auth_cache_size": int(getenv("AUTH_CACHE_SIZE", "10000")),
+    "auth_cache_ttl": int(getenv("AUTH_CACHE_TTL", "60")),
+    "classification_concurrency": int(getenv("CLASSIFICATION_CONCURRENCY", "4")),
+    "classification_columns_per_llm_request": int(getenv("CLASSIFICATION_COLUMNS_PER_LLM_REQUEST", "20")),
+    "classification_cache_size": int(getenv("CLASSIFICATION_CACHE_SIZE", "10000")),
+    "classification_cache_persistent_size": int(getenv("CLASSIFICATION_CACHE_PERSISTENT_SIZE", "1000000")),
+    "classification_cache_ttl": int(getenv("CLASSIFICATION_CACHE_TTL", "604800")),
+    "classification_cache_eviction_interval": int(getenv("CLASSIFICATION_CACHE_EVICTION_INTERVAL", "3600")),
+    "job_worker_count": int(getenv("JOB_WORKER_COUNT", "2")),
+    "job_membership_concurrency": int(getenv("JOB_MEMBERSHIP_CONCURRENCY", "1")),
+    "job_poll_interval": int(getenv("JOB_POLL_INTERVAL", "2")),
+    "jobs_background_default": getenv("JOBS_BACKGROUND_DEFAULT", "false") in ["true", "True"],
+    "llm_max_in_flight": int(getenv("LLM_MAX_IN_FLIGHT", "8")),
+    "llm_requests_per_minute": int(getenv("LLM_REQUESTS_PER_MINUTE", "60")),
+    "llm_burst": int(getenv("LLM_BURST", "10")),
+    "llm_max_retries": int(getenv("LLM_MAX_RETRIES", "5")),
+    "sampling_timeout_ms": int(getenv("SAMPLING_TIMEOUT_MS", "5000")),
+    "sampling_max_value_chars": int(getenv("SAMPLING_MAX_VALUE_CHARS", "256")),
+    "sampling_max_count": int(getenv("SAMPLING_MAX_COUNT", "100")),
+    "extract_schema_concurrency": int(getenv("EXTRACT_SCHEMA_CONCURRENCY", "4")),
+    "fleet_extract_concurrency": int(getenv("FLEET_EXTRACT_CONCURRENCY", "8")),
+    "metrics_enabled": getenv("METRICS_ENABLED", "true") in ["true", "True"],
+    "password_executor_kind": getenv("PASSWORD_EXECUTOR_KIND", "thread"),
+    "password_executor_workers": int(getenv("PASSWORD_EXECUTOR_WORKERS", "0")),
+    "password_executor_max_queue": int(getenv("PASSWORD_EXECUTOR_MAX_QUEUE", "64")),
+    "decryption_executor_kind": getenv("DECRYPTION_EXECUTOR_KIND", "thread"),
+    "decryption_executor_workers": int(getenv("DECRYPTION_EXECUTOR_WORKERS", "0")),
+    "decryption_executor_max_queue": int(getenv("DECRYPTION_EXECUTOR_MAX_QUEUE", "32")),
+    "encryption_key_paths": getenv("ENCRYPTION_KEY_PATHS", "./encryption_private_key.pem"),
+    "data_key_cache_size": int(getenv("DATA_KEY_CACHE_SIZE", "1000")),
+    "data_key_cache_ttl": int(getenv("DATA_KEY_CACHE_TTL", "300")),
+    "connection_url_cache_size": int(getenv("CONNECTION_URL_CACHE_SIZE", "1000")),
+    "metadata_response_cache_bytes": int(getenv("METADATA_RESPONSE_CACHE_BYTES", "67108864")),
+    "metadata_storage": getenv("METADATA_STORAGE", "json"),
+    "metadata_history_size": int(getenv("METADATA_HISTORY_SIZE", "10")),
+    "postgres_read_connection_string": getenv("POSTGRES_READ_CONNECTION_STRING"),
+    "system_db_pool_size": int(getenv("SYSTEM_DB_POOL_SIZE", "10")),
+    "system_db_max_overflow": int(getenv("SYSTEM_DB_MAX_OVERFLOW", "10")),
+    "system_db_pool_recycle": int(getenv("SYSTEM_DB_POOL_RECYCLE", "1800")),
+    "system_db_pool_timeout": int(getenv("SYSTEM_DB_POOL_TIMEOUT", "10")),
+    "system_db_pool_pre_ping": getenv("SYSTEM_DB_POOL_PRE_PING", "true") in ["true", "True"],
+    "system_db_connect_timeout": int(getenv("SYSTEM_DB_CONNECT_TIMEOUT", "10")),
+    "system_db_statement_timeout_ms": int(getenv("SYSTEM_DB_STATEMENT_TIMEOUT_MS", "60000")),
+    "system_db_statement_cache_size": int(getenv("SYSTEM_DB_STATEMENT_CACHE_SIZE", "256")),
 }
\ No newline at end of file
@@ -23,11 +23,15 @@ def config_settings(options):
 parser = optparse.OptionParser()
 parser.add_option("--config", default="local", help="which config to load")
 parser.add_option("--migrate", default=True, help="migrate models to db on startup")
-options, args = parser.parse_args()
 
-settings = config_settings(options)
+# spawned process pool and uvicorn worker children run this file as __mp_main__
+# before unpickling their task, they must not load config or build another app
+if __name__ != "__mp_main__":
+    options, args = parser.parse_args()
 
-app = create_fastapi_app(settings)
+    settings = config_settings(options)
+
+    app = create_fastapi_app(settings)
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host=settings["host"], port=settings["port"], workers=settings["worker_count"])
@@ -1,44 +1,160 @@
+import asyncio
 from contextlib import asynccontextmanager
-from concurrent.futures import ThreadPoolExecutor
-from cryptography.hazmat.primitives import serialization
 
 from fastapi import FastAPI
 from openai import AsyncClient
-from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlmodel import SQLModel
 from sqlmodel.ext.asyncio.session import AsyncSession
 
+from src.api.caching import ResponseCache
+from src.api.encryption import init_encryption_api
 from src.api.healthcheck import init_healthcheck_api
+from src.api.jobs import init_jobs_api
 from src.api.memberships import init_memberships_api
 from src.api.membership_databases import init_membership_database_api
+from src.classification.cache import ClassificationCache
+from src.classification.llm_gateway import LlmGateway
+from src.jobs.handlers import JOB_HANDLERS
+from src.jobs.queue import JobQueue
+from src.models.migrations import run_migrations
+from src.db.credentials import ConnectionUrlCache, encrypt_plaintext_passwords
+from src.db.membership_engines import MembershipEngineRegistry
+from src.db.metadata_store import backfill_metadata_etags, backfill_metadata_tables, convert_metadata_storage
+from src.db.sampling import ColumnSampler
+from src.db.system_engine import create_system_engine
+from src.metrics import init_metrics, register_app_metrics
+from src.security.auth_cache import AuthCache
+from src.security.encryption import CredentialCipher, DataKeyCache, load_private_keys, load_worker_private_keys
+from src.security.executors import BoundedExecutor
 from src.security.exceptions import init_exception_handler
 
 @asynccontextmanager
 async def lifespan(app:FastAPI):
     # init postgres client
-    pg_engine = create_async_engine(app.config["postgres_connection_string"])
+    pg_engine = create_system_engine(app.config["postgres_connection_string"], app.config)
     app.pg_session = sessionmaker(bind=pg_engine, class_=AsyncSession, expire_on_commit=False)
 
+    # read only endpoints and auth lookups go to replica when configured
+    # it may lag behind primary, callers fall back to primary on missing rows
+    pg_read_engine = None
+    app.pg_read_session = app.pg_session
+    if app.config["postgres_read_connection_string"]:
+        pg_read_engine = create_system_engine(app.config["postgres_read_connection_string"], app.config)
+        app.pg_read_session = sessionmaker(bind=pg_read_engine, class_=AsyncSession, expire_on_commit=False)
+
     # run migrations if option --migrate=true given
     if app.config["run_migrations"]:
         from src.models.memberships import MembershipModel
         from src.models.roles import RoleModel
         from src.models.membership_databases import MembershipDbModel
-        from src.models.database_metadata import DatabaseMetadataModel
+        from src.models.database_metadata import (
+            DatabaseMetadataModel, MetadataTableModel, MetadataColumnModel, MetadataVersionModel
+        )
+        from src.models.column_classifications import ColumnClassificationModel
+        from src.models.classification_cache import ClassificationCacheModel
+        from src.models.jobs import JobModel
         async with pg_engine.begin() as connection:
             await connection.run_sync(SQLModel.metadata.create_all)
-
-    # for cpu bound tasks to not block api
-    # not forget the use it with asyncio.wrap_future
-    # otherwise still blocks event loop
-    app.thread_pool = ThreadPoolExecutor()
+            await run_migrations(connection)
+        # existing metadata rewritten to configured storage
+        await convert_metadata_storage(app.pg_session, app.config["metadata_storage"] == "compressed")
+        # normalized table and column rows of metadata extracted before they existed
+        await backfill_metadata_tables(app.pg_session)
+        # etags of metadata extracted before they existed
+        await backfill_metadata_etags(app.pg_session)
 
     # required for safely transferring database credentials
-    with open("./encryption_private_key.pem", "rb") as f:
-        app.encryption_key = serialization.load_pem_private_key(f.read(), password=None)
+    # first key is current one, others kept to decrypt during rotation
+    key_paths = [path.strip() for path in app.config["encryption_key_paths"].split(",") if path.strip()]
+    app.encryption_keys, app.encryption_key_id = load_private_keys(key_paths)
+    app.encryption_key = app.encryption_keys[app.encryption_key_id]
+
+    # membership database passwords encrypted at rest with key derived from app keys
+    app.credential_cipher = CredentialCipher(app.encryption_keys, app.encryption_key_id)
+    if app.config["run_migrations"]:
+        async with app.pg_session() as session:
+            await encrypt_plaintext_passwords(session, app.credential_cipher)
+
+    # pooled engines for membership databases
+    # reused across extract/classify requests
+    app.membership_engines = MembershipEngineRegistry(
+        ConnectionUrlCache(app.credential_cipher, max_size=app.config["connection_url_cache_size"]),
+        max_engines=app.config["membership_db_max_engines"],
+        pool_size=app.config["membership_db_pool_size"],
+        max_overflow=app.config["membership_db_max_overflow"],
+        idle_timeout=app.config["membership_db_idle_timeout"],
+    )
+
+    async def evict_idle_engines():
+        while True:
+            await asyncio.sleep(app.config["membership_db_idle_timeout"])
+            await app.membership_engines.evict_idle()
+
+    eviction_task = asyncio.create_task(evict_idle_engines())
+
+    # caps databases extracted at the same time across all fleet requests
+    app.fleet_extract_semaphore = asyncio.Semaphore(app.config["fleet_extract_concurrency"])
+
+    # serialized get_metadata bodies keyed by metadata id and etag
+    app.metadata_response_cache = ResponseCache(max_bytes=app.config["metadata_response_cache_bytes"])
 
-    app.ai_client = AsyncClient(api_key=app.config["llm_api_key"], base_url=app.config["llm_base_url"])
+    # bounded, null skipping column sampling for classification
+    app.column_sampler = ColumnSampler(
+        timeout_ms=app.config["sampling_timeout_ms"],
+        max_value_chars=app.config["sampling_max_value_chars"],
+    )
+
+    # cpu bound tasks run on separate executors per workload
+    # so a login burst does not queue credential decryption
+    app.password_executor = BoundedExecutor(
+        "password",
+        kind=app.config["password_executor_kind"],
+        workers=app.config["password_executor_workers"],
+        max_queue=app.config["password_executor_max_queue"],
+    )
+
+    # verified credentials and role permissions
+    app.auth_cache = AuthCache(max_size=app.config["auth_cache_size"], ttl=app.config["auth_cache_ttl"])
+
+    app.decryption_executor = BoundedExecutor(
+        "decryption",
+        kind=app.config["decryption_executor_kind"],
+        workers=app.config["decryption_executor_workers"],
+        max_queue=app.config["decryption_executor_max_queue"],
+        initializer=load_worker_private_keys,
+        initargs=(key_paths,),
+    )
+    # unwrapped envelope data keys reused by clients
+    app.data_key_cache = DataKeyCache(
+        max_size=app.config["data_key_cache_size"],
+        ttl=app.config["data_key_cache_ttl"],
+    )
+
+    # llm results keyed by model, prompt and sampled values
+    app.classification_cache = ClassificationCache(
+        app.pg_session,
+        max_entries=app.config["classification_cache_size"],
+        ttl=app.config["classification_cache_ttl"],
+        persistent_max_entries=app.config["classification_cache_persistent_size"],
+    )
+
+    async def evict_classification_cache():
+        while True:
+            await asyncio.sleep(app.config["classification_cache_eviction_interval"])
+            await app.classification_cache.evict_persistent()
+
+    cache_eviction_task = asyncio.create_task(evict_classification_cache())
+
+    # retries handled by gateway
+    app.ai_client = AsyncClient(api_key=app.config["llm_api_key"], base_url=app.config["llm_base_url"], max_retries=0)
+    app.llm_gateway = LlmGateway(
+        app.ai_client,
+        max_in_flight=app.config["llm_max_in_flight"],
+        requests_per_minute=app.config["llm_requests_per_minute"],
+        burst=app.config["llm_burst"],
+        max_retries=app.config["llm_max_retries"],
+    )
     app.classification_prompt = """
     You are a data classifier. Classify the following values into one of the predefined types:
         "email",
@@ -56,9 +172,49 @@ async def lifespan(app:FastAPI):
     
     Return a JSON object where keys are class names and values are arrays containing the items that belong to those classes. Only include classes that have at least one matching item.
     """
+    app.bulk_classification_prompt = """
+    You are a data classifier. For each column below classify its values into one of the predefined types:
+        "email",
+        "phone_number",
+        "address",
+        "ip_address",
+        "credit_card",
+        "tckn",
+        "ssn",
+        "date",
+        "unknown",
+
+    Columns (JSON object where keys are column keys and values are sampled values):
+    {}
+
+    Return a JSON object where keys are the given column keys and values are JSON objects where keys are class names and values are arrays containing the items that belong to those classes. Only include classes that have at least one matching item.
+    """
+
+    # background extract and classify jobs
+    app.job_queue = JobQueue(
+        app,
+        JOB_HANDLERS,
+        worker_count=app.config["job_worker_count"],
+        membership_concurrency=app.config["job_membership_concurrency"],
+        poll_interval=app.config["job_poll_interval"],
+    )
+    app.job_queue.start()
+
+    # scrape time values of pools, queues and caches
+    register_app_metrics(app)
 
     yield
 
+    await app.job_queue.stop()
+    eviction_task.cancel()
+    cache_eviction_task.cancel()
+    await app.membership_engines.dispose_all()
+    await pg_engine.dispose()
+    if pg_read_engine:
+        await pg_read_engine.dispose()
+    app.password_executor.shutdown()
+    app.decryption_executor.shutdown()
+
 
 def create_fastapi_app(settings):
     app = FastAPI(lifespan=lifespan)
@@ -66,8 +222,14 @@ def create_fastapi_app(settings):
 
     # init apis
     init_healthcheck_api(app)
+    init_encryption_api(app)
     init_memberships_api(app)
     init_membership_database_api(app)
+    init_jobs_api(app)
+
+    # request latency middleware and /metrics endpoint
+    if settings["metrics_enabled"]:
+        init_metrics(app)
 
     # init custom exception handler
     init_exception_handler(app)
@@ -0,0 +1,57 @@
+from collections import OrderedDict
+
+from fastapi import Response
+
+
+def quote_etag(etag, suffix=""):
+    return '"{}{}"'.format(etag, suffix)
+
+
+def etag_matches(request, quoted_etag):
+    """
+    :: If-None-Match check, weak comparison as conditional get allows
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return any(candidate.removeprefix("W/") == quoted_etag for candidate in candidates)
+
+
+def not_modified(quoted_etag):
+    return Response(status_code=304, headers={"ETag": quoted_etag})
+
+
+class ResponseCache:
+    """
+    :: Bounded in process cache of serialized response bodies
+    keys carry content version so entries never go stale,
+    old versions fall out by least recently used order
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._size = 0
+        # key --> body bytes
+        self._bodies = OrderedDict()
+
+    def get(self, key):
+        body = self._bodies.get(key)
+        if body is not None:
+            self._bodies.move_to_end(key)
+        return body
+
+    def set(self, key, body):
+        # one huge body should not flush whole cache
+        if len(body) > self.max_bytes // 4:
+            return
+        old = self._bodies.pop(key, None)
+        if old is not None:
+            self._size -= len(old)
+        self._bodies[key] = body
+        self._size += len(body)
+        while self._size > self.max_bytes:
+            _, evicted = self._bodies.popitem(last=False)
+            self._size -= len(evicted)
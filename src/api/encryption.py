@@ -0,0 +1,16 @@
+from fastapi import Request
+from cryptography.hazmat.primitives import serialization
+
+
+def init_encryption_api(app):
+    @app.get("/api/v1/encryption-key")
+    async def get_encryption_key(request: Request):
+        # public key and its id for envelope encryption of credentials
+        public_key = request.app.encryption_key.public_key()
+        return {
+            "key_id": request.app.encryption_key_id,
+            "public_key": public_key.public_bytes(
+                encoding=serialization.Encoding.PEM,
+                format=serialization.PublicFormat.SubjectPublicKeyInfo
+            ).decode("ascii"),
+        }
@@ -0,0 +1,96 @@
+import uuid
+
+from fastapi import Request, Depends
+from fastapi.responses import JSONResponse
+from pydantic import ValidationError
+from sqlmodel import select
+
+from src.classification.service import check_sample_count
+from src.models.jobs import JobModel, JobSubmitRequest, JOB_PARAMS
+from src.models.memberships import MembershipModel
+from src.security.auth import authenticate_and_authorize
+from src.security.exceptions import AppException
+
+
+async def get_membership_job(request, job_id, membership_id):
+    async with request.app.pg_session() as session:
+        job = (await session.exec(select(JobModel).where(
+            JobModel.id == job_id,
+            JobModel.membership_id == membership_id
+        ))).first()
+    if not job:
+        raise AppException(
+            error_message="Job not found",
+            error_code="exceptions.jobNotFound",
+            status_code=404
+        )
+    return job
+
+
+def job_payload(job):
+    return {
+        "job_id": job.id.hex,
+        "kind": job.kind,
+        "status": job.status,
+        "params": job.params,
+        "progress_done": job.progress_done,
+        "progress_total": job.progress_total,
+        "result": job.result,
+        "error": job.error,
+        "created_at": job.created_at.isoformat(),
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def init_jobs_api(app):
+    @app.post("/api/v1/jobs", status_code=202)
+    async def submit_job(
+            request: Request,
+            job_request: JobSubmitRequest,
+            current_membership: MembershipModel = Depends(authenticate_and_authorize)
+    ):
+        # unknown kinds are rejected by job queue
+        params = job_request.params
+        params_model = JOB_PARAMS.get(job_request.kind)
+        if params_model:
+            try:
+                params = params_model.model_validate(params).model_dump(mode="json")
+            except ValidationError as exc:
+                raise AppException(
+                    error_message="Invalid job params: {}".format("; ".join(
+                        "{} {}".format(".".join(str(part) for part in error["loc"]), error["msg"])
+                        for error in exc.errors()
+                    )),
+                    error_code="exceptions.invalidJobParams",
+                    status_code=422
+                )
+        if job_request.kind == "classify":
+            check_sample_count(request.app, params["count"])
+        # ownership of database or metadata is checked when job runs
+        job = await request.app.job_queue.submit(current_membership.id, job_request.kind, params)
+        return JSONResponse(status_code=202, content={"job_id": job.id.hex})
+
+    @app.get("/api/v1/jobs/{job_id}", status_code=200)
+    async def get_job(
+            request: Request,
+            job_id: uuid.UUID,
+            current_membership: MembershipModel = Depends(authenticate_and_authorize)
+    ):
+        job = await get_membership_job(request, job_id, current_membership.id)
+        return JSONResponse(status_code=200, content=job_payload(job))
+
+    @app.post("/api/v1/jobs/{job_id}/cancel", status_code=200)
+    async def cancel_job(
+            request: Request,
+            job_id: uuid.UUID,
+            current_membership: MembershipModel = Depends(authenticate_and_authorize)
+    ):
+        job = await get_membership_job(request, job_id, current_membership.id)
+        if not await request.app.job_queue.cancel(job):
+            raise AppException(
+                error_message="Job already finished",
+                error_code="exceptions.jobAlreadyFinished",
+                status_code=409
+            )
+        return JSONResponse(status_code=200, content={"job_id": job.id.hex, "status": "cancelled"})
@@ -1,22 +1,42 @@
 import uuid
-import json
-from datetime import datetime
 
-from fastapi import Request, Depends
+import orjson
+from fastapi import Request, Response, Depends, Query
 from fastapi.responses import JSONResponse
-from sqlalchemy.ext.asyncio import create_async_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import func, null, tuple_
 from sqlalchemy.sql import text
-from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select
 
 from src.models.memberships import MembershipModel
-from src.models.membership_databases import MembershipDbModel, EncryptedMembershipDatabase
-from src.models.database_metadata import DatabaseMetadataModel, MetadataListItem
-from src.models.response_schemas import LLM_RESPONSE_SCHEMA
+from src.models.membership_databases import MembershipDbModel, EncryptedMembershipDatabase, FleetExtractRequest
+from src.models.database_metadata import (
+    DatabaseMetadataModel, MetadataListItem, MetadataTableModel, MetadataColumnModel, ColumnSearchItem,
+    MetadataVersionModel, MetadataVersionItem
+)
+from src.models.column_classifications import ColumnClassificationModel, BulkClassifyRequest
+from src.classification.service import (
+    classify_column_values, save_column_results, bulk_classify, load_bulk_columns,
+    load_metadata_membership_db, check_sample_count
+)
+from src.db.catalog import qualified_name, table_key
+from src.db.metadata_codec import stored_items
+from src.db.metadata_store import table_shape
+from src.db.schema_diff import diff_table_informations, diff_summary, load_current_side, load_version_side
+from src.db.extraction import load_membership_db, extract_membership_database, extract_fleet
+from src.jobs.handlers import classify_job_params
 from src.security.auth import authenticate_and_authorize
-from src.security.encryption import decrypt_text
+from src.security.encryption import decrypt_credentials
 from src.security.exceptions import AppException
+from src.api.caching import quote_etag, etag_matches, not_modified
+from src.api.pagination import encode_cursor, decode_cursor, encode_sort_cursor, decode_sort_cursor
+from src.api.streaming import (
+    wants_ndjson, ndjson_response, metadata_ndjson_lines, extract_ndjson_lines, diff_ndjson_lines
+)
+
+def run_in_background(request, background):
+    # synchronous unless ?background=true or JOBS_BACKGROUND_DEFAULT turns it on for every call
+    return request.app.config["jobs_background_default"] if background is None else background
+
 
 def init_membership_database_api(app):
     @app.post("/api/v1/membership-dbs", status_code=201)
@@ -25,17 +45,24 @@ def init_membership_database_api(app):
             encrypted_payload: EncryptedMembershipDatabase,
             current_membership: MembershipModel = Depends(authenticate_and_authorize)
     ):
-        credentials = await decrypt_text(request.app.encryption_key, encrypted_payload.cipher, request.app.thread_pool)
+        credentials = await decrypt_credentials(
+            encrypted_payload, request.app.decryption_executor, request.app.data_key_cache
+        )
         credentials["membership_id"] = current_membership.id
 
-        # create model instance
+        # create model instance, password never stored plain
         membership_db = MembershipDbModel(**credentials)
+        membership_db.password = request.app.credential_cipher.encrypt(membership_db.password, membership_db.id.hex)
 
         # test connection before saving
-        membership_db_engine = create_async_engine(membership_db.create_connection_string())
-        membership_db_session = sessionmaker(bind=membership_db_engine, class_=AsyncSession, expire_on_commit=False)
-        async with membership_db_session() as test_session:
-            await test_session.execute(text('SELECT 1'))
+        try:
+            async with request.app.membership_engines.lease(membership_db) as membership_db_session:
+                async with membership_db_session() as test_session:
+                    await test_session.execute(text('SELECT 1'))
+        except Exception:
+            # do not keep engine of unreachable database in registry
+            await request.app.membership_engines.dispose(membership_db.id)
+            raise
         # test has passed
 
         # save to system database after test passed
@@ -49,130 +76,300 @@ def init_membership_database_api(app):
     async def extract_database(
             request: Request,
             db_id: uuid.UUID,
-            current_membership: MembershipModel = Depends(authenticate_and_authorize)
+            current_membership: MembershipModel = Depends(authenticate_and_authorize),
+            incremental: bool = True,
+            background: bool | None = None,
+            response_format: str | None = Query(default=None, alias="format")
     ):
-        async with request.app.pg_session() as session:
-            membership_db = (
-                await session.exec(select(MembershipDbModel).where(
-                    MembershipDbModel.id == db_id,
-                    MembershipDbModel.membership_id == current_membership.id
-                ))
-            ).first()
-            if not membership_db:
-                raise AppException(
-                    error_message="Membership database not found",
-                    error_code="exceptions.membershipDbNotFound",
-                    status_code=404
-                )
-        membership_db_engine = create_async_engine(membership_db.create_connection_string())
-        membership_db_session = sessionmaker(bind=membership_db_engine, class_=AsyncSession, expire_on_commit=False)
-        async with membership_db_session() as membership_session:
-            metadata = {"table_informations": [], "table_names": []}
-            tables_query = """
-                           SELECT table_name 
-                           FROM information_schema.tables 
-                           WHERE table_schema = 'public'
-                           ORDER BY table_name;
-                           """
-            tables = await membership_session.execute(text(tables_query))
-            for table in tables:
-                table_name = table[0]
-                metadata["table_names"].append(table_name)
-                columns = await membership_session.execute(text("""
-                    SELECT 
-                        column_name,
-                        data_type,
-                        is_nullable,
-                        ordinal_position
-                    FROM information_schema.columns
-                    WHERE table_schema = 'public'
-                      AND table_name = '{}'
-                    ORDER BY ordinal_position;
-                """.format(table_name)))
-                table_info = {
-                    "table_name": table_name,
-                    "columns": [],
-                }
-                for column in columns:
-                    column_id = uuid.uuid4().hex
-
-                    table_info["columns"].append({
-                        "column_id": column_id,
-                        "name": column[0],
-                        "type": column[1],
-                        "nullable": column[2] == "YES",
-                        "position": column[3]
-                    })
-                metadata["table_informations"].append(table_info)
-        async with request.app.pg_session() as session:
-            old_metadata = (await session.exec(select(DatabaseMetadataModel).where(DatabaseMetadataModel.db_id == membership_db.id))).first()
-            if old_metadata:
-                metadata_id = old_metadata.id.hex
-                old_metadata.metadata_items = metadata["table_informations"]
-                old_metadata.updated_at = datetime.utcnow()
-            else:
-                metadata_instance = DatabaseMetadataModel(
-                    metadata_items=metadata["table_informations"],
-                    db_id=membership_db.id
-                )
-                session.add(metadata_instance)
-                metadata_id = metadata_instance.id.hex
-            await session.commit()
-        payload = {
-            "metadata_id": metadata_id,
-            "table_names": metadata["table_names"],
-            "metadata": metadata["table_informations"],
-        }
+        membership_db = await load_membership_db(request.app, db_id, current_membership.id)
+        # heavy extraction can be scheduled and polled from jobs api
+        if run_in_background(request, background):
+            job = await request.app.job_queue.submit(
+                current_membership.id, "extract", {"db_id": db_id.hex, "incremental": incremental}
+            )
+            return JSONResponse(status_code=202, content={"job_id": job.id.hex})
+        payload = await extract_membership_database(request.app, membership_db, incremental=incremental)
+        if wants_ndjson(request, response_format):
+            return ndjson_response(extract_ndjson_lines(payload), status_code=201)
 
         return JSONResponse(status_code=201, content=payload)
 
+    @app.post("/api/v1/membership-dbs/extract", status_code=200)
+    async def extract_fleet_databases(
+            request: Request,
+            fleet_request: FleetExtractRequest,
+            current_membership: MembershipModel = Depends(authenticate_and_authorize),
+            background: bool | None = None
+    ):
+        # one extract job per database when scheduled
+        if run_in_background(request, background):
+            query = select(MembershipDbModel.id).where(MembershipDbModel.membership_id == current_membership.id)
+            if fleet_request.db_ids:
+                query = query.where(MembershipDbModel.id.in_(fleet_request.db_ids))
+            async with request.app.pg_session() as session:
+                db_ids = (await session.exec(query)).all()
+            jobs = {}
+            for db_id in db_ids:
+                job = await request.app.job_queue.submit(
+                    current_membership.id, "extract", {"db_id": db_id.hex, "incremental": fleet_request.incremental}
+                )
+                jobs[db_id.hex] = job.id.hex
+            return JSONResponse(status_code=202, content={"jobs": jobs})
+
+        results = await extract_fleet(
+            request.app, current_membership.id, db_ids=fleet_request.db_ids, incremental=fleet_request.incremental
+        )
+        return JSONResponse(status_code=200, content={"results": results})
+
     @app.get("/api/v1/membership-dbs/metadata", status_code=200)
     async def list_metadata(
             request: Request,
-            current_membership: MembershipModel = Depends(authenticate_and_authorize)
+            response: Response,
+            current_membership: MembershipModel = Depends(authenticate_and_authorize),
+            limit: int = Query(default=100, ge=1, le=1000),
+            cursor: str | None = None
     ):
-        query = select(DatabaseMetadataModel, MembershipDbModel).where(MembershipDbModel.membership_id == current_membership.id)
+        # only summary columns, metadata_items never loaded
+        query = select(
+            DatabaseMetadataModel.id,
+            MembershipDbModel.database_name,
+            DatabaseMetadataModel.created_at,
+            DatabaseMetadataModel.table_count
+        ).join(
+            MembershipDbModel, MembershipDbModel.id == DatabaseMetadataModel.db_id
+        ).where(
+            MembershipDbModel.membership_id == current_membership.id
+        ).order_by(
+            DatabaseMetadataModel.created_at.desc(), DatabaseMetadataModel.id.desc()
+        ).limit(limit + 1)
+        if cursor:
+            created_at, metadata_id = decode_cursor(cursor)
+            query = query.where(
+                tuple_(DatabaseMetadataModel.created_at, DatabaseMetadataModel.id) < tuple_(created_at, metadata_id)
+            )
+
+        async with request.app.pg_read_session() as session:
+            records = (await session.exec(query)).all()
+
+        # next page cursor sent in header to keep response body a list
+        if len(records) > limit:
+            records = records[:limit]
+            response.headers["X-Next-Cursor"] = encode_cursor(records[-1].created_at, records[-1].id)
+        return [
+            MetadataListItem(
+                metadata_id=metadata_id,
+                database_name=database_name,
+                created_at=created_at,
+                table_count=table_count or 0
+            )
+            for metadata_id, database_name, created_at, table_count in records
+        ]
+
+    @app.get("/api/v1/membership-dbs/columns", status_code=200)
+    async def search_columns(
+            request: Request,
+            response: Response,
+            current_membership: MembershipModel = Depends(authenticate_and_authorize),
+            q: str | None = Query(default=None, min_length=1, max_length=200),
+            match: str = Query(default="substring", pattern="^(substring|fuzzy)$"),
+            data_type: str | None = Query(default=None, alias="type"),
+            nullable: bool | None = None,
+            label: str | None = None,
+            db_id: uuid.UUID | None = None,
+            limit: int = Query(default=50, ge=1, le=500),
+            cursor: str | None = None
+    ):
+        # normalized columns of all extracted databases of membership
+        # name filters served by trigram index, labels by gin index of classifications
+        fuzzy = bool(q) and match == "fuzzy"
+        similarity = func.similarity(MetadataColumnModel.name, q) if fuzzy else null()
+        query = select(
+            MetadataColumnModel.id,
+            MetadataColumnModel.metadata_id,
+            MembershipDbModel.database_name,
+            MetadataTableModel.schema_name,
+            MetadataTableModel.table_name,
+            MetadataColumnModel.name,
+            MetadataColumnModel.type,
+            MetadataColumnModel.nullable,
+            ColumnClassificationModel.labels,
+            similarity.label("similarity")
+        ).join(
+            MetadataTableModel, MetadataTableModel.id == MetadataColumnModel.table_id
+        ).join(
+            DatabaseMetadataModel, DatabaseMetadataModel.id == MetadataColumnModel.metadata_id
+        ).join(
+            MembershipDbModel, MembershipDbModel.id == DatabaseMetadataModel.db_id
+        ).outerjoin(
+            ColumnClassificationModel, ColumnClassificationModel.column_id == MetadataColumnModel.id
+        ).where(
+            MembershipDbModel.membership_id == current_membership.id
+        ).limit(limit + 1)
+
+        if fuzzy:
+            # % is pg_trgm similarity operator, threshold pg_trgm.similarity_threshold
+            query = query.where(MetadataColumnModel.name.op("%")(q)).order_by(
+                similarity.desc(), MetadataColumnModel.id.desc()
+            )
+        else:
+            if q:
+                pattern = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                query = query.where(MetadataColumnModel.name.ilike("%" + pattern + "%", escape="\\"))
+            query = query.order_by(MetadataColumnModel.name, MetadataColumnModel.id)
+        if data_type:
+            query = query.where(MetadataColumnModel.type == data_type)
+        if nullable is not None:
+            query = query.where(MetadataColumnModel.nullable.is_(nullable))
+        if label:
+            query = query.where(ColumnClassificationModel.labels.contains([label]))
+        if db_id:
+            query = query.where(DatabaseMetadataModel.db_id == db_id)
+        if cursor:
+            sort_value, column_id = decode_sort_cursor(cursor, (int, float) if fuzzy else str)
+            if fuzzy:
+                query = query.where(tuple_(similarity, MetadataColumnModel.id) < tuple_(sort_value, column_id))
+            else:
+                query = query.where(tuple_(MetadataColumnModel.name, MetadataColumnModel.id) > tuple_(sort_value, column_id))
 
         async with request.app.pg_session() as session:
-            result = await session.exec(query)
-            records = result.all()
-            response = []
-            for r, membership_db  in records:
-                table_count = len(r.metadata_items) if r.metadata_items else 0
-                # You can fetch database_name from membership database table if needed
-                response.append(
-                    MetadataListItem(
-                        metadata_id=r.id,
-                        database_name=membership_db.database_name,
-                        created_at=r.created_at,
-                        table_count=table_count
-                    )
-                )
-            return response
+            records = (await session.exec(query)).all()
+
+        items = [
+            ColumnSearchItem(
+                column_id=column_id,
+                metadata_id=metadata_id,
+                database_name=database_name,
+                schema_name=schema_name,
+                table_name=table_name,
+                name=name,
+                type=column_type,
+                nullable=column_nullable,
+                labels=labels,
+                similarity=score
+            )
+            for (
+                column_id, metadata_id, database_name, schema_name, table_name,
+                name, column_type, column_nullable, labels, score
+            ) in records[:limit]
+        ]
+        if len(records) > limit:
+            last = items[-1]
+            response.headers["X-Next-Cursor"] = encode_sort_cursor(
+                last.similarity if fuzzy else last.name, last.column_id
+            )
+        return items
+
     @app.get("/api/v1/membership-dbs/metadata/{metadata_id}", status_code=200)
     async def get_metadata(
             request: Request,
             metadata_id: uuid.UUID,
-            current_membership: MembershipModel = Depends(authenticate_and_authorize)
+            current_membership: MembershipModel = Depends(authenticate_and_authorize),
+            response_format: str | None = Query(default=None, alias="format")
     ):
-        query = select(DatabaseMetadataModel, MembershipDbModel).where(DatabaseMetadataModel.id == metadata_id, MembershipDbModel.membership_id == current_membership.id)
+        # version lookup by primary key, metadata_items not loaded
+        query = select(DatabaseMetadataModel.table_count, DatabaseMetadataModel.etag).join(
+            MembershipDbModel, MembershipDbModel.id == DatabaseMetadataModel.db_id
+        ).where(DatabaseMetadataModel.id == metadata_id, MembershipDbModel.membership_id == current_membership.id)
+        pg_session = request.app.pg_read_session
+        async with pg_session() as session:
+            versions = (await session.exec(query)).all()
+        # replica may not have a just extracted metadata yet, rest of request reads where it was found
+        if not versions and pg_session is not request.app.pg_session:
+            pg_session = request.app.pg_session
+            async with pg_session() as session:
+                versions = (await session.exec(query)).all()
+        if not versions:
+            raise AppException(
+                error_message="No metadata found",
+                status_code=404,
+                error_code="exceptions.metadataNotFound",
+            )
+        table_count, etag = versions[0]
+
+        # streamed one table per line without loading metadata_items
+        if wants_ndjson(request, response_format):
+            quoted_etag = quote_etag(etag, "-ndjson") if etag else None
+            if quoted_etag and etag_matches(request, quoted_etag):
+                return not_modified(quoted_etag)
+            header = {"metadata_id": metadata_id.hex, "table_count": table_count or 0}
+            response = ndjson_response(metadata_ndjson_lines(pg_session, metadata_id, header))
+            if quoted_etag:
+                response.headers["ETag"] = quoted_etag
+            return response
+
+        quoted_etag = quote_etag(etag) if etag else None
+        if quoted_etag and etag_matches(request, quoted_etag):
+            return not_modified(quoted_etag)
+
+        # serialized body reused until next extraction changes etag
+        body = request.app.metadata_response_cache.get((metadata_id, etag)) if etag else None
+        if body is None:
+            async with pg_session() as session:
+                stored = (await session.exec(
+                    select(DatabaseMetadataModel.metadata_items, DatabaseMetadataModel.metadata_blob)
+                    .where(DatabaseMetadataModel.id == metadata_id)
+                )).first()
+            metadata_items = stored_items(*stored) if stored else []
+            body = orjson.dumps({
+                "table_names": [qualified_name(*table_key(item)) for item in metadata_items],
+                # same table shape as ndjson lines
+                "metadata": [table_shape(item) for item in metadata_items],
+            })
+            if etag:
+                request.app.metadata_response_cache.set((metadata_id, etag), body)
 
+        headers = {"ETag": quoted_etag} if quoted_etag else None
+        return Response(content=body, status_code=200, media_type="application/json", headers=headers)
+
+    @app.get("/api/v1/membership-dbs/metadata/{metadata_id}/versions", status_code=200)
+    async def list_metadata_versions(
+            request: Request,
+            metadata_id: uuid.UUID,
+            current_membership: MembershipModel = Depends(authenticate_and_authorize)
+    ):
         async with request.app.pg_session() as session:
-            metadata = await session.exec(query)
-            metadata = metadata.first()
-            if not metadata:
-                raise AppException(
-                    error_message="No metadata found",
-                    status_code=404,
-                    error_code="exceptions.metadataNotFound",
+            # ownership check
+            await load_current_side(session, metadata_id, current_membership.id)
+            records = (await session.exec(
+                select(
+                    MetadataVersionModel.id, MetadataVersionModel.extracted_at,
+                    MetadataVersionModel.table_count, MetadataVersionModel.etag
+                ).where(MetadataVersionModel.metadata_id == metadata_id).order_by(
+                    MetadataVersionModel.extracted_at.desc(), MetadataVersionModel.id.desc()
                 )
-            metadata_instance, membership_db = metadata[0], metadata[1]
-            payload = {
-                "table_names": [item["table_name"]for item in metadata_instance.metadata_items],
-                "metadata": metadata_instance.metadata_items,
-            }
+            )).all()
+        return [
+            MetadataVersionItem(version_id=version_id, extracted_at=extracted_at, table_count=table_count or 0, etag=etag)
+            for version_id, extracted_at, table_count, etag in records
+        ]
+
+    @app.get("/api/v1/membership-dbs/metadata/{metadata_id}/diff", status_code=200)
+    async def diff_metadata(
+            request: Request,
+            metadata_id: uuid.UUID,
+            current_membership: MembershipModel = Depends(authenticate_and_authorize),
+            against: uuid.UUID | None = None,
+            version_id: uuid.UUID | None = None,
+            response_format: str | None = Query(default=None, alias="format")
+    ):
+        # target is current content of metadata_id, base is metadata given with against
+        # or a saved version of metadata_id, latest one by default
+        async with request.app.pg_session() as session:
+            target, target_etag, load_target = await load_current_side(session, metadata_id, current_membership.id)
+            if against:
+                base, base_etag, load_base = await load_current_side(session, against, current_membership.id)
+            else:
+                base, base_etag, load_base = await load_version_side(session, metadata_id, version_id)
+            # same content hash, nothing to decode
+            if base_etag and base_etag == target_etag:
+                diff = diff_table_informations([], [])
+            else:
+                diff = diff_table_informations(await load_base(), await load_target())
 
-            return JSONResponse(status_code=200, content=payload)
+        header = {"base": base, "target": target, "summary": diff_summary(diff)}
+        if wants_ndjson(request, response_format):
+            return ndjson_response(diff_ndjson_lines(header, diff))
+        return Response(content=orjson.dumps({**header, **diff}), status_code=200, media_type="application/json")
 
     @app.delete("/api/v1/membership-dbs/metadata/{metadata_id}", status_code=204)
     async def delete_metadata(
@@ -180,7 +377,9 @@ def init_membership_database_api(app):
             metadata_id: uuid.UUID,
             current_membership: MembershipModel = Depends(authenticate_and_authorize)
     ):
-        query = select(DatabaseMetadataModel, MembershipDbModel).where(DatabaseMetadataModel.id == metadata_id, MembershipDbModel.membership_id == current_membership.id)
+        query = select(DatabaseMetadataModel, MembershipDbModel).join(
+            MembershipDbModel, MembershipDbModel.id == DatabaseMetadataModel.db_id
+        ).where(DatabaseMetadataModel.id == metadata_id, MembershipDbModel.membership_id == current_membership.id)
 
         async with request.app.pg_session() as session:
             metadata = await session.exec(query)
@@ -203,46 +402,81 @@ def init_membership_database_api(app):
             metadata_id: uuid.UUID,
             column_id: uuid.UUID,
             current_membership: MembershipModel = Depends(authenticate_and_authorize),
-            count: int = 10
+            count: int = Query(default=10, ge=1, le=app.config["sampling_max_count"]),
+            background: bool | None = None
     ):
-        query = select(DatabaseMetadataModel, MembershipDbModel).where(
-            DatabaseMetadataModel.id == metadata_id, MembershipDbModel.membership_id == current_membership.id
+        if run_in_background(request, background):
+            classify_request = BulkClassifyRequest(column_ids=[column_id], count=count)
+            await load_metadata_membership_db(request.app, metadata_id, current_membership.id)
+            job = await request.app.job_queue.submit(
+                current_membership.id, "classify", classify_job_params(metadata_id, classify_request)
+            )
+            return JSONResponse(status_code=202, content={"job_id": job.id.hex})
+
+        # single column fetched by primary key
+        query = select(MetadataColumnModel, MetadataTableModel, MembershipDbModel).join(
+            MetadataTableModel, MetadataTableModel.id == MetadataColumnModel.table_id
+        ).join(
+            DatabaseMetadataModel, DatabaseMetadataModel.id == MetadataColumnModel.metadata_id
+        ).join(
+            MembershipDbModel, MembershipDbModel.id == DatabaseMetadataModel.db_id
+        ).where(
+            MetadataColumnModel.id == column_id,
+            MetadataColumnModel.metadata_id == metadata_id,
+            MembershipDbModel.membership_id == current_membership.id
         )
 
         async with request.app.pg_session() as session:
-            metadata = await session.exec(query)
-            metadata = metadata.first()
-            if not metadata:
+            column = (await session.exec(query)).first()
+            if not column:
                 raise AppException(
                     error_message="No metadata found",
                     status_code=404,
                     error_code="exceptions.metadataNotFound",
                 )
-            metadata_instance, membership_db = metadata[0], metadata[1]
-            table_details = next(iter([metadata for metadata in metadata_instance.metadata_items for y in metadata["columns"] if y["column_id"] == column_id.hex]), None)
-            column_details = next(iter([column_detail for column_detail in table_details["columns"] if column_detail["column_id"] == column_id.hex]), None)
-            if not table_details or not column_details:
-                raise AppException(
-                    error_message="No metadata found",
-                    status_code=404,
-                    error_code="exceptions.metadataNotFound",
+            column_details, table_details, membership_db = column
+        async with request.app.membership_engines.lease(membership_db) as membership_db_session:
+            async with membership_db_session() as membership_session:
+                samples = await request.app.column_sampler.sample(
+                    membership_session, table_details.table_name, [column_details.name], count,
+                    schema=table_details.schema_name
                 )
-        membership_db_engine = create_async_engine(membership_db.create_connection_string())
-        membership_db_session = sessionmaker(bind=membership_db_engine, class_=AsyncSession, expire_on_commit=False)
-        async with membership_db_session() as membership_session:
-            data = await membership_session.execute(text(
-                """
-                SELECT id, {} FROM {} LIMIT {}
-                """.format(column_details["name"], table_details["table_name"], count)))
-            payload = [row[1] for row in data]
-        prompt = app.classification_prompt.format(payload)
-
-        response = await request.app.ai_client.chat.completions.create(
-            model=request.app.config["llm_model"],
-            messages=[{"role": "user", "content": prompt}],
-            response_format={"type": "json_schema", "json_schema": LLM_RESPONSE_SCHEMA},
-            temperature=0
-        )
-        content = json.loads(response.choices[0].message.content)
+        content = await classify_column_values(request.app, samples[column_details.name])
+
+        async with request.app.pg_session() as session:
+            await save_column_results(session, metadata_id, results={column_id: content})
+            await session.commit()
 
         return JSONResponse(status_code=200, content=content)
+
+    @app.post("/api/v1/membership-dbs/{metadata_id}/classify", status_code=200)
+    async def bulk_classify_metadata(
+            request: Request,
+            metadata_id: uuid.UUID,
+            classify_request: BulkClassifyRequest,
+            current_membership: MembershipModel = Depends(authenticate_and_authorize),
+            background: bool | None = None
+    ):
+        check_sample_count(request.app, classify_request.count)
+        # heavy classification can be scheduled and polled from jobs api
+        if run_in_background(request, background):
+            await load_metadata_membership_db(request.app, metadata_id, current_membership.id)
+            job = await request.app.job_queue.submit(
+                current_membership.id, "classify", classify_job_params(metadata_id, classify_request)
+            )
+            return JSONResponse(status_code=202, content={"job_id": job.id.hex})
+
+        membership_db, columns = await load_bulk_columns(
+            request.app,
+            metadata_id,
+            current_membership.id,
+            table_names=classify_request.table_names,
+            column_ids=classify_request.column_ids,
+            only_unclassified=classify_request.only_unclassified
+        )
+        async with request.app.membership_engines.lease(membership_db) as membership_db_session:
+            results, errors = await bulk_classify(
+                request.app, membership_db_session, metadata_id, columns, classify_request.count
+            )
+
+        return JSONResponse(status_code=200, content={"results": results, "errors": errors})
@@ -11,7 +11,7 @@ def init_memberships_api(app):
             current_membership: MembershipModel = Depends(authenticate_and_authorize)
     ):
         # safe store password
-        hashed_password = await hash_password(membership.password, request.app.thread_pool)
+        hashed_password = await hash_password(membership.password, request.app.password_executor)
         membership.password = hashed_password
         async with request.app.pg_session() as session:
             session.add(membership)
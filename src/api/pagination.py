@@ -0,0 +1,54 @@
+import uuid
+import base64
+from datetime import datetime
+
+import orjson
+
+from src.security.exceptions import AppException
+
+
+def encode_cursor(created_at, record_id):
+    """
+    :: Opaque keyset cursor of last returned record
+    """
+    raw = "{}|{}".format(created_at.isoformat(), record_id.hex)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def invalid_cursor():
+    return AppException(
+        error_message="Invalid cursor",
+        error_code="exceptions.invalidCursor",
+        status_code=400
+    )
+
+
+def decode_cursor(cursor):
+    try:
+        created_at, record_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        return datetime.fromisoformat(created_at), uuid.UUID(record_id)
+    except ValueError:
+        raise invalid_cursor()
+
+
+def encode_sort_cursor(sort_value, record_id):
+    """
+    :: Keyset cursor over json serializable sort value and record id
+    """
+    return base64.urlsafe_b64encode(orjson.dumps([sort_value, record_id.hex])).decode("ascii")
+
+
+def decode_sort_cursor(cursor, sort_type):
+    """
+    :param sort_type: type or tuple of types the sort value must have,
+    a cursor of another sort order fails instead of reaching the query
+    """
+    try:
+        sort_value, record_id = orjson.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        record_id = uuid.UUID(record_id)
+    except (ValueError, TypeError):
+        raise invalid_cursor()
+    # bool is an int, never a sort value
+    if isinstance(sort_value, bool) or not isinstance(sort_value, sort_type):
+        raise invalid_cursor()
+    return sort_value, record_id
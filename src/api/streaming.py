@@ -0,0 +1,65 @@
+import orjson
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+
+from src.db.metadata_codec import stored_items
+from src.db.metadata_store import iter_metadata_tables, has_metadata_tables, table_shape
+from src.db.schema_diff import diff_lines
+from src.models.database_metadata import DatabaseMetadataModel
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def wants_ndjson(request, response_format=None):
+    """
+    :: NDJSON selected by ?format=ndjson or Accept header
+    """
+    if response_format:
+        return response_format == "ndjson"
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def ndjson_line(item):
+    return orjson.dumps(item) + b"\n"
+
+
+def ndjson_response(lines, status_code=200):
+    """
+    :param lines: async iterator of encoded ndjson lines
+    """
+    return StreamingResponse(lines, status_code=status_code, media_type=NDJSON_MEDIA_TYPE)
+
+
+async def metadata_ndjson_lines(pg_session, metadata_id, header):
+    """
+    :: Header line then one line per table read incrementally from system database
+    :param pg_session: session maker of database the header was read from
+    """
+    yield ndjson_line(header)
+    async with pg_session() as session:
+        if await has_metadata_tables(session, metadata_id):
+            async for table_info in iter_metadata_tables(session, metadata_id):
+                yield ndjson_line(table_info)
+            return
+        stored = (await session.execute(
+            select(DatabaseMetadataModel.metadata_items, DatabaseMetadataModel.metadata_blob)
+            .where(DatabaseMetadataModel.id == metadata_id)
+        )).first()
+    for table_info in stored_items(*stored) if stored else []:
+        yield ndjson_line(table_shape(table_info))
+
+
+async def extract_ndjson_lines(payload):
+    yield ndjson_line({
+        "metadata_id": payload["metadata_id"],
+        "changed_tables": payload["changed_tables"],
+        "removed_tables": payload["removed_tables"],
+    })
+    for table_info in payload["metadata"]:
+        yield ndjson_line(table_info)
+
+
+async def diff_ndjson_lines(header, diff):
+    yield ndjson_line(header)
+    for item in diff_lines(diff):
+        yield ndjson_line(item)
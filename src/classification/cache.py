@@ -0,0 +1,119 @@
+import json
+import time
+from hashlib import sha256
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+
+from src.models.classification_cache import ClassificationCacheModel
+
+
+class ClassificationCache:
+    """
+    :: Content addressed cache of llm classification results
+    in process lru tier in front of persistent tier in system postgres
+    llm calls use temperature 0 and fixed prompts so same
+    values with same model and prompt give same answer
+    """
+
+    def __init__(self, pg_session, max_entries=10000, ttl=7 * 24 * 3600, persistent_max_entries=1000000):
+        self.pg_session = pg_session
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.persistent_max_entries = persistent_max_entries
+        # key --> (result, expires at monotonic time)
+        self._entries = OrderedDict()
+        self.stats = {"memory_hits": 0, "persistent_hits": 0, "misses": 0}
+
+    @staticmethod
+    def key(model, prompt_template, values):
+        # order of sampled values does not change classes
+        normalized = sorted(str(value).strip() for value in values)
+        return sha256(json.dumps([model, prompt_template, normalized]).encode("utf-8")).hexdigest()
+
+    def _get_memory(self, key):
+        entry = self._entries.get(key)
+        if not entry:
+            return None
+        result, expires_at = entry
+        if expires_at < time.monotonic():
+            self._entries.pop(key, None)
+            return None
+        self._entries.move_to_end(key)
+        return result
+
+    def _set_memory(self, key, result, ttl):
+        self._entries[key] = (result, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_many(self, keys):
+        """
+        :return: key --> cached result for found keys
+        """
+        found, missing = {}, []
+        for key in keys:
+            result = self._get_memory(key)
+            if result is None:
+                missing.append(key)
+            else:
+                found[key] = result
+                self.stats["memory_hits"] += 1
+        if missing:
+            # expires_at stored as naive utc like other timestamps
+            now = datetime.utcnow()
+            async with self.pg_session() as session:
+                rows = (await session.execute(
+                    select(ClassificationCacheModel.key, ClassificationCacheModel.result, ClassificationCacheModel.expires_at)
+                    .where(ClassificationCacheModel.key.in_(missing), ClassificationCacheModel.expires_at > now)
+                )).all()
+            for key, result, expires_at in rows:
+                found[key] = result
+                self._set_memory(key, result, max((expires_at - now).total_seconds(), 0))
+            self.stats["persistent_hits"] += len(rows)
+            self.stats["misses"] += len(missing) - len(rows)
+        return found
+
+    async def get(self, key):
+        return (await self.get_many([key])).get(key)
+
+    async def set_many(self, results):
+        """
+        :param results: key --> result
+        """
+        if not results:
+            return
+        for key, result in results.items():
+            self._set_memory(key, result, self.ttl)
+        expires_at = datetime.utcnow() + timedelta(seconds=self.ttl)
+        rows = [{"key": key, "result": result, "expires_at": expires_at} for key, result in results.items()]
+        statement = insert(ClassificationCacheModel).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=[ClassificationCacheModel.key],
+            set_={
+                "result": statement.excluded.result,
+                "expires_at": statement.excluded.expires_at,
+                "updated_at": func.now(),
+            }
+        )
+        async with self.pg_session() as session:
+            await session.execute(statement)
+            await session.commit()
+
+    async def set(self, key, result):
+        await self.set_many({key: result})
+
+    async def evict_persistent(self):
+        """
+        :: Deletes expired rows and oldest rows above persistent_max_entries
+        """
+        overflow = select(ClassificationCacheModel.key).order_by(
+            ClassificationCacheModel.updated_at.desc()
+        ).offset(self.persistent_max_entries)
+        async with self.pg_session() as session:
+            await session.execute(delete(ClassificationCacheModel).where(ClassificationCacheModel.expires_at <= datetime.utcnow()))
+            await session.execute(delete(ClassificationCacheModel).where(ClassificationCacheModel.key.in_(overflow)))
+            await session.commit()
@@ -0,0 +1,124 @@
+import json
+import time
+import random
+import asyncio
+from hashlib import sha256
+
+from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+
+from src.metrics import LLM_TOKENS, time_stage
+
+RETRYABLE_ERRORS = (APIConnectionError, APITimeoutError, InternalServerError, RateLimitError)
+
+
+class TokenBucket:
+    """
+    :: Request rate limiter, rate is tokens per second
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        # waiters queue on lock so tokens are handed out in order
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class LlmGateway:
+    """
+    :: Wraps llm client with in flight limit, rate limit,
+    single flight of identical requests and jittered retries
+    """
+
+    def __init__(self, ai_client, max_in_flight=8, requests_per_minute=60, burst=10,
+                 max_retries=5, retry_base_delay=1.0):
+        self.ai_client = ai_client
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self._bucket = TokenBucket(requests_per_minute / 60, burst) if requests_per_minute else None
+        # request key --> [upstream call task, waiter count] shared by identical concurrent requests
+        self._in_flight = {}
+        # upstream requests holding a semaphore slot
+        self._running = 0
+
+    @property
+    def in_flight(self):
+        return self._running
+
+    async def create_chat_completion(self, **kwargs):
+        """
+        :param kwargs: chat.completions.create arguments
+        :return: chat completion, identical concurrent requests share one call
+        """
+        key = sha256(json.dumps(kwargs, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        entry = self._in_flight.get(key)
+        if entry is None:
+            # upstream call runs in its own task so a cancelled caller
+            # does not cancel it for the other callers waiting on it
+            entry = [asyncio.create_task(self._create_with_retries(kwargs)), 0]
+            self._in_flight[key] = entry
+            entry[0].add_done_callback(lambda task: self._call_done(key, entry))
+        entry[1] += 1
+        try:
+            return await asyncio.shield(entry[0])
+        finally:
+            entry[1] -= 1
+            # every caller is gone, nobody needs the response
+            if entry[1] == 0 and not entry[0].done():
+                entry[0].cancel()
+
+    def _call_done(self, key, entry):
+        if self._in_flight.get(key) is entry:
+            self._in_flight.pop(key)
+        # waiters got the exception, mark it retrieved for the no waiter case
+        if not entry[0].cancelled():
+            entry[0].exception()
+
+    async def _create_with_retries(self, kwargs):
+        attempt = 0
+        while True:
+            if self._bucket:
+                await self._bucket.acquire()
+            try:
+                async with self._semaphore:
+                    self._running += 1
+                    try:
+                        with time_stage("llm_request"):
+                            response = await self.ai_client.chat.completions.create(**kwargs)
+                    finally:
+                        self._running -= 1
+                usage = getattr(response, "usage", None)
+                if usage:
+                    LLM_TOKENS.inc(usage.prompt_tokens or 0, kind="prompt")
+                    LLM_TOKENS.inc(usage.completion_tokens or 0, kind="completion")
+                return response
+            except RETRYABLE_ERRORS as exc:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                await asyncio.sleep(self._retry_delay(exc, attempt))
+
+    def _retry_delay(self, exc, attempt):
+        # provider hint wins over exponential backoff
+        response = getattr(exc, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return float(retry_after) + random.uniform(0, self.retry_base_delay)
+            except ValueError:
+                pass
+        # full jitter
+        return random.uniform(0, self.retry_base_delay * 2 ** (attempt - 1))
@@ -0,0 +1,144 @@
+import re
+import ipaddress
+from collections import Counter
+from datetime import date, datetime
+
+# local rules for values that do not need an llm
+# anything not matched here is left to the llm
+EMAIL_PATTERN = re.compile(r"^[A-Za-z0-9._%+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}$")
+CREDIT_CARD_PATTERN = re.compile(r"^\d(?:[ -]?\d){12,18}$")
+TCKN_PATTERN = re.compile(r"^[1-9]\d{10}$")
+SSN_PATTERN = re.compile(r"^(?!000|666|9\d\d)\d{3}-(?!00)\d{2}-(?!0000)\d{4}$")
+ISO_DATE_PATTERN = re.compile(
+    r"^\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}(?::?\d{2})?)?)?$"
+)
+
+# issuer prefix ranges and lengths of major card networks
+# (lowest prefix, highest prefix, card lengths)
+CARD_ISSUERS = [
+    ("4", "4", (13, 16, 19)),
+    ("51", "55", (16,)),
+    ("2221", "2720", (16,)),
+    ("34", "34", (15,)),
+    ("37", "37", (15,)),
+    ("6011", "6011", (16, 17, 18, 19)),
+    ("644", "649", (16, 17, 18, 19)),
+    ("65", "65", (16, 17, 18, 19)),
+    ("3528", "3589", (16, 17, 18, 19)),
+    ("300", "305", (14, 15, 16, 17, 18, 19)),
+    ("36", "36", (14, 15, 16, 17, 18, 19)),
+    ("38", "39", (16, 17, 18, 19)),
+    ("62", "62", (16, 17, 18, 19)),
+]
+
+# checksums random numbers pass by chance, one in ten for luhn and one in hundred for tckn
+# trusted only when most values of the column agree, otherwise the llm decides
+CHECKSUM_CLASSES = {"credit_card", "tckn"}
+CHECKSUM_AGREEMENT = 0.8
+
+
+def is_luhn_valid(digits):
+    total = 0
+    for index, digit in enumerate(reversed(digits)):
+        digit = int(digit)
+        if index % 2:
+            digit *= 2
+            if digit > 9:
+                digit -= 9
+        total += digit
+    return total % 10 == 0
+
+
+def has_card_issuer(digits):
+    return any(
+        len(digits) in lengths and low <= digits[:len(low)] <= high
+        for low, high, lengths in CARD_ISSUERS
+    )
+
+
+def is_tckn_valid(value):
+    digits = [int(digit) for digit in value]
+    if (sum(digits[0:9:2]) * 7 - sum(digits[1:8:2])) % 10 != digits[9]:
+        return False
+    return sum(digits[:10]) % 10 == digits[10]
+
+
+def is_ip_address(value):
+    if "." not in value and ":" not in value:
+        return False
+    try:
+        ipaddress.ip_address(value)
+    except ValueError:
+        return False
+    return True
+
+
+def is_iso_date(value):
+    if not ISO_DATE_PATTERN.match(value):
+        return False
+    try:
+        # rejects impossible days and months
+        date.fromisoformat(value[:10])
+    except ValueError:
+        return False
+    return True
+
+
+def classify_value(value):
+    """
+    :param value: sampled column value
+    :return: class name or None when value needs the llm
+    """
+    if isinstance(value, (date, datetime)):
+        return "date"
+    value = str(value).strip()
+    if not value:
+        return None
+    if "@" in value:
+        return "email" if EMAIL_PATTERN.match(value) else None
+    if SSN_PATTERN.match(value):
+        return "ssn"
+    if TCKN_PATTERN.match(value) and is_tckn_valid(value):
+        return "tckn"
+    if CREDIT_CARD_PATTERN.match(value):
+        digits = value.replace(" ", "").replace("-", "")
+        if has_card_issuer(digits) and is_luhn_valid(digits):
+            return "credit_card"
+    if is_ip_address(value):
+        return "ip_address"
+    if is_iso_date(value):
+        return "date"
+    return None
+
+
+def classify_values(values):
+    """
+    :: Classifies obvious values in process
+    :param values: sampled values of one column
+    :return: grouped result in llm response shape and values left for the llm
+    """
+    decided = [(value, classify_value(value)) for value in values if value is not None]
+    checksum_counts = Counter(class_name for _, class_name in decided if class_name in CHECKSUM_CLASSES)
+    trusted = {
+        class_name for class_name, count in checksum_counts.items()
+        if count >= CHECKSUM_AGREEMENT * len(decided)
+    }
+
+    grouped, undecided = {}, []
+    for value, class_name in decided:
+        if class_name and (class_name not in CHECKSUM_CLASSES or class_name in trusted):
+            grouped.setdefault(class_name, []).append(str(value))
+        else:
+            undecided.append(value)
+    return grouped, undecided
+
+
+def merge_classifications(*results):
+    """
+    :: Merges grouped classification results keeping class order
+    """
+    merged = {}
+    for result in results:
+        for class_name, items in result.items():
+            merged.setdefault(class_name, []).extend(items)
+    return merged
@@ -0,0 +1,265 @@
+import json
+import asyncio
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import select
+
+from src.classification.rules import classify_values, merge_classifications
+from src.models.column_classifications import ColumnClassificationModel
+from src.models.database_metadata import DatabaseMetadataModel, MetadataTableModel, MetadataColumnModel
+from src.models.membership_databases import MembershipDbModel
+from src.models.response_schemas import LLM_RESPONSE_SCHEMA, BULK_LLM_RESPONSE_SCHEMA
+from src.security.exceptions import AppException
+
+
+async def classify_column_values(app, values):
+    """
+    :: Classifies values of single column, local rules first then llm
+    :return: grouped result in LLM_RESPONSE_SCHEMA shape
+    """
+    content, undecided = classify_values(values)
+    if undecided and app.config["llm_enabled"]:
+        cache_key = app.classification_cache.key(app.config["llm_model"], app.classification_prompt, undecided)
+        llm_content = await app.classification_cache.get(cache_key)
+        if llm_content is None:
+            prompt = app.classification_prompt.format(undecided)
+
+            response = await app.llm_gateway.create_chat_completion(
+                model=app.config["llm_model"],
+                messages=[{"role": "user", "content": prompt}],
+                response_format={"type": "json_schema", "json_schema": LLM_RESPONSE_SCHEMA},
+                temperature=0
+            )
+            llm_content = json.loads(response.choices[0].message.content)
+            await app.classification_cache.set(cache_key, llm_content)
+        content = merge_classifications(content, llm_content)
+    elif undecided:
+        content = merge_classifications(content, {"unknown": [str(value) for value in undecided]})
+    return content
+
+
+async def classify_many_column_values(app, values_by_column):
+    """
+    :: Classifies undecided values of several columns with one llm request
+    :param values_by_column: column key --> undecided values
+    :return: column key --> grouped result, columns missing in llm answer left out
+    """
+    if not app.config["llm_enabled"]:
+        return {key: {"unknown": [str(value) for value in values]} for key, values in values_by_column.items()}
+
+    # cached per column so only columns with new values go to llm
+    cache_keys = {
+        key: app.classification_cache.key(app.config["llm_model"], app.bulk_classification_prompt, values)
+        for key, values in values_by_column.items()
+    }
+    cached = await app.classification_cache.get_many(list(cache_keys.values()))
+    results = {key: cached[cache_key] for key, cache_key in cache_keys.items() if cache_key in cached}
+    missing = {key: values for key, values in values_by_column.items() if key not in results}
+    if not missing:
+        return results
+
+    prompt = app.bulk_classification_prompt.format(json.dumps(missing, default=str))
+    response = await app.llm_gateway.create_chat_completion(
+        model=app.config["llm_model"],
+        messages=[{"role": "user", "content": prompt}],
+        response_format={"type": "json_schema", "json_schema": BULK_LLM_RESPONSE_SCHEMA},
+        temperature=0
+    )
+    content = json.loads(response.choices[0].message.content)
+    llm_results = {key: content[key] for key in missing if isinstance(content.get(key), dict)}
+    await app.classification_cache.set_many({cache_keys[key]: result for key, result in llm_results.items()})
+    results.update(llm_results)
+    return results
+
+
+def result_labels(result):
+    """
+    :: Classes of grouped result that matched at least one value
+    """
+    return [label for label, values in result.items() if values]
+
+
+async def save_column_results(session, metadata_id, results=None, errors=None):
+    """
+    :: Upserts per column classification results, caller commits
+    :param results: column id --> grouped result
+    :param errors: column id --> error message
+    """
+    rows = [
+        {
+            "column_id": column_id, "metadata_id": metadata_id, "status": "completed",
+            "result": result, "labels": result_labels(result), "error": None
+        }
+        for column_id, result in (results or {}).items()
+    ] + [
+        {"column_id": column_id, "metadata_id": metadata_id, "status": "failed", "result": None, "labels": None, "error": error}
+        for column_id, error in (errors or {}).items()
+    ]
+    # chunked to stay under bind parameter limit of asyncpg
+    for index in range(0, len(rows), 1000):
+        statement = insert(ColumnClassificationModel).values(rows[index:index + 1000])
+        statement = statement.on_conflict_do_update(
+            index_elements=[ColumnClassificationModel.column_id],
+            set_={
+                "status": statement.excluded.status,
+                "result": statement.excluded.result,
+                "labels": statement.excluded.labels,
+                "error": statement.excluded.error,
+                "updated_at": func.now(),
+            }
+        )
+        await session.execute(statement)
+
+
+async def load_metadata_membership_db(app, metadata_id, membership_id):
+    """
+    :: Loads membership database of metadata owned by membership
+    """
+    async with app.pg_session() as session:
+        membership_db = (await session.exec(
+            select(MembershipDbModel).join(
+                DatabaseMetadataModel, DatabaseMetadataModel.db_id == MembershipDbModel.id
+            ).where(
+                DatabaseMetadataModel.id == metadata_id,
+                MembershipDbModel.membership_id == membership_id
+            )
+        )).first()
+        if not membership_db:
+            raise AppException(
+                error_message="No metadata found",
+                status_code=404,
+                error_code="exceptions.metadataNotFound",
+            )
+    return membership_db
+
+
+def check_sample_count(app, count):
+    # request models only enforce the hard cap
+    if count > app.config["sampling_max_count"]:
+        raise AppException(
+            error_message="Sample count above {}".format(app.config["sampling_max_count"]),
+            error_code="exceptions.sampleCountTooLarge",
+            status_code=422
+        )
+
+
+async def load_bulk_columns(app, metadata_id, membership_id, table_names=None, column_ids=None, only_unclassified=False):
+    """
+    :: Loads membership database and columns in scope of bulk classify
+    scope is whole metadata unless tables or columns given
+    biggest tables by catalog row estimate come first
+    :return: membership database, list of (column id, schema name, table name, column name)
+    """
+    membership_db = await load_metadata_membership_db(app, metadata_id, membership_id)
+    async with app.pg_session() as session:
+        query = select(
+            MetadataColumnModel.id, MetadataTableModel.schema_name, MetadataTableModel.table_name, MetadataColumnModel.name
+        ).join(
+            MetadataTableModel, MetadataTableModel.id == MetadataColumnModel.table_id
+        ).where(
+            MetadataColumnModel.metadata_id == metadata_id
+        ).order_by(
+            MetadataTableModel.estimated_rows.desc().nulls_last(),
+            MetadataTableModel.schema_name,
+            MetadataTableModel.table_name,
+            MetadataColumnModel.position
+        )
+        if table_names:
+            # public tables by bare name, others as schema.table
+            query = query.where(or_(
+                and_(MetadataTableModel.schema_name == "public", MetadataTableModel.table_name.in_(table_names)),
+                (MetadataTableModel.schema_name + "." + MetadataTableModel.table_name).in_(table_names)
+            ))
+        if column_ids:
+            query = query.where(MetadataColumnModel.id.in_(column_ids))
+        if only_unclassified:
+            query = query.outerjoin(
+                ColumnClassificationModel, ColumnClassificationModel.column_id == MetadataColumnModel.id
+            ).where(
+                (ColumnClassificationModel.status == None) | (ColumnClassificationModel.status != "completed")
+            )
+        columns = (await session.exec(query)).all()
+    return membership_db, columns
+
+
+async def bulk_classify(app, membership_db_session, metadata_id, columns, count, on_progress=None):
+    """
+    :: Classifies many columns with bounded concurrency
+    tables sampled with one query each and undecided values of
+    several columns packed into one llm request
+    results saved as each batch completes so failures keep finished work
+    :param columns: list of (column id, schema name, table name, column name)
+    :param on_progress: optional coroutine called with finished column count
+    :return: column id hex --> grouped result, column id hex --> error
+    """
+    semaphore = asyncio.Semaphore(app.config["classification_concurrency"])
+    batch_size = app.config["classification_columns_per_llm_request"]
+    results, errors = {}, {}
+
+    async def save(batch_results=None, batch_errors=None):
+        async with app.pg_session() as session:
+            await save_column_results(session, metadata_id, batch_results, batch_errors)
+            await session.commit()
+        results.update({column_id.hex: result for column_id, result in (batch_results or {}).items()})
+        errors.update({column_id.hex: error for column_id, error in (batch_errors or {}).items()})
+        if on_progress:
+            await on_progress(len(results) + len(errors))
+
+    columns_by_table = {}
+    for column_id, schema_name, table_name, column_name in columns:
+        columns_by_table.setdefault((schema_name, table_name), []).append((column_id, column_name))
+
+    async def sample_table(table, table_columns):
+        schema_name, table_name = table
+        async with semaphore:
+            try:
+                async with membership_db_session() as membership_session:
+                    samples = await app.column_sampler.sample(
+                        membership_session, table_name, [name for _, name in table_columns], count, schema=schema_name
+                    )
+            except Exception as exc:
+                await save(batch_errors={column_id: "sampling failed {}".format(type(exc).__name__) for column_id, _ in table_columns})
+                return []
+        return [(column_id, samples[name]) for column_id, name in table_columns]
+
+    sampled = [
+        column
+        for table_samples in await asyncio.gather(*[
+            sample_table(table, table_columns) for table, table_columns in columns_by_table.items()
+        ])
+        for column in table_samples
+    ]
+
+    # local rules first, columns without undecided values are done
+    local_results, pending = {}, []
+    for column_id, values in sampled:
+        content, undecided = classify_values(values)
+        if undecided:
+            pending.append((column_id, content, undecided))
+        else:
+            local_results[column_id] = content
+    if local_results:
+        await save(batch_results=local_results)
+
+    async def classify_batch(batch):
+        async with semaphore:
+            try:
+                llm_results = await classify_many_column_values(
+                    app, {column_id.hex: undecided for column_id, _, undecided in batch}
+                )
+            except Exception as exc:
+                await save(batch_errors={column_id: "classification failed {}".format(type(exc).__name__) for column_id, _, _ in batch})
+                return
+        batch_results, batch_errors = {}, {}
+        for column_id, content, _ in batch:
+            if column_id.hex in llm_results:
+                batch_results[column_id] = merge_classifications(content, llm_results[column_id.hex])
+            else:
+                batch_errors[column_id] = "column missing in llm response"
+        await save(batch_results, batch_errors)
+
+    await asyncio.gather(*[
+        classify_batch(pending[index:index + batch_size]) for index in range(0, len(pending), batch_size)
+    ])
+    return results, errors
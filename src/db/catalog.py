@@ -0,0 +1,343 @@
+import uuid
+import asyncio
+
+from sqlalchemy import BigInteger, JSON, String
+from sqlalchemy.sql import text
+
+from src.metrics import time_stage
+
+# non system schemas visible to connected user
+SCHEMAS_QUERY = text("""
+    SELECT n.nspname
+    FROM pg_catalog.pg_namespace n
+    WHERE n.nspname NOT IN ('pg_catalog', 'information_schema')
+      AND n.nspname NOT LIKE 'pg\\_toast%'
+      AND n.nspname NOT LIKE 'pg\\_temp\\_%'
+      AND has_schema_privilege(n.oid, 'USAGE')
+    ORDER BY n.nspname;
+""")
+
+# structural hash per table computed on server side
+# only tables with changed hash are read again
+SIGNATURE_QUERY = text("""
+    SELECT
+        c.relname AS table_name,
+        md5(coalesce(string_agg(
+            a.attname || ':' || a.atttypid || ':' || a.attnotnull || ':' || a.attnum,
+            ',' ORDER BY a.attnum
+        ), '')) AS structure_hash
+    FROM pg_catalog.pg_class c
+    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+    LEFT JOIN pg_catalog.pg_attribute a
+        ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+    WHERE n.nspname = :schema
+      AND c.relkind IN ('r', 'p', 'v', 'f')
+      AND has_table_privilege(c.oid, 'SELECT, INSERT, UPDATE, DELETE, TRUNCATE, REFERENCES, TRIGGER')
+    GROUP BY c.oid, c.relname
+    ORDER BY c.relname;
+""")
+
+# single round trip over pg_catalog instead of
+# one information_schema.columns query per table
+# data_type and is_nullable mirror information_schema.columns output
+COLUMNS_QUERY = """
+    SELECT
+        c.relname AS table_name,
+        a.attname AS column_name,
+        CASE
+            WHEN t.typtype = 'd' THEN
+                CASE
+                    WHEN bt.typelem <> 0 AND bt.typlen = -1 THEN 'ARRAY'
+                    WHEN bn.nspname = 'pg_catalog' THEN format_type(t.typbasetype, NULL)
+                    ELSE 'USER-DEFINED'
+                END
+            WHEN t.typelem <> 0 AND t.typlen = -1 THEN 'ARRAY'
+            WHEN tn.nspname = 'pg_catalog' THEN format_type(a.atttypid, NULL)
+            ELSE 'USER-DEFINED'
+        END AS data_type,
+        NOT (a.attnotnull OR (t.typtype = 'd' AND t.typnotnull)) AS nullable,
+        a.attnum AS ordinal_position
+    FROM pg_catalog.pg_class c
+    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+    LEFT JOIN pg_catalog.pg_attribute a
+        ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+    LEFT JOIN pg_catalog.pg_type t ON t.oid = a.atttypid
+    LEFT JOIN pg_catalog.pg_namespace tn ON tn.oid = t.typnamespace
+    LEFT JOIN pg_catalog.pg_type bt ON t.typtype = 'd' AND bt.oid = t.typbasetype
+    LEFT JOIN pg_catalog.pg_namespace bn ON bn.oid = bt.typnamespace
+    WHERE n.nspname = :schema
+      AND c.relkind IN ('r', 'p', 'v', 'f')
+      AND has_table_privilege(c.oid, 'SELECT, INSERT, UPDATE, DELETE, TRUNCATE, REFERENCES, TRIGGER')
+      {}
+    ORDER BY c.relname, a.attnum;
+"""
+CATALOG_QUERY = text(COLUMNS_QUERY.format(""))
+CHANGED_TABLES_QUERY = text(COLUMNS_QUERY.format("AND c.relname = ANY(:table_names)"))
+
+# planner estimates and sizes from catalog, user tables never scanned
+# reltuples is -1 for never analyzed tables on postgres 14+
+TABLE_STATS_QUERY = text("""
+    SELECT
+        c.relname AS table_name,
+        CASE WHEN c.reltuples < 0 THEN NULL ELSE c.reltuples::bigint END AS estimated_rows,
+        pg_total_relation_size(c.oid) AS total_bytes,
+        pg_relation_size(c.oid) AS table_bytes,
+        (
+            SELECT coalesce(json_agg(json_build_object(
+                'name', i.relname,
+                'columns', (
+                    SELECT coalesce(json_agg(ia.attname ORDER BY k.ord), '[]'::json)
+                    FROM unnest(x.indkey::int2[]) WITH ORDINALITY k(attnum, ord)
+                    JOIN pg_catalog.pg_attribute ia ON ia.attrelid = c.oid AND ia.attnum = k.attnum
+                ),
+                'unique', x.indisunique,
+                'primary', x.indisprimary
+            ) ORDER BY i.relname), '[]'::json)
+            FROM pg_catalog.pg_index x
+            JOIN pg_catalog.pg_class i ON i.oid = x.indexrelid
+            WHERE x.indrelid = c.oid
+        ) AS indexes
+    FROM pg_catalog.pg_class c
+    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = :schema
+      AND c.relkind IN ('r', 'p', 'v', 'f')
+      AND has_table_privilege(c.oid, 'SELECT, INSERT, UPDATE, DELETE, TRUNCATE, REFERENCES, TRIGGER')
+""").columns(table_name=String, estimated_rows=BigInteger, total_bytes=BigInteger, table_bytes=BigInteger, indexes=JSON)
+
+# pg_stats only shows columns the user can read
+# partitioned tables only have inherited rows, plain rows preferred
+COLUMN_STATS_QUERY = text("""
+    SELECT DISTINCT ON (s.tablename, s.attname)
+        s.tablename, s.attname, s.null_frac, s.n_distinct, s.avg_width
+    FROM pg_catalog.pg_stats s
+    WHERE s.schemaname = :schema
+    ORDER BY s.tablename, s.attname, s.inherited
+""")
+
+# relative change of a stats value below which it counts as unchanged
+STATS_TOLERANCE = 0.1
+
+
+async def extract_catalog(membership_session, schema="public", previous_items=None):
+    """
+    :: Reads tables and columns of schema with bulk catalog queries
+    when previous_items given only tables whose structure hash
+    changed are read again and column ids are kept by column name
+    :param membership_session: session of membership database
+    :param schema: schema to extract
+    :param previous_items: table_informations of last extraction
+    :return: dict with table_names, table_informations, changed_tables, removed_tables
+    and stats_changed_tables, unchanged tables whose stats, keys or indexes changed
+    """
+    previous = {item["table_name"]: item for item in previous_items or []}
+    with time_stage("catalog_signature_query"):
+        signatures = (await membership_session.execute(SIGNATURE_QUERY, {"schema": schema})).all()
+    changed_tables = [
+        table_name for table_name, structure_hash in signatures
+        if previous.get(table_name, {}).get("structure_hash") != structure_hash
+    ]
+    current_names = {table_name for table_name, _ in signatures}
+    removed_tables = [table_name for table_name in previous if table_name not in current_names]
+
+    changed_infos = {}
+    if changed_tables:
+        with time_stage("catalog_query"):
+            if len(changed_tables) == len(signatures):
+                rows = await membership_session.execute(CATALOG_QUERY, {"schema": schema})
+            else:
+                rows = await membership_session.execute(
+                    CHANGED_TABLES_QUERY, {"schema": schema, "table_names": changed_tables}
+                )
+        changed_infos = group_catalog_rows(rows, previous, schema)
+
+    # stats change without structure changes so they are read on every extraction
+    with time_stage("catalog_stats_query"):
+        table_stats = (await membership_session.execute(TABLE_STATS_QUERY, {"schema": schema})).all()
+        column_stats = (await membership_session.execute(COLUMN_STATS_QUERY, {"schema": schema})).all()
+    stats = group_stats(table_stats, column_stats)
+
+    metadata = {
+        "table_informations": [],
+        "table_names": [],
+        "changed_tables": changed_tables,
+        "removed_tables": removed_tables,
+        "stats_changed_tables": [],
+    }
+    for table_name, structure_hash in signatures:
+        table_info = changed_infos.get(table_name)
+        if table_info is None:
+            # unchanged or dropped right after signature query
+            # copied since previous items are the loaded metadata_items value,
+            # changing them in place hides the change from the orm
+            table_info = previous.get(table_name) or {"table_name": table_name, "columns": []}
+            table_info = {
+                "schema_name": schema, **table_info, "columns": [dict(column) for column in table_info["columns"]]
+            }
+            if apply_stats(table_info, stats.get(table_name)):
+                metadata["stats_changed_tables"].append(table_name)
+        else:
+            table_info["structure_hash"] = structure_hash
+            apply_stats(table_info, stats.get(table_name))
+        metadata["table_names"].append(table_name)
+        metadata["table_informations"].append(table_info)
+    return metadata
+
+
+def group_stats(table_stats, column_stats):
+    """
+    :return: table name --> {stats, primary_key, indexes, columns: column name --> column stats}
+    """
+    stats = {}
+    for table_name, estimated_rows, total_bytes, table_bytes, indexes in table_stats:
+        primary = next((index for index in indexes if index["primary"]), None)
+        stats[table_name] = {
+            "stats": {"estimated_rows": estimated_rows, "total_bytes": total_bytes, "table_bytes": table_bytes},
+            "primary_key": primary["columns"] if primary else [],
+            "indexes": indexes,
+            "columns": {},
+        }
+    for table_name, column_name, null_frac, n_distinct, avg_width in column_stats:
+        if table_name in stats:
+            # negative n_distinct is minus the distinct fraction of rows
+            stats[table_name]["columns"][column_name] = {
+                "null_frac": null_frac, "n_distinct": n_distinct, "avg_width": avg_width
+            }
+    return stats
+
+
+def stats_drifted(old, new):
+    """
+    :: Estimates move a little on every analyze, only changes
+    beyond STATS_TOLERANCE rewrite metadata and its etag
+    """
+    if old is None or new is None:
+        return old != new
+    for key, value in new.items():
+        previous = old.get(key)
+        if previous is None or value is None:
+            if previous != value:
+                return True
+        elif abs(value - previous) > STATS_TOLERANCE * max(abs(previous), abs(value), 1):
+            return True
+    return False
+
+
+def apply_stats(table_info, table_stats):
+    """
+    :: Sets stats, primary key and indexes of table and stats of its columns
+    stats within tolerance of current ones are kept as is
+    :return: True when anything changed on table_info
+    """
+    table_stats = table_stats or {"stats": None, "primary_key": [], "indexes": [], "columns": {}}
+    changed = False
+    if "stats" not in table_info or stats_drifted(table_info["stats"], table_stats["stats"]):
+        table_info["stats"] = table_stats["stats"]
+        changed = True
+    for key in ("primary_key", "indexes"):
+        if table_info.get(key) != table_stats[key]:
+            table_info[key] = table_stats[key]
+            changed = True
+    for column in table_info["columns"]:
+        column_stats = table_stats["columns"].get(column["name"])
+        if "stats" not in column or stats_drifted(column["stats"], column_stats):
+            column["stats"] = column_stats
+            changed = True
+    return changed
+
+
+def group_catalog_rows(rows, previous, schema):
+    """
+    :: Groups catalog rows ordered by table into table informations
+    column ids of previous extraction reused for same column names
+    """
+    table_infos = {}
+    table_info = None
+    old_column_ids = {}
+    # rows are ordered by table so grouping
+    # only needs to look at the last table
+    for table_name, column_name, data_type, nullable, position in rows:
+        if table_info is None or table_info["table_name"] != table_name:
+            table_info = {
+                "schema_name": schema,
+                "table_name": table_name,
+                "columns": [],
+            }
+            table_infos[table_name] = table_info
+            old_column_ids = {
+                column["name"]: column["column_id"]
+                for column in previous.get(table_name, {}).get("columns", [])
+            }
+        # tables without columns come with null column row
+        if column_name is None:
+            continue
+        table_info["columns"].append({
+            "column_id": old_column_ids.get(column_name) or uuid.uuid4().hex,
+            "name": column_name,
+            "type": data_type,
+            "nullable": nullable,
+            "position": position
+        })
+    return table_infos
+
+
+def qualified_name(schema, table_name):
+    # public tables keep bare names like before multi schema extraction
+    return table_name if schema == "public" else "{}.{}".format(schema, table_name)
+
+
+def table_key(table_info):
+    # metadata extracted before multi schema support only has public tables
+    return table_info.get("schema_name", "public"), table_info["table_name"]
+
+
+async def extract_all_schemas(membership_db_session, previous_items=None, concurrency=4):
+    """
+    :: Extracts every non system schema, schemas split across
+    pooled connections of membership database and read concurrently
+    :param membership_db_session: session maker of membership database
+    :param previous_items: table_informations of last extraction
+    :param concurrency: schemas extracted at the same time
+    :return: dict with table_informations, qualified table_names, changed_tables,
+    removed_tables and (schema, table name) changed_keys, removed_keys and stats_changed_keys
+    """
+    async with membership_db_session() as membership_session:
+        schemas = (await membership_session.execute(SCHEMAS_QUERY)).scalars().all()
+
+    previous_by_schema = {}
+    for item in previous_items or []:
+        previous_by_schema.setdefault(table_key(item)[0], []).append(item)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def extract_schema(schema):
+        async with semaphore:
+            async with membership_db_session() as membership_session:
+                return await extract_catalog(
+                    membership_session, schema=schema, previous_items=previous_by_schema.get(schema)
+                )
+
+    results = await asyncio.gather(*[extract_schema(schema) for schema in schemas])
+
+    metadata = {
+        "table_informations": [],
+        "table_names": [],
+        "changed_tables": [],
+        "removed_tables": [],
+        "changed_keys": [],
+        "removed_keys": [],
+        "stats_changed_keys": [],
+    }
+    for schema, result in zip(schemas, results):
+        metadata["table_informations"].extend(result["table_informations"])
+        metadata["table_names"].extend(qualified_name(schema, name) for name in result["table_names"])
+        metadata["changed_tables"].extend(qualified_name(schema, name) for name in result["changed_tables"])
+        metadata["removed_tables"].extend(qualified_name(schema, name) for name in result["removed_tables"])
+        metadata["changed_keys"].extend((schema, name) for name in result["changed_tables"])
+        metadata["removed_keys"].extend((schema, name) for name in result["removed_tables"])
+        metadata["stats_changed_keys"].extend((schema, name) for name in result["stats_changed_tables"])
+    # schemas dropped since last extraction
+    for schema, items in previous_by_schema.items():
+        if schema not in schemas:
+            metadata["removed_tables"].extend(qualified_name(schema, item["table_name"]) for item in items)
+            metadata["removed_keys"].extend((schema, item["table_name"]) for item in items)
+    return metadata
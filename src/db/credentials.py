@@ -0,0 +1,63 @@
+from collections import OrderedDict
+
+from sqlmodel import select
+
+from src.models.membership_databases import MembershipDbModel
+
+
+def row_version(membership_db):
+    # any write changes updated_at, password ciphertext changes on credential updates
+    return membership_db.updated_at, membership_db.password
+
+
+class ConnectionUrlCache:
+    """
+    :: Bounded cache of decrypted connection URLs keyed by membership database id
+    entries of changed rows are rebuilt since their version no longer matches
+    """
+
+    def __init__(self, credential_cipher, max_size=1000):
+        self.credential_cipher = credential_cipher
+        self.max_size = max_size
+        # db_id --> (row version, URL)
+        self._urls = OrderedDict()
+
+    def get_url(self, membership_db):
+        """
+        :param membership_db: MembershipDbModel instance with encrypted password
+        :return: sqlalchemy URL of membership database
+        """
+        version = row_version(membership_db)
+        entry = self._urls.get(membership_db.id)
+        if entry and entry[0] == version:
+            self._urls.move_to_end(membership_db.id)
+            return entry[1]
+
+        password = self.credential_cipher.decrypt(membership_db.password, membership_db.id.hex)
+        url = membership_db.connection_url(password)
+        self._urls[membership_db.id] = (version, url)
+        self._urls.move_to_end(membership_db.id)
+        while len(self._urls) > self.max_size:
+            self._urls.popitem(last=False)
+        return url
+
+    def invalidate(self, db_id):
+        """
+        :: Call after membership database row is updated or deleted
+        """
+        self._urls.pop(db_id, None)
+
+
+async def encrypt_plaintext_passwords(session, credential_cipher):
+    """
+    :: Encrypts passwords of rows saved before encryption at rest
+    :return: updated row count
+    """
+    rows = (await session.exec(
+        select(MembershipDbModel).where(MembershipDbModel.password.notlike(credential_cipher.PREFIX + "%"))
+    )).all()
+    for membership_db in rows:
+        membership_db.password = credential_cipher.encrypt(membership_db.password, membership_db.id.hex)
+        session.add(membership_db)
+    await session.commit()
+    return len(rows)
@@ -0,0 +1,132 @@
+import asyncio
+from datetime import datetime
+
+from sqlmodel import select
+
+from src.db.catalog import extract_all_schemas, table_key
+from src.db.metadata_codec import storage_values, stored_items
+from src.db.metadata_store import metadata_etag, save_metadata_version, update_metadata_stats, write_metadata_tables
+from src.db.schema_diff import structure_hashes
+from src.models.membership_databases import MembershipDbModel
+from src.models.database_metadata import DatabaseMetadataModel
+from src.security.exceptions import AppException
+
+
+async def load_membership_db(app, db_id, membership_id):
+    async with app.pg_session() as session:
+        membership_db = (
+            await session.exec(select(MembershipDbModel).where(
+                MembershipDbModel.id == db_id,
+                MembershipDbModel.membership_id == membership_id
+            ))
+        ).first()
+    if not membership_db:
+        raise AppException(
+            error_message="Membership database not found",
+            error_code="exceptions.membershipDbNotFound",
+            status_code=404
+        )
+    return membership_db
+
+
+async def extract_membership_database(app, membership_db, incremental=True):
+    """
+    :: Extracts tables and columns of membership database and stores them
+    :param incremental: only read tables whose structure changed
+    and keep column ids of previous extraction
+    :return: extract payload
+    """
+    async with app.pg_session() as session:
+        old_metadata = (await session.exec(select(DatabaseMetadataModel).where(DatabaseMetadataModel.db_id == membership_db.id))).first()
+
+    previous_items = stored_items(old_metadata.metadata_items, old_metadata.metadata_blob) if old_metadata and incremental else None
+    async with app.membership_engines.lease(membership_db) as membership_db_session:
+        metadata = await extract_all_schemas(
+            membership_db_session, previous_items=previous_items, concurrency=app.config["extract_schema_concurrency"]
+        )
+
+    if old_metadata:
+        metadata_id = old_metadata.id.hex
+        # nothing to write if no table or table stats changed
+        if not incremental or metadata["changed_tables"] or metadata["removed_tables"] or metadata["stats_changed_keys"]:
+            changed_keys = set(metadata["changed_keys"])
+            stats_changed_keys = set(metadata["stats_changed_keys"])
+            old_items = previous_items if previous_items is not None else stored_items(
+                old_metadata.metadata_items, old_metadata.metadata_blob
+            )
+            async with app.pg_session() as session:
+                # stats only changes do not push schema history out
+                if structure_hashes(old_items) != structure_hashes(metadata["table_informations"]):
+                    await save_metadata_version(session, old_metadata, app.config["metadata_history_size"])
+                for key, value in storage_values(
+                        metadata["table_informations"], app.config["metadata_storage"] == "compressed"
+                ).items():
+                    setattr(old_metadata, key, value)
+                old_metadata.table_count = len(metadata["table_informations"])
+                old_metadata.etag = metadata_etag(metadata["table_informations"])
+                old_metadata.updated_at = datetime.utcnow()
+                session.add(old_metadata)
+                # only rows of changed and removed tables are rewritten
+                await write_metadata_tables(
+                    session,
+                    old_metadata.id,
+                    [item for item in metadata["table_informations"] if table_key(item) in changed_keys],
+                    replaced_tables=metadata["changed_keys"] + metadata["removed_keys"] if incremental else None
+                )
+                if incremental:
+                    await update_metadata_stats(
+                        session,
+                        old_metadata.id,
+                        [item for item in metadata["table_informations"] if table_key(item) in stats_changed_keys]
+                    )
+                await session.commit()
+    else:
+        async with app.pg_session() as session:
+            metadata_instance = DatabaseMetadataModel(
+                **storage_values(metadata["table_informations"], app.config["metadata_storage"] == "compressed"),
+                table_count=len(metadata["table_informations"]),
+                etag=metadata_etag(metadata["table_informations"]),
+                db_id=membership_db.id
+            )
+            session.add(metadata_instance)
+            await session.flush()
+            await write_metadata_tables(session, metadata_instance.id, metadata["table_informations"], replaced_tables=[])
+            metadata_id = metadata_instance.id.hex
+            await session.commit()
+
+    return {
+        "metadata_id": metadata_id,
+        "table_names": metadata["table_names"],
+        "metadata": metadata["table_informations"],
+        "changed_tables": metadata["changed_tables"],
+        "removed_tables": metadata["removed_tables"],
+    }
+
+
+async def extract_fleet(app, membership_id, db_ids=None, incremental=True):
+    """
+    :: Extracts many membership databases in parallel
+    bounded by app wide fleet extract semaphore
+    :param db_ids: databases to extract, None means all databases of membership
+    :return: db id hex --> extract summary or error
+    """
+    query = select(MembershipDbModel).where(MembershipDbModel.membership_id == membership_id)
+    if db_ids:
+        query = query.where(MembershipDbModel.id.in_(db_ids))
+    async with app.pg_session() as session:
+        membership_dbs = (await session.exec(query)).all()
+
+    async def extract(membership_db):
+        async with app.fleet_extract_semaphore:
+            try:
+                payload = await extract_membership_database(app, membership_db, incremental=incremental)
+            except Exception as exc:
+                return membership_db.id.hex, {"error": getattr(exc, "error_message", type(exc).__name__)}
+        return membership_db.id.hex, {
+            "metadata_id": payload["metadata_id"],
+            "table_count": len(payload["table_names"]),
+            "changed_tables": len(payload["changed_tables"]),
+            "removed_tables": len(payload["removed_tables"]),
+        }
+
+    return dict(await asyncio.gather(*[extract(membership_db) for membership_db in membership_dbs]))
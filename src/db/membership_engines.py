@@ -0,0 +1,140 @@
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.metrics import instrument_engine_connect
+
+
+class _EngineEntry:
+    __slots__ = ("engine", "session_maker", "url", "last_used", "leases", "retired")
+
+    def __init__(self, engine, url):
+        self.engine = engine
+        self.session_maker = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+        self.url = url
+        self.last_used = time.monotonic()
+        self.leases = 0
+        # removed from registry, disposed when its last lease ends
+        self.retired = False
+
+
+class MembershipEngineRegistry:
+    """
+    :: App level registry of pooled engines for membership databases
+    one engine per membership database id, least recently used engines
+    and engines idle longer than idle_timeout get disposed
+    engines are leased while in use and never disposed under a running lease
+    """
+
+    def __init__(self, url_cache, max_engines=32, pool_size=2, max_overflow=3, idle_timeout=300):
+        self.url_cache = url_cache
+        self.max_engines = max_engines
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.idle_timeout = idle_timeout
+        # db_id --> _EngineEntry, least recently used first
+        self._engines = OrderedDict()
+        self._lock = asyncio.Lock()
+
+    def __len__(self):
+        return len(self._engines)
+
+    def _create_engine(self, url):
+        engine = create_async_engine(
+            url,
+            pool_size=self.pool_size,
+            max_overflow=self.max_overflow,
+            # customer databases may drop idle connections on their side
+            pool_pre_ping=True,
+        )
+        instrument_engine_connect(engine.sync_engine, "membership_db_connect")
+        return engine
+
+    def _retire(self, db_id):
+        # caller must hold the lock, returns engines to dispose now
+        entry = self._engines.pop(db_id)
+        entry.retired = True
+        return [] if entry.leases else [entry.engine]
+
+    def _pop_evictions(self):
+        # caller must hold the lock, leased engines are skipped
+        now = time.monotonic()
+        idle = [db_id for db_id, entry in self._engines.items() if not entry.leases]
+        evicted_ids = [db_id for db_id in idle if now - self._engines[db_id].last_used > self.idle_timeout]
+        overflow = len(self._engines) - len(evicted_ids) - self.max_engines
+        if overflow > 0:
+            evicted_ids.extend([db_id for db_id in idle if db_id not in evicted_ids][:overflow])
+        evicted = []
+        for db_id in evicted_ids:
+            evicted.extend(self._retire(db_id))
+        return evicted
+
+    async def _acquire(self, membership_db):
+        url = self.url_cache.get_url(membership_db)
+        async with self._lock:
+            evicted = []
+            entry = self._engines.get(membership_db.id)
+            # engine of changed credentials replaced
+            if entry and entry.url != url:
+                evicted.extend(self._retire(membership_db.id))
+                entry = None
+            if entry:
+                self._engines.move_to_end(membership_db.id)
+            else:
+                entry = _EngineEntry(self._create_engine(url), url)
+                self._engines[membership_db.id] = entry
+            entry.leases += 1
+            entry.last_used = time.monotonic()
+            evicted.extend(self._pop_evictions())
+
+        for engine in evicted:
+            await engine.dispose()
+        return entry
+
+    async def _release(self, entry):
+        async with self._lock:
+            entry.leases -= 1
+            entry.last_used = time.monotonic()
+            evicted = [entry.engine] if entry.retired and not entry.leases else []
+            # registry kept over max_engines while all engines were leased
+            evicted.extend(self._pop_evictions())
+        for engine in evicted:
+            await engine.dispose()
+
+    @asynccontextmanager
+    async def lease(self, membership_db):
+        """
+        :: Leases pooled engine of membership database for the duration of the block
+        :param membership_db: MembershipDbModel instance
+        :return: session maker bound to the leased engine
+        """
+        entry = await self._acquire(membership_db)
+        try:
+            yield entry.session_maker
+        finally:
+            await self._release(entry)
+
+    async def dispose(self, db_id):
+        self.url_cache.invalidate(db_id)
+        async with self._lock:
+            evicted = self._retire(db_id) if db_id in self._engines else []
+        for engine in evicted:
+            await engine.dispose()
+
+    async def evict_idle(self):
+        async with self._lock:
+            evicted = self._pop_evictions()
+        for engine in evicted:
+            await engine.dispose()
+
+    async def dispose_all(self):
+        async with self._lock:
+            engines = [entry.engine for entry in self._engines.values()]
+            self._engines.clear()
+        for engine in engines:
+            await engine.dispose()
@@ -0,0 +1,162 @@
+import zlib
+import struct
+
+import orjson
+
+# compressed columnar encoding of extracted table_informations
+# layout: MAGIC + zlib(uint32 json length + json document + 16 byte column ids)
+MAGIC = b"MDC1"
+TABLE_FIELDS = ("schema_name", "table_name", "structure_hash", "columns")
+COLUMN_FIELDS = ("column_id", "name", "type", "nullable", "position")
+COLUMN_STATS_FIELDS = ("null_frac", "n_distinct", "avg_width")
+# column stats state, blobs written before stats arrays keep stats in extra
+NO_STATS, NULL_STATS, COLUMNAR_STATS = 0, 1, 2
+
+
+def _dictionary(values):
+    """
+    :return: distinct values, index of each value
+    """
+    lookup = {}
+    indexes = [lookup.setdefault(value, len(lookup)) for value in values]
+    return list(lookup), indexes
+
+
+def _stats_state(column):
+    # stats are columnar when placed and shaped as column_shape writes them
+    # anything else stays in extra so decoding gives back the same dict
+    if "stats" not in column or list(column).index("stats") != len(COLUMN_FIELDS):
+        return NO_STATS
+    stats = column["stats"]
+    if stats is None:
+        return NULL_STATS
+    if isinstance(stats, dict) and tuple(stats) == COLUMN_STATS_FIELDS:
+        return COLUMNAR_STATS
+    return NO_STATS
+
+
+def encode_metadata(table_informations, level=6):
+    """
+    :param table_informations: extracted tables with their columns
+    :return: compressed bytes, decode_metadata gives back the same list
+    """
+    columns = [column for table_info in table_informations for column in table_info["columns"]]
+    schemas, schema_indexes = _dictionary([table_info.get("schema_name") for table_info in table_informations])
+    types, type_indexes = _dictionary([column.get("type") for column in columns])
+    stats_states = [_stats_state(column) for column in columns]
+    stats_columns = [
+        column["stats"] if state == COLUMNAR_STATS else None for column, state in zip(columns, stats_states)
+    ]
+    document = {
+        "schemas": schemas,
+        "types": types,
+        "tables": {
+            "schema": schema_indexes,
+            # legacy items have no schema_name key
+            "has_schema": [int("schema_name" in table_info) for table_info in table_informations],
+            "name": [table_info["table_name"] for table_info in table_informations],
+            "hash": [table_info.get("structure_hash") for table_info in table_informations],
+            "column_count": [len(table_info["columns"]) for table_info in table_informations],
+            # keys added by later extractions kept as is
+            "extra": [
+                {key: value for key, value in table_info.items() if key not in TABLE_FIELDS} or None
+                for table_info in table_informations
+            ],
+        },
+        "columns": {
+            "name": [column["name"] for column in columns],
+            "type": type_indexes,
+            "nullable": [int(column["nullable"]) for column in columns],
+            "position": [column["position"] for column in columns],
+            "stats": stats_states,
+            # one array per stats field instead of one object per column
+            **{
+                field: [stats[field] if stats else None for stats in stats_columns]
+                for field in COLUMN_STATS_FIELDS
+            },
+            "extra": [
+                {
+                    key: value for key, value in column.items()
+                    if key not in COLUMN_FIELDS and (key != "stats" or state == NO_STATS)
+                } or None
+                for column, state in zip(columns, stats_states)
+            ],
+        },
+    }
+    body = orjson.dumps(document)
+    # column ids are uuid hex, parsing through uuid.UUID is several times slower
+    column_ids = bytes.fromhex("".join(column["column_id"] for column in columns))
+    return MAGIC + zlib.compress(struct.pack("<I", len(body)) + body + column_ids, level)
+
+
+def decode_metadata(data):
+    """
+    :return: table_informations in the json shape of metadata_items
+    """
+    if data[:4] != MAGIC:
+        raise ValueError("unknown metadata encoding")
+    payload = zlib.decompress(data[4:])
+    (length,) = struct.unpack_from("<I", payload)
+    document = orjson.loads(payload[4:4 + length])
+    column_ids = payload[4 + length:]
+
+    schemas, types = document["schemas"], document["types"]
+    tables, columns = document["tables"], document["columns"]
+    column_names, column_types = columns["name"], columns["type"]
+    column_nullables, column_positions, column_extras = columns["nullable"], columns["position"], columns["extra"]
+    stats_states = columns.get("stats") or [NO_STATS] * len(column_names)
+    null_fracs, n_distincts, avg_widths = (columns.get(field) for field in COLUMN_STATS_FIELDS)
+
+    table_informations = []
+    offset = 0
+    for index, table_name in enumerate(tables["name"]):
+        table_info = {}
+        if tables["has_schema"][index]:
+            table_info["schema_name"] = schemas[tables["schema"][index]]
+        table_info["table_name"] = table_name
+        table_columns = []
+        for position in range(offset, offset + tables["column_count"][index]):
+            column = {
+                "column_id": column_ids[position * 16:position * 16 + 16].hex(),
+                "name": column_names[position],
+                "type": types[column_types[position]],
+                "nullable": bool(column_nullables[position]),
+                "position": column_positions[position],
+            }
+            if stats_states[position] == NULL_STATS:
+                column["stats"] = None
+            elif stats_states[position] == COLUMNAR_STATS:
+                column["stats"] = {
+                    "null_frac": null_fracs[position],
+                    "n_distinct": n_distincts[position],
+                    "avg_width": avg_widths[position],
+                }
+            if column_extras[position]:
+                column.update(column_extras[position])
+            table_columns.append(column)
+        offset += tables["column_count"][index]
+        table_info["columns"] = table_columns
+        if tables["hash"][index] is not None:
+            table_info["structure_hash"] = tables["hash"][index]
+        if tables["extra"][index]:
+            table_info.update(tables["extra"][index])
+        table_informations.append(table_info)
+    return table_informations
+
+
+def stored_items(metadata_items, metadata_blob):
+    """
+    :: Table informations of database_metadata row in either storage
+    """
+    if metadata_blob is not None:
+        return decode_metadata(metadata_blob)
+    return metadata_items or []
+
+
+def storage_values(table_informations, compressed):
+    """
+    :return: metadata_items and metadata_blob column values for configured storage
+    """
+    if compressed:
+        return {"metadata_items": None, "metadata_blob": encode_metadata(table_informations)}
+    return {"metadata_items": table_informations, "metadata_blob": None}
@@ -0,0 +1,341 @@
+import uuid
+from hashlib import sha256
+
+import orjson
+
+from sqlalchemy import bindparam, delete, exists, insert, select, tuple_, update
+
+from src.db.metadata_codec import encode_metadata, storage_values, stored_items
+from src.models.database_metadata import (
+    DatabaseMetadataModel, MetadataTableModel, MetadataColumnModel, MetadataVersionModel
+)
+
+
+def metadata_etag(table_informations):
+    # same content same etag, unchanged incremental extractions keep it
+    return sha256(orjson.dumps(table_informations)).hexdigest()[:32]
+
+
+def column_shape(column):
+    return {
+        "column_id": column["column_id"],
+        "name": column["name"],
+        "type": column["type"],
+        "nullable": column["nullable"],
+        "position": column["position"],
+        "stats": column.get("stats"),
+    }
+
+
+def table_shape(table_info):
+    """
+    :: Table information as served by get metadata, same keys whether read
+    from stored metadata_items or rebuilt from normalized rows
+    keys missing on metadata extracted before them are null
+    """
+    return {
+        "schema_name": table_info.get("schema_name", "public"),
+        "table_name": table_info["table_name"],
+        "columns": [column_shape(column) for column in table_info["columns"]],
+        "structure_hash": table_info.get("structure_hash"),
+        "stats": table_info.get("stats"),
+        "primary_key": table_info.get("primary_key"),
+        "indexes": table_info.get("indexes"),
+    }
+
+
+def nullable_stats(**stats):
+    # normalized rows keep stats in columns, all null means no stats
+    return stats if any(value is not None for value in stats.values()) else None
+
+
+def table_stats_values(table_info):
+    stats = table_info.get("stats") or {}
+    return {
+        "estimated_rows": stats.get("estimated_rows"),
+        "total_bytes": stats.get("total_bytes"),
+        "table_bytes": stats.get("table_bytes"),
+        "primary_key": table_info.get("primary_key"),
+        "indexes": table_info.get("indexes"),
+    }
+
+
+def column_stats_values(column):
+    stats = column.get("stats") or {}
+    return {
+        "null_frac": stats.get("null_frac"),
+        "n_distinct": stats.get("n_distinct"),
+        "avg_width": stats.get("avg_width"),
+    }
+
+
+async def write_metadata_tables(session, metadata_id, table_informations, replaced_tables=None):
+    """
+    :: Writes normalized table and column rows of extracted metadata
+    :param session: system database session, caller commits
+    :param metadata_id: DatabaseMetadataModel id
+    :param table_informations: table informations to insert
+    :param replaced_tables: (schema name, table name) pairs whose old rows are deleted first
+    None means all rows of metadata are replaced
+    """
+    if replaced_tables is None:
+        await session.execute(delete(MetadataTableModel).where(MetadataTableModel.metadata_id == metadata_id))
+    elif replaced_tables:
+        # columns deleted by on delete cascade
+        await session.execute(delete(MetadataTableModel).where(
+            MetadataTableModel.metadata_id == metadata_id,
+            tuple_(MetadataTableModel.schema_name, MetadataTableModel.table_name).in_(replaced_tables)
+        ))
+
+    table_rows, column_rows = [], []
+    for table_info in table_informations:
+        table_id = uuid.uuid4()
+        table_rows.append({
+            "id": table_id,
+            "metadata_id": metadata_id,
+            "schema_name": table_info.get("schema_name", "public"),
+            "table_name": table_info["table_name"],
+            "structure_hash": table_info.get("structure_hash"),
+            **table_stats_values(table_info),
+        })
+        for column in table_info["columns"]:
+            column_rows.append({
+                "id": uuid.UUID(column["column_id"]),
+                "metadata_id": metadata_id,
+                "table_id": table_id,
+                "name": column["name"],
+                "type": column["type"],
+                "nullable": column["nullable"],
+                "position": column["position"],
+                **column_stats_values(column),
+            })
+    if table_rows:
+        await session.execute(insert(MetadataTableModel), table_rows)
+    if column_rows:
+        await session.execute(insert(MetadataColumnModel), column_rows)
+
+
+async def update_metadata_stats(session, metadata_id, table_informations):
+    """
+    :: Updates stats of normalized rows whose table structure did not change
+    :param session: system database session, caller commits
+    :param table_informations: tables with changed stats, keys or indexes
+    """
+    if not table_informations:
+        return
+    tables = MetadataTableModel.__table__
+    await session.execute(
+        update(tables).where(
+            tables.c.metadata_id == metadata_id,
+            tables.c.schema_name == bindparam("b_schema_name"),
+            tables.c.table_name == bindparam("b_table_name"),
+        ).values(
+            estimated_rows=bindparam("b_estimated_rows"),
+            total_bytes=bindparam("b_total_bytes"),
+            table_bytes=bindparam("b_table_bytes"),
+            primary_key=bindparam("b_primary_key"),
+            indexes=bindparam("b_indexes"),
+        ),
+        [
+            {
+                "b_schema_name": table_info.get("schema_name", "public"),
+                "b_table_name": table_info["table_name"],
+                **{"b_" + key: value for key, value in table_stats_values(table_info).items()},
+            }
+            for table_info in table_informations
+        ]
+    )
+    columns = MetadataColumnModel.__table__
+    column_params = [
+        {"b_id": uuid.UUID(column["column_id"]), **{"b_" + key: value for key, value in column_stats_values(column).items()}}
+        for table_info in table_informations
+        for column in table_info["columns"]
+    ]
+    if column_params:
+        await session.execute(
+            update(columns).where(columns.c.id == bindparam("b_id")).values(
+                null_frac=bindparam("b_null_frac"),
+                n_distinct=bindparam("b_n_distinct"),
+                avg_width=bindparam("b_avg_width"),
+            ),
+            column_params
+        )
+
+
+async def iter_metadata_tables(session, metadata_id):
+    """
+    :: Yields table informations of metadata one table at a time in table_shape
+    rows are read through server side cursor so memory stays bounded
+    """
+    query = select(
+        MetadataTableModel.schema_name,
+        MetadataTableModel.table_name,
+        MetadataTableModel.structure_hash,
+        MetadataTableModel.estimated_rows,
+        MetadataTableModel.total_bytes,
+        MetadataTableModel.table_bytes,
+        MetadataTableModel.primary_key,
+        MetadataTableModel.indexes,
+        MetadataColumnModel.id,
+        MetadataColumnModel.name,
+        MetadataColumnModel.type,
+        MetadataColumnModel.nullable,
+        MetadataColumnModel.position,
+        MetadataColumnModel.null_frac,
+        MetadataColumnModel.n_distinct,
+        MetadataColumnModel.avg_width
+    ).outerjoin(
+        MetadataColumnModel, MetadataColumnModel.table_id == MetadataTableModel.id
+    ).where(
+        MetadataTableModel.metadata_id == metadata_id
+    ).order_by(
+        # same order as catalog extraction
+        MetadataTableModel.schema_name.collate("C"),
+        MetadataTableModel.table_name.collate("C"),
+        MetadataColumnModel.position
+    )
+
+    table_info = None
+    result = await session.stream(query)
+    async for (schema_name, table_name, structure_hash, estimated_rows, total_bytes, table_bytes, primary_key, indexes,
+               column_id, name, column_type, nullable, position, null_frac, n_distinct, avg_width) in result:
+        if table_info is None or (table_info["schema_name"], table_info["table_name"]) != (schema_name, table_name):
+            if table_info is not None:
+                yield table_info
+            table_info = {
+                "schema_name": schema_name,
+                "table_name": table_name,
+                "columns": [],
+                "structure_hash": structure_hash,
+                "stats": nullable_stats(estimated_rows=estimated_rows, total_bytes=total_bytes, table_bytes=table_bytes),
+                "primary_key": primary_key,
+                "indexes": indexes,
+            }
+        # tables without columns come with null column row
+        if column_id is None:
+            continue
+        table_info["columns"].append({
+            "column_id": column_id.hex,
+            "name": name,
+            "type": column_type,
+            "nullable": nullable,
+            "position": position,
+            "stats": nullable_stats(null_frac=null_frac, n_distinct=n_distinct, avg_width=avg_width),
+        })
+    if table_info is not None:
+        yield table_info
+
+
+async def has_metadata_tables(session, metadata_id):
+    # metadata extracted before normalized storage has no rows until re-extracted
+    return (await session.execute(
+        select(MetadataTableModel.id).where(MetadataTableModel.metadata_id == metadata_id).limit(1)
+    )).first() is not None
+
+
+async def backfill_metadata_tables(pg_session, batch_size=50):
+    """
+    :: Writes normalized rows of metadata extracted before they existed
+    so classify, bulk classify and column search see those databases
+    runs on startup with migrations, one transaction per batch
+    :return: backfilled row count
+    """
+    missing = ~exists().where(MetadataTableModel.metadata_id == DatabaseMetadataModel.id)
+    backfilled = 0
+    last_id = None
+    while True:
+        query = select(
+            DatabaseMetadataModel.id, DatabaseMetadataModel.metadata_items, DatabaseMetadataModel.metadata_blob
+        ).where(missing).order_by(DatabaseMetadataModel.id).limit(batch_size)
+        # metadata without tables stays without rows, keyset keeps it from being read again
+        if last_id is not None:
+            query = query.where(DatabaseMetadataModel.id > last_id)
+        async with pg_session() as session:
+            rows = (await session.execute(query)).all()
+            if not rows:
+                return backfilled
+            for metadata_id, metadata_items, metadata_blob in rows:
+                await write_metadata_tables(
+                    session, metadata_id, stored_items(metadata_items, metadata_blob), replaced_tables=[]
+                )
+            await session.commit()
+        backfilled += len(rows)
+        last_id = rows[-1][0]
+
+
+async def convert_metadata_storage(pg_session, compressed, batch_size=50):
+    """
+    :: Rewrites database_metadata rows stored in the other format
+    runs on startup with migrations, one transaction per batch
+    :param compressed: target storage, metadata_blob when true else metadata_items
+    :return: converted row count
+    """
+    if compressed:
+        pending = DatabaseMetadataModel.metadata_blob.is_(None)
+    else:
+        pending = DatabaseMetadataModel.metadata_blob.isnot(None)
+
+    converted = 0
+    while True:
+        async with pg_session() as session:
+            rows = (await session.execute(
+                select(DatabaseMetadataModel.id, DatabaseMetadataModel.metadata_items, DatabaseMetadataModel.metadata_blob)
+                .where(pending).limit(batch_size)
+            )).all()
+            if not rows:
+                return converted
+            for metadata_id, metadata_items, metadata_blob in rows:
+                await session.execute(
+                    update(DatabaseMetadataModel).where(DatabaseMetadataModel.id == metadata_id)
+                    .values(**storage_values(stored_items(metadata_items, metadata_blob), compressed))
+                )
+            await session.commit()
+        converted += len(rows)
+
+
+async def backfill_metadata_etags(pg_session, batch_size=50):
+    """
+    :: Sets etag of metadata extracted before etags existed
+    runs on startup with migrations, rows with an etag are never read again
+    :return: backfilled row count
+    """
+    backfilled = 0
+    while True:
+        async with pg_session() as session:
+            rows = (await session.execute(
+                select(DatabaseMetadataModel.id, DatabaseMetadataModel.metadata_items, DatabaseMetadataModel.metadata_blob)
+                .where(DatabaseMetadataModel.etag.is_(None)).limit(batch_size)
+            )).all()
+            if not rows:
+                return backfilled
+            for metadata_id, metadata_items, metadata_blob in rows:
+                await session.execute(
+                    update(DatabaseMetadataModel).where(DatabaseMetadataModel.id == metadata_id)
+                    .values(etag=metadata_etag(stored_items(metadata_items, metadata_blob)))
+                )
+            await session.commit()
+        backfilled += len(rows)
+
+
+async def save_metadata_version(session, metadata, history_size):
+    """
+    :: Keeps current content of metadata row before extraction overwrites it
+    versions past history_size are dropped, oldest first
+    :param session: system database session, caller commits
+    :param metadata: DatabaseMetadataModel as loaded before extraction
+    """
+    if history_size <= 0:
+        return
+    session.add(MetadataVersionModel(
+        metadata_id=metadata.id,
+        # compressed rows are stored as is
+        metadata_blob=metadata.metadata_blob if metadata.metadata_blob is not None else encode_metadata(metadata.metadata_items or []),
+        table_count=metadata.table_count,
+        etag=metadata.etag,
+        extracted_at=metadata.updated_at,
+    ))
+    await session.flush()
+    stale = select(MetadataVersionModel.id).where(MetadataVersionModel.metadata_id == metadata.id).order_by(
+        MetadataVersionModel.extracted_at.desc(), MetadataVersionModel.id.desc()
+    ).offset(history_size)
+    await session.execute(delete(MetadataVersionModel).where(MetadataVersionModel.id.in_(stale)))
@@ -0,0 +1,102 @@
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.sql import text
+
+from src.metrics import time_stage
+
+# row estimate, kind and most common values of sampled columns
+# read from catalog so small or skewed columns need no table access
+STATS_QUERY = text("""
+    SELECT c.reltuples, c.relkind, s.attname, s.most_common_vals::text::text[]
+    FROM pg_catalog.pg_class c
+    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+    LEFT JOIN pg_catalog.pg_stats s
+        ON s.schemaname = n.nspname AND s.tablename = c.relname AND s.attname = ANY(:column_names)
+    WHERE n.nspname = :schema AND c.relname = :table_name;
+""")
+
+STATEMENT_TIMEOUT_QUERY = text("SELECT set_config('statement_timeout', :timeout, true)")
+
+# sqlstate of query_canceled, raised on statement timeout
+QUERY_CANCELED = "57014"
+
+
+def quote_identifier(name):
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+class ColumnSampler:
+    """
+    :: Samples distinct non null values of membership database columns
+    most common values from pg_stats first, then TABLESAMPLE on big tables
+    every query runs under statement timeout so sampling time is bounded
+    """
+
+    def __init__(self, timeout_ms=5000, max_value_chars=256, bernoulli_threshold=100000,
+                 system_threshold=10000000, oversample=5):
+        self.timeout_ms = timeout_ms
+        self.max_value_chars = max_value_chars
+        # tables above bernoulli_threshold rows sampled with BERNOULLI
+        # tables above system_threshold rows sampled by blocks with SYSTEM
+        self.bernoulli_threshold = bernoulli_threshold
+        self.system_threshold = system_threshold
+        self.oversample = oversample
+
+    def _sample_clause(self, reltuples, relkind, limit):
+        # TABLESAMPLE only works on tables and materialized views
+        if relkind not in ("r", "m") or reltuples < self.bernoulli_threshold:
+            return ""
+        method = "SYSTEM" if reltuples >= self.system_threshold else "BERNOULLI"
+        # twice the needed rows to make up for nulls and duplicates
+        percent = min(100.0, max(0.0001, limit * 2 * 100.0 / reltuples))
+        return "TABLESAMPLE {} ({:.6f})".format(method, percent)
+
+    async def sample(self, membership_session, table_name, column_names, count, schema="public"):
+        """
+        :param membership_session: session of membership database
+        :param column_names: columns sampled together with one query
+        :param count: distinct non null values wanted per column
+        :return: column name --> sampled values as text
+        """
+        await membership_session.execute(STATEMENT_TIMEOUT_QUERY, {"timeout": str(self.timeout_ms)})
+        rows = (await membership_session.execute(STATS_QUERY, {
+            "schema": schema, "table_name": table_name, "column_names": column_names
+        })).all()
+        reltuples, relkind = (rows[0][0], rows[0][1]) if rows else (-1, None)
+
+        samples = {name: {} for name in column_names}
+        for _, _, column_name, common_values in rows:
+            if column_name and common_values:
+                self._add(samples[column_name], common_values, count)
+
+        remaining = [name for name in column_names if len(samples[name]) < count]
+        if remaining:
+            limit = count * self.oversample
+            query = """
+                SELECT {} FROM {}.{} {} WHERE {} LIMIT :limit
+            """.format(
+                ", ".join("left({}::text, :max_chars)".format(quote_identifier(name)) for name in remaining),
+                quote_identifier(schema),
+                quote_identifier(table_name),
+                self._sample_clause(reltuples, relkind, limit),
+                " OR ".join("{} IS NOT NULL".format(quote_identifier(name)) for name in remaining),
+            )
+            try:
+                with time_stage("sampling_query"):
+                    data = await membership_session.execute(text(query), {"limit": limit, "max_chars": self.max_value_chars})
+                for row in data:
+                    for name, value in zip(remaining, row):
+                        if value is not None:
+                            self._add(samples[name], [value], count)
+            except DBAPIError as exc:
+                # keep values from pg_stats when table scan takes too long
+                if getattr(exc.orig, "sqlstate", None) != QUERY_CANCELED:
+                    raise
+        return {name: list(values) for name, values in samples.items()}
+
+    def _add(self, values, new_values, count):
+        # dict keeps insertion order and de-duplicates
+        for value in new_values:
+            if len(values) >= count:
+                return
+            if value is not None:
+                values.setdefault(value[:self.max_value_chars], None)
@@ -0,0 +1,164 @@
+from sqlmodel import select
+
+from src.db.catalog import qualified_name, table_key
+from src.db.metadata_codec import stored_items, decode_metadata
+from src.models.database_metadata import DatabaseMetadataModel, MetadataVersionModel
+from src.models.membership_databases import MembershipDbModel
+from src.security.exceptions import AppException
+
+
+def structure_hashes(table_informations):
+    """
+    :return: (schema name, table name) --> structure hash
+    """
+    return {table_key(table_info): table_info.get("structure_hash") for table_info in table_informations}
+
+
+def diff_table(base_table, target_table):
+    """
+    :: Column changes of one table, columns matched by name
+    :return: None when names, types and nullability match
+    """
+    base_columns = {column["name"]: column for column in base_table["columns"]}
+    target_columns = {column["name"]: column for column in target_table["columns"]}
+
+    added_columns, changed_columns = [], []
+    for name, column in target_columns.items():
+        base_column = base_columns.get(name)
+        if base_column is None:
+            added_columns.append({"name": name, "type": column["type"], "nullable": column["nullable"]})
+            continue
+        change = {}
+        if base_column["type"] != column["type"]:
+            change["type"] = [base_column["type"], column["type"]]
+        if base_column["nullable"] != column["nullable"]:
+            change["nullable"] = [base_column["nullable"], column["nullable"]]
+        if change:
+            changed_columns.append({"name": name, **change})
+    removed_columns = [name for name in base_columns if name not in target_columns]
+
+    if not (added_columns or removed_columns or changed_columns):
+        return None
+    return {"added_columns": added_columns, "removed_columns": removed_columns, "changed_columns": changed_columns}
+
+
+def diff_table_informations(base_items, target_items):
+    """
+    :: Linear diff of two table_informations lists, tables keyed by schema and name
+    tables with equal structure hash are skipped without comparing columns
+    :return: added, removed and changed tables of target against base
+    """
+    base_tables = {table_key(table_info): table_info for table_info in base_items}
+    target_tables = {table_key(table_info): table_info for table_info in target_items}
+
+    changed_tables = []
+    for key, target_table in target_tables.items():
+        base_table = base_tables.get(key)
+        if base_table is None:
+            continue
+        # hash covers column names, types, nullability and positions
+        if base_table.get("structure_hash") and base_table.get("structure_hash") == target_table.get("structure_hash"):
+            continue
+        # position only changes give no column diff
+        table_diff = diff_table(base_table, target_table)
+        if table_diff:
+            changed_tables.append({"table": qualified_name(*key), **table_diff})
+
+    return {
+        "added_tables": [qualified_name(*key) for key in target_tables if key not in base_tables],
+        "removed_tables": [qualified_name(*key) for key in base_tables if key not in target_tables],
+        "changed_tables": changed_tables,
+    }
+
+
+def diff_summary(diff):
+    return {
+        "added_tables": len(diff["added_tables"]),
+        "removed_tables": len(diff["removed_tables"]),
+        "changed_tables": len(diff["changed_tables"]),
+        "added_columns": sum(len(table["added_columns"]) for table in diff["changed_tables"]),
+        "removed_columns": sum(len(table["removed_columns"]) for table in diff["changed_tables"]),
+        "changed_columns": sum(len(table["changed_columns"]) for table in diff["changed_tables"]),
+    }
+
+
+def diff_lines(diff):
+    """
+    :: One change per item for ndjson responses
+    """
+    for table in diff["added_tables"]:
+        yield {"change": "added_table", "table": table}
+    for table in diff["removed_tables"]:
+        yield {"change": "removed_table", "table": table}
+    for table_diff in diff["changed_tables"]:
+        yield {"change": "changed_table", **table_diff}
+
+
+def metadata_not_found():
+    return AppException(
+        error_message="No metadata found",
+        status_code=404,
+        error_code="exceptions.metadataNotFound",
+    )
+
+
+async def load_current_side(session, metadata_id, membership_id):
+    """
+    :: Current content of metadata owned by membership
+    :return: side description, loader of table informations
+    """
+    record = (await session.exec(
+        select(DatabaseMetadataModel.id, DatabaseMetadataModel.updated_at, DatabaseMetadataModel.etag).join(
+            MembershipDbModel, MembershipDbModel.id == DatabaseMetadataModel.db_id
+        ).where(DatabaseMetadataModel.id == metadata_id, MembershipDbModel.membership_id == membership_id)
+    )).first()
+    if not record:
+        raise metadata_not_found()
+
+    async def load_items():
+        stored = (await session.exec(
+            select(DatabaseMetadataModel.metadata_items, DatabaseMetadataModel.metadata_blob)
+            .where(DatabaseMetadataModel.id == metadata_id)
+        )).first()
+        return stored_items(*stored) if stored else []
+
+    side = {
+        "metadata_id": record.id.hex,
+        "version_id": None,
+        "extracted_at": record.updated_at.isoformat(),
+    }
+    return side, record.etag, load_items
+
+
+async def load_version_side(session, metadata_id, version_id=None):
+    """
+    :: Saved version of metadata, latest one when version_id is empty
+    caller checks metadata ownership
+    """
+    query = select(
+        MetadataVersionModel.id, MetadataVersionModel.extracted_at, MetadataVersionModel.etag
+    ).where(MetadataVersionModel.metadata_id == metadata_id)
+    if version_id:
+        query = query.where(MetadataVersionModel.id == version_id)
+    else:
+        query = query.order_by(MetadataVersionModel.extracted_at.desc(), MetadataVersionModel.id.desc()).limit(1)
+    record = (await session.exec(query)).first()
+    if not record:
+        raise AppException(
+            error_message="No metadata version found",
+            status_code=404,
+            error_code="exceptions.metadataVersionNotFound",
+        )
+
+    async def load_items():
+        blob = (await session.exec(
+            select(MetadataVersionModel.metadata_blob).where(MetadataVersionModel.id == record.id)
+        )).first()
+        return decode_metadata(blob)
+
+    side = {
+        "metadata_id": metadata_id.hex,
+        "version_id": record.id.hex,
+        "extracted_at": record.extracted_at.isoformat(),
+    }
+    return side, record.etag, load_items
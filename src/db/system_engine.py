@@ -0,0 +1,33 @@
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.metrics import instrument_engine_connect
+
+
+def create_system_engine(url, config):
+    """
+    :: Pooled engine of system database tuned by system_db_* config keys
+    :param url: primary or read replica connection string
+    """
+    # sqlalchemy and asyncpg both cache prepared statements per connection
+    # 0 disables them, required behind pgbouncer in transaction mode
+    statement_cache_size = config["system_db_statement_cache_size"]
+    server_settings = {}
+    if config["system_db_statement_timeout_ms"] > 0:
+        server_settings["statement_timeout"] = str(config["system_db_statement_timeout_ms"])
+
+    engine = create_async_engine(
+        url,
+        pool_size=config["system_db_pool_size"],
+        max_overflow=config["system_db_max_overflow"],
+        pool_recycle=config["system_db_pool_recycle"],
+        pool_timeout=config["system_db_pool_timeout"],
+        pool_pre_ping=config["system_db_pool_pre_ping"],
+        connect_args={
+            "timeout": config["system_db_connect_timeout"],
+            "prepared_statement_cache_size": statement_cache_size,
+            "statement_cache_size": statement_cache_size,
+            "server_settings": server_settings,
+        },
+    )
+    instrument_engine_connect(engine.sync_engine, "system_db_connect")
+    return engine
@@ -0,0 +1,64 @@
+import uuid
+
+from src.classification.service import bulk_classify, load_bulk_columns
+from src.db.extraction import load_membership_db, extract_membership_database
+
+
+def classify_job_params(metadata_id, classify_request):
+    return {
+        "metadata_id": metadata_id.hex,
+        "table_names": classify_request.table_names,
+        "column_ids": [column_id.hex for column_id in classify_request.column_ids or []] or None,
+        "count": classify_request.count,
+        "only_unclassified": classify_request.only_unclassified,
+    }
+
+
+async def extract_job(app, membership_id, params, progress):
+    """
+    :param params: db_id, incremental
+    :return: job result
+    """
+    await progress(0, 1)
+    membership_db = await load_membership_db(app, uuid.UUID(params["db_id"]), membership_id)
+    payload = await extract_membership_database(app, membership_db, incremental=params.get("incremental", True))
+    await progress(1, 1)
+    # full metadata is read from metadata api
+    return {
+        "metadata_id": payload["metadata_id"],
+        "table_count": len(payload["table_names"]),
+        "changed_tables": len(payload["changed_tables"]),
+        "removed_tables": len(payload["removed_tables"]),
+    }
+
+
+async def classify_job(app, membership_id, params, progress):
+    """
+    :param params: metadata_id, table_names, column_ids, count, only_unclassified
+    :return: job result, per column results are in column_classifications
+    """
+    metadata_id = uuid.UUID(params["metadata_id"])
+    membership_db, columns = await load_bulk_columns(
+        app,
+        metadata_id,
+        membership_id,
+        table_names=params.get("table_names"),
+        column_ids=[uuid.UUID(column_id) for column_id in params.get("column_ids") or []] or None,
+        only_unclassified=params.get("only_unclassified", False)
+    )
+    await progress(0, len(columns))
+
+    async def on_progress(done):
+        await progress(done, len(columns))
+
+    async with app.membership_engines.lease(membership_db) as membership_db_session:
+        results, errors = await bulk_classify(
+            app, membership_db_session, metadata_id, columns, params.get("count", 10), on_progress=on_progress
+        )
+    return {"completed": len(results), "failed": len(errors)}
+
+
+JOB_HANDLERS = {
+    "extract": extract_job,
+    "classify": classify_job,
+}
@@ -0,0 +1,231 @@
+import uuid
+import asyncio
+import logging
+from datetime import datetime
+
+from sqlalchemy import update
+from sqlalchemy.sql import text
+
+from src.models.jobs import JobModel
+from src.security.exceptions import AppException
+
+logger = logging.getLogger(__name__)
+
+# memberships with claimable jobs, oldest waiting first
+# running jobs without heartbeat are claimed again
+CANDIDATE_QUERY = text("""
+    SELECT membership_id FROM jobs
+    WHERE status = 'queued'
+       OR (status = 'running' AND heartbeat_at < now() - make_interval(secs => :stale_timeout))
+    GROUP BY membership_id
+    ORDER BY min(created_at)
+    LIMIT :limit;
+""")
+
+# serializes claims of one membership, held until claim transaction commits
+# two key form keeps it apart from other advisory locks
+MEMBERSHIP_LOCK_QUERY = text("""
+    SELECT pg_try_advisory_xact_lock(:lock_space, hashtext(:membership_id));
+""")
+JOB_CLAIM_LOCK_SPACE = 7301
+
+# claims oldest job of membership when it is under running limit
+# must run after membership lock so its snapshot sees claims committed before
+CLAIM_QUERY = text("""
+    UPDATE jobs SET status = 'running', started_at = coalesce(started_at, now()), heartbeat_at = now(),
+        claim_token = :claim_token
+    WHERE id = (
+        SELECT j.id FROM jobs j
+        WHERE j.membership_id = :membership_id
+        AND (
+            j.status = 'queued'
+            OR (j.status = 'running' AND j.heartbeat_at < now() - make_interval(secs => :stale_timeout))
+        )
+        AND (
+            SELECT count(*) FROM jobs r
+            WHERE r.membership_id = j.membership_id
+              AND r.status = 'running'
+              AND r.heartbeat_at >= now() - make_interval(secs => :stale_timeout)
+        ) < :membership_concurrency
+        ORDER BY j.created_at
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, claim_token, membership_id, kind, params;
+""")
+
+HEARTBEAT_QUERY = text("""
+    UPDATE jobs SET heartbeat_at = now()
+    WHERE id = :id AND status = 'running' AND claim_token = :claim_token
+    RETURNING id;
+""")
+
+
+class JobQueue:
+    """
+    :: Asyncio worker pool running extract and classify jobs from jobs table
+    jobs are claimed with skip locked so every uvicorn worker can run a pool
+    """
+
+    def __init__(self, app, handlers, worker_count=2, membership_concurrency=1,
+                 poll_interval=2, heartbeat_interval=15, stale_timeout=120):
+        self.app = app
+        self.handlers = handlers
+        self.worker_count = worker_count
+        self.membership_concurrency = membership_concurrency
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_timeout = stale_timeout
+        self._wakeup = asyncio.Event()
+        self._workers = []
+        # job id --> (claim token, handler task) running in this process
+        self._running = {}
+
+    def start(self):
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.worker_count)]
+
+    async def stop(self):
+        running = dict(self._running)
+        tasks = [task for _, task in running.values()]
+        for task in [*self._workers, *tasks]:
+            task.cancel()
+        await asyncio.gather(*self._workers, *tasks, return_exceptions=True)
+        # unfinished jobs go back to queue for other workers
+        # jobs already reclaimed elsewhere carry another token and are left alone
+        if running:
+            async with self.app.pg_session() as session:
+                await session.execute(
+                    update(JobModel)
+                    .where(
+                        JobModel.claim_token.in_([claim_token for claim_token, _ in running.values()]),
+                        JobModel.status == "running"
+                    )
+                    .values(status="queued", heartbeat_at=None, claim_token=None)
+                )
+                await session.commit()
+
+    async def submit(self, membership_id, kind, params):
+        if kind not in self.handlers:
+            raise AppException(
+                error_message="Unknown job kind",
+                error_code="exceptions.unknownJobKind",
+                status_code=400
+            )
+        job = JobModel(membership_id=membership_id, kind=kind, params=params)
+        async with self.app.pg_session() as session:
+            session.add(job)
+            await session.commit()
+        self._wakeup.set()
+        return job
+
+    async def cancel(self, job):
+        async with self.app.pg_session() as session:
+            cancelled = (await session.execute(
+                update(JobModel)
+                .where(JobModel.id == job.id, JobModel.status.in_(["queued", "running"]))
+                .values(status="cancelled", finished_at=datetime.utcnow())
+                .returning(JobModel.id)
+            )).first()
+            await session.commit()
+        # jobs running in other processes stop on their next heartbeat
+        running = self._running.get(job.id)
+        if running:
+            running[1].cancel()
+        return cancelled is not None
+
+    async def _claim(self):
+        async with self.app.pg_session() as session:
+            membership_ids = (await session.execute(CANDIDATE_QUERY, {
+                "stale_timeout": self.stale_timeout,
+                "limit": self.worker_count * 2,
+            })).scalars().all()
+            row = None
+            for membership_id in membership_ids:
+                # another worker is claiming for this membership, try next one
+                locked = (await session.execute(MEMBERSHIP_LOCK_QUERY, {
+                    "lock_space": JOB_CLAIM_LOCK_SPACE,
+                    "membership_id": str(membership_id),
+                })).scalar()
+                if not locked:
+                    continue
+                row = (await session.execute(CLAIM_QUERY, {
+                    "claim_token": uuid.uuid4(),
+                    "membership_id": membership_id,
+                    "stale_timeout": self.stale_timeout,
+                    "membership_concurrency": self.membership_concurrency,
+                })).first()
+                if row:
+                    break
+            # releases membership locks
+            await session.commit()
+        return row
+
+    async def _set(self, job_id, claim_token, **values):
+        async with self.app.pg_session() as session:
+            await session.execute(
+                update(JobModel).where(
+                    JobModel.id == job_id, JobModel.status == "running", JobModel.claim_token == claim_token
+                ).values(**values)
+            )
+            await session.commit()
+
+    async def _heartbeat(self, job_id, claim_token):
+        async with self.app.pg_session() as session:
+            alive = (await session.execute(HEARTBEAT_QUERY, {"id": job_id, "claim_token": claim_token})).first()
+            await session.commit()
+        return alive is not None
+
+    async def _run(self, job_id, claim_token, membership_id, kind, params):
+        async def progress(done, total):
+            await self._set(job_id, claim_token, progress_done=done, progress_total=total)
+
+        task = asyncio.create_task(self.handlers[kind](self.app, membership_id, params, progress))
+        self._running[job_id] = (claim_token, task)
+        try:
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=self.heartbeat_interval)
+                if done:
+                    break
+                # job cancelled from api or its heartbeat went stale and another worker claimed it
+                if not await self._heartbeat(job_id, claim_token):
+                    task.cancel()
+                    await asyncio.gather(task, return_exceptions=True)
+                    return
+            try:
+                result = task.result()
+            except asyncio.CancelledError:
+                return
+            except AppException as exc:
+                await self._set(job_id, claim_token, status="failed", error=exc.error_message, finished_at=datetime.utcnow())
+            except Exception as exc:
+                await self._set(job_id, claim_token, status="failed", error=type(exc).__name__, finished_at=datetime.utcnow())
+            else:
+                await self._set(job_id, claim_token, status="completed", result=result, finished_at=datetime.utcnow())
+        except BaseException:
+            # heartbeat or state update failed, handler must not go on untracked
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+            raise
+        finally:
+            self._running.pop(job_id, None)
+
+    async def _work(self):
+        while True:
+            try:
+                job = await self._claim()
+            except Exception:
+                job = None
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            # database errors while recording job state must not end the worker
+            # job is picked up again once its heartbeat is stale
+            try:
+                await self._run(*job)
+            except Exception:
+                logger.exception("job %s failed in worker", job[0])
@@ -0,0 +1,204 @@
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from fastapi import Request
+from fastapi.responses import PlainTextResponse
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def format_labels(label_names, label_values, extra=""):
+    pairs = ['{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+             for name, value in zip(label_names, label_values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.label_names)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = ["# HELP {} {}".format(self.name, self.documentation), "# TYPE {} counter".format(self.name)]
+        for key, value in self._values.items():
+            lines.append("{}{} {}".format(self.name, format_labels(self.label_names, key), value))
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # label values --> [bucket counts, sum, count]
+        self._values = {}
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.label_names)
+        entry = self._values.get(key)
+        if entry is None:
+            entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        # counts per bucket, cumulated on render to keep observe cheap
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started_at, **labels)
+
+    def render(self):
+        lines = ["# HELP {} {}".format(self.name, self.documentation), "# TYPE {} histogram".format(self.name)]
+        for key, (bucket_counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append("{}_bucket{} {}".format(
+                    self.name, format_labels(self.label_names, key, 'le="{}"'.format(le)), cumulative
+                ))
+            lines.append("{}_sum{} {}".format(self.name, format_labels(self.label_names, key), total))
+            lines.append("{}_count{} {}".format(self.name, format_labels(self.label_names, key), count))
+        return lines
+
+
+class CallbackMetric:
+    """
+    :: Gauge or counter read at scrape time, callback returns {label values tuple: value}
+    """
+
+    def __init__(self, name, documentation, label_names, callback, metric_type="gauge"):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.callback = callback
+        self.metric_type = metric_type
+
+    def render(self):
+        lines = ["# HELP {} {}".format(self.name, self.documentation), "# TYPE {} {}".format(self.name, self.metric_type)]
+        for key, value in self.callback().items():
+            lines.append("{}{} {}".format(self.name, format_labels(self.label_names, key), value))
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def unregister_callbacks(self):
+        self._metrics = [metric for metric in self._metrics if not isinstance(metric, CallbackMetric)]
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# process wide registry, every uvicorn worker exposes its own values
+REGISTRY = MetricsRegistry()
+
+REQUEST_DURATION = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ["method", "route", "status"]
+))
+STAGE_DURATION = REGISTRY.register(Histogram(
+    "stage_duration_seconds", "Latency of instrumented stages", ["stage"]
+))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "llm_tokens_total", "LLM tokens used by kind", ["kind"]
+))
+
+
+def time_stage(stage):
+    """
+    :: Context manager timing a stage into stage_duration_seconds
+    """
+    return STAGE_DURATION.time(stage=stage)
+
+
+def instrument_engine_connect(sync_engine, stage):
+    """
+    :: Records time of new dbapi connections of engine
+    """
+    from sqlalchemy import event
+
+    @event.listens_for(sync_engine, "do_connect")
+    def mark_connect_start(dialect, connection_record, cargs, cparams):
+        connection_record.info["connect_started_at"] = time.perf_counter()
+
+    @event.listens_for(sync_engine, "connect")
+    def observe_connect(dbapi_connection, connection_record):
+        started_at = connection_record.info.pop("connect_started_at", None)
+        if started_at is not None:
+            STAGE_DURATION.observe(time.perf_counter() - started_at, stage=stage)
+
+
+def init_metrics(app):
+    @app.middleware("http")
+    async def measure_request(request: Request, call_next):
+        started_at = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            # route template keeps label cardinality bounded
+            route = request.scope.get("route")
+            REQUEST_DURATION.observe(
+                time.perf_counter() - started_at,
+                method=request.method,
+                route=route.path if route else "unmatched",
+                status=status
+            )
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+def register_app_metrics(app):
+    """
+    :: Metrics reading app state at scrape time, called from lifespan
+    """
+    REGISTRY.unregister_callbacks()
+    REGISTRY.register(CallbackMetric(
+        "executor_pending", "Running and queued tasks of cpu bound executors", ["executor"],
+        lambda: {(executor.name,): executor.pending for executor in (app.password_executor, app.decryption_executor)}
+    ))
+    REGISTRY.register(CallbackMetric(
+        "classification_cache_lookups_total", "Classification cache lookups by result", ["result"],
+        lambda: {(result,): value for result, value in app.classification_cache.stats.items()},
+        metric_type="counter"
+    ))
+    REGISTRY.register(CallbackMetric(
+        "auth_cache_lookups_total", "Credential cache lookups by result", ["result"],
+        lambda: {(result,): value for result, value in app.auth_cache.stats.items()},
+        metric_type="counter"
+    ))
+    REGISTRY.register(CallbackMetric(
+        "membership_engines_open", "Open membership database engines", [],
+        lambda: {(): len(app.membership_engines)}
+    ))
+    REGISTRY.register(CallbackMetric(
+        "llm_requests_in_flight", "Llm requests running upstream, bounded by LLM_MAX_IN_FLIGHT", [],
+        lambda: {(): app.llm_gateway.in_flight}
+    ))
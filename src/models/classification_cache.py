@@ -0,0 +1,14 @@
+from datetime import datetime
+
+from sqlmodel import Field, SQLModel, Column, JSON
+
+from src.models import SysModel
+
+
+class ClassificationCacheModel(SQLModel, SysModel, table=True):
+    __tablename__ = "classification_cache"
+
+    # sha256 of model name, prompt template and normalized values
+    key: str = Field(primary_key=True, nullable=False)
+    result: dict = Field(sa_column=Column(JSON))
+    expires_at: datetime = Field(nullable=False, index=True)
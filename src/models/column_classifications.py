@@ -0,0 +1,37 @@
+import uuid
+
+from pydantic import Field as pydantic_field, BaseModel
+from sqlalchemy import Index, String
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlmodel import Field, SQLModel, Column, JSON
+
+from src.models import SysModel
+
+# hard cap of sampled values per column, SAMPLING_MAX_COUNT may lower it
+MAX_SAMPLE_COUNT = 1000
+
+
+class ColumnClassificationModel(SQLModel, SysModel, table=True):
+    __tablename__ = "column_classifications"
+    # label filter of column search
+    __table_args__ = (
+        Index("ix_column_classifications_labels", "labels", postgresql_using="gin"),
+    )
+
+    # no foreign key to metadata_columns, rows of changed tables
+    # are rewritten on extraction with same column ids
+    column_id: uuid.UUID = Field(primary_key=True, nullable=False)
+    metadata_id: uuid.UUID = Field(foreign_key="database_metadata.id", ondelete="CASCADE", index=True)
+    # completed or failed
+    status: str = Field(nullable=False)
+    result: dict | None = Field(default=None, sa_column=Column(JSON))
+    # classes of result with at least one value, kept in sync on every save
+    labels: list[str] | None = Field(default=None, sa_column=Column(ARRAY(String)))
+    error: str | None = Field(default=None)
+
+
+class BulkClassifyRequest(BaseModel):
+    table_names: list[str] | None = pydantic_field(default=None, description="classify all columns of these tables, schema.table outside public")
+    column_ids: list[uuid.UUID] | None = pydantic_field(default=None, description="classify only these columns")
+    count: int = pydantic_field(default=10, ge=1, le=MAX_SAMPLE_COUNT, description="sampled value count per column")
+    only_unclassified: bool = pydantic_field(default=False, description="skip columns with completed result")
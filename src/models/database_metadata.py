@@ -1,6 +1,7 @@
 import uuid
 from datetime import datetime
 
+from sqlalchemy import BigInteger, Index, LargeBinary, text
 from sqlmodel import Field, SQLModel, Column, JSON
 
 from src.models import PkModel, SysModel
@@ -8,14 +9,109 @@ from src.models import PkModel, SysModel
 
 class DatabaseMetadataModel(SQLModel, PkModel, SysModel, table=True):
     __tablename__ = "database_metadata"
+    # keyset pagination of list_metadata
+    __table_args__ = (
+        Index("ix_database_metadata_created_at_id", text("created_at DESC"), text("id DESC")),
+    )
 
-    db_id: uuid.UUID | None = Field(foreign_key="membership_databases.id")
+    db_id: uuid.UUID | None = Field(foreign_key="membership_databases.id", index=True)
     # name metadata reserved to sqlalchemy that why I go with metadata_items
-    metadata_items: list[dict] = Field(default_factory=list,sa_column=Column(JSON))
+    metadata_items: list[dict] | None = Field(default_factory=list,sa_column=Column(JSON(none_as_null=True)))
+    # metadata_items encoded with src.db.metadata_codec when metadata_storage is compressed
+    # only one of metadata_items and metadata_blob is set
+    metadata_blob: bytes | None = Field(default=None, sa_column=Column(LargeBinary))
+    # stored on extraction so listing does not decode metadata_items
+    table_count: int | None = Field(default=None)
+    # content hash of metadata_items set on extraction, conditional get compares it
+    etag: str | None = Field(default=None)
+
+
+class MetadataVersionModel(SQLModel, PkModel, SysModel, table=True):
+    __tablename__ = "metadata_versions"
+    # latest versions first on diff and listing
+    __table_args__ = (
+        Index("ix_metadata_versions_metadata_id_extracted_at", "metadata_id", text("extracted_at DESC")),
+    )
+
+    # earlier content of database_metadata row, saved before extraction overwrites it
+    # only schema changes add a version, bounded by metadata_history_size
+    metadata_id: uuid.UUID = Field(foreign_key="database_metadata.id", ondelete="CASCADE", nullable=False)
+    # always src.db.metadata_codec encoded, history is rarely read
+    metadata_blob: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    table_count: int | None = Field(default=None)
+    etag: str | None = Field(default=None)
+    # updated_at of database_metadata row when this content was extracted
+    extracted_at: datetime = Field(nullable=False)
+
+
+class MetadataVersionItem(SQLModel):
+    version_id: uuid.UUID
+    extracted_at: datetime
+    table_count: int
+    etag: str | None
 
 
 class MetadataListItem(SQLModel):
     metadata_id: uuid.UUID
     database_name: str
     created_at: datetime
-    table_count: int
\ No newline at end of file
+    table_count: int
+
+
+class ColumnSearchItem(SQLModel):
+    column_id: uuid.UUID
+    metadata_id: uuid.UUID
+    database_name: str
+    schema_name: str
+    table_name: str
+    name: str
+    type: str | None
+    nullable: bool
+    labels: list[str] | None
+    # only set on fuzzy match
+    similarity: float | None = None
+
+
+class MetadataTableModel(SQLModel, PkModel, table=True):
+    __tablename__ = "metadata_tables"
+    __table_args__ = (
+        Index(
+            "ix_metadata_tables_metadata_id_schema_table",
+            "metadata_id", text('schema_name COLLATE "C"'), text('table_name COLLATE "C"')
+        ),
+    )
+
+    # normalized copy of metadata_items tables
+    # written per changed table on extraction
+    metadata_id: uuid.UUID = Field(foreign_key="database_metadata.id", ondelete="CASCADE", index=True)
+    schema_name: str = Field(default="public", nullable=False, sa_column_kwargs={"server_default": "public"})
+    table_name: str = Field(nullable=False)
+    structure_hash: str | None = Field(default=None)
+    # catalog estimates, refreshed on every extraction
+    estimated_rows: int | None = Field(default=None, sa_type=BigInteger)
+    total_bytes: int | None = Field(default=None, sa_type=BigInteger)
+    table_bytes: int | None = Field(default=None, sa_type=BigInteger)
+    primary_key: list[str] | None = Field(default=None, sa_column=Column(JSON))
+    indexes: list[dict] | None = Field(default=None, sa_column=Column(JSON))
+
+
+class MetadataColumnModel(SQLModel, table=True):
+    __tablename__ = "metadata_columns"
+    # trigram index on name is created in migrations, it needs pg_trgm extension first
+    __table_args__ = (
+        Index("ix_metadata_columns_type", "type"),
+    )
+
+    # column_id of metadata_items so classify
+    # can fetch single column by primary key
+    id: uuid.UUID = Field(primary_key=True, nullable=False)
+    metadata_id: uuid.UUID = Field(foreign_key="database_metadata.id", ondelete="CASCADE", index=True)
+    table_id: uuid.UUID = Field(foreign_key="metadata_tables.id", ondelete="CASCADE", index=True)
+    name: str = Field(nullable=False)
+    type: str | None = Field(default=None)
+    nullable: bool = Field(nullable=False)
+    position: int = Field(nullable=False)
+    # pg_stats values, null until table is analyzed
+    null_frac: float | None = Field(default=None)
+    n_distinct: float | None = Field(default=None)
+    avg_width: int | None = Field(default=None)
\ No newline at end of file
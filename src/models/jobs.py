@@ -0,0 +1,50 @@
+import uuid
+from datetime import datetime
+
+from pydantic import Field as pydantic_field, BaseModel
+from sqlmodel import Field, SQLModel, Column, JSON
+
+from src.models import PkModel, SysModel
+from src.models.column_classifications import BulkClassifyRequest
+
+
+class JobModel(SQLModel, PkModel, SysModel, table=True):
+    __tablename__ = "jobs"
+
+    membership_id: uuid.UUID = Field(foreign_key="memberships.id", index=True)
+    # extract or classify
+    kind: str = Field(nullable=False)
+    # queued running completed failed cancelled
+    status: str = Field(default="queued", nullable=False, index=True)
+    params: dict = Field(default_factory=dict, sa_column=Column(JSON))
+    progress_done: int = Field(default=0, nullable=False)
+    progress_total: int = Field(default=0, nullable=False)
+    result: dict | None = Field(default=None, sa_column=Column(JSON))
+    error: str | None = Field(default=None)
+    started_at: datetime | None = Field(default=None)
+    finished_at: datetime | None = Field(default=None)
+    # touched by worker while running, stale running jobs are picked up again
+    heartbeat_at: datetime | None = Field(default=None)
+    # new on every claim, only the worker holding it may heartbeat or finish the job
+    claim_token: uuid.UUID | None = Field(default=None)
+
+
+class JobSubmitRequest(BaseModel):
+    kind: str = pydantic_field(description="extract or classify")
+    params: dict = pydantic_field(default_factory=dict, description="job parameters of given kind, see ExtractJobParams and ClassifyJobParams")
+
+
+class ExtractJobParams(BaseModel):
+    db_id: uuid.UUID = pydantic_field(description="membership database to extract")
+    incremental: bool = pydantic_field(default=True, description="only read tables whose structure changed")
+
+
+class ClassifyJobParams(BulkClassifyRequest):
+    metadata_id: uuid.UUID = pydantic_field(description="metadata whose columns are classified")
+
+
+# job kind --> params model checked on submit
+JOB_PARAMS = {
+    "extract": ExtractJobParams,
+    "classify": ClassifyJobParams,
+}
@@ -1,5 +1,6 @@
 import uuid
 
+from sqlalchemy.engine import URL
 from sqlmodel import Field, SQLModel, Column, VARCHAR, UniqueConstraint
 from pydantic import Field as pydantic_field, BaseModel
 
@@ -23,17 +24,40 @@ class MembershipDbModel(SQLModel, PkModel, SysModel, table=True):
     host: str = Field(nullable=False)
     port: int = Field(nullable=False)
     username: str = Field(nullable=False)
+    # stored encrypted with CredentialCipher, row id as associated data
     password: str = Field(sa_column=Column("password", VARCHAR))
     database_name: str = Field(nullable=False)
 
-    def create_connection_string(self):
+    def connection_url(self, password):
+        """
+        :param password: decrypted password
+        :return: sqlalchemy URL, credentials escaped
+        """
         driver = self.driver
         if "postgres" in self.driver:
             driver = "postgresql+asyncpg"
 
-        return f"{driver}://{self.username}:{self.password}@{self.host}:{self.port}/{self.database_name}"
+        return URL.create(
+            drivername=driver,
+            username=self.username,
+            password=password,
+            host=self.host,
+            port=self.port,
+            database=self.database_name,
+        )
 
 
 
 class EncryptedMembershipDatabase(BaseModel):
-    cipher: str = pydantic_field(description="encrypted database credentials json")
+    # envelope: rsa wrapped aes-gcm data key and aes-gcm encrypted credentials json
+    key_id: str | None = pydantic_field(default=None, description="id of public key from /api/v1/encryption-key")
+    wrapped_key: str | None = pydantic_field(default=None, description="base64 rsa oaep sha256 encrypted 256 bit aes key")
+    nonce: str | None = pydantic_field(default=None, description="base64 12 byte aes-gcm nonce")
+    ciphertext: str | None = pydantic_field(default=None, description="base64 aes-gcm encrypted credentials json, key_id as associated data")
+    # legacy format
+    cipher: str | None = pydantic_field(default=None, description="hex rsa oaep encrypted database credentials json")
+
+
+class FleetExtractRequest(BaseModel):
+    db_ids: list[uuid.UUID] | None = pydantic_field(default=None, description="databases to extract, all databases of membership when empty")
+    incremental: bool = pydantic_field(default=True, description="only read tables whose structure changed")
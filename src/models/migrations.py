@@ -0,0 +1,64 @@
+from sqlalchemy.sql import text
+
+# create_all only creates missing tables
+# columns and indexes added to existing tables go here
+# every statement must be safe to run on each startup
+MIGRATIONS = [
+    "ALTER TABLE database_metadata ADD COLUMN IF NOT EXISTS table_count INTEGER",
+    """
+    UPDATE database_metadata SET table_count = json_array_length(metadata_items)
+    WHERE table_count IS NULL AND metadata_items IS NOT NULL
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_database_metadata_db_id ON database_metadata (db_id)",
+    "CREATE INDEX IF NOT EXISTS ix_database_metadata_created_at_id ON database_metadata (created_at DESC, id DESC)",
+    "ALTER TABLE metadata_tables ADD COLUMN IF NOT EXISTS schema_name VARCHAR NOT NULL DEFAULT 'public'",
+    "DROP INDEX IF EXISTS ix_metadata_tables_metadata_id_table_name",
+    """
+    CREATE INDEX IF NOT EXISTS ix_metadata_tables_metadata_id_schema_table
+    ON metadata_tables (metadata_id, schema_name COLLATE "C", table_name COLLATE "C")
+    """,
+    "ALTER TABLE database_metadata ADD COLUMN IF NOT EXISTS etag VARCHAR",
+    "ALTER TABLE database_metadata ADD COLUMN IF NOT EXISTS metadata_blob BYTEA",
+    # already compressed, keep postgres from compressing again
+    # altered only once, ALTER TABLE takes an access exclusive lock
+    """
+    DO $$
+    BEGIN
+        IF EXISTS (
+            SELECT 1 FROM pg_attribute
+            WHERE attrelid = 'database_metadata'::regclass AND attname = 'metadata_blob' AND attstorage <> 'e'
+        ) THEN
+            ALTER TABLE database_metadata ALTER COLUMN metadata_blob SET STORAGE EXTERNAL;
+        END IF;
+    END $$
+    """,
+    "ALTER TABLE metadata_tables ADD COLUMN IF NOT EXISTS estimated_rows BIGINT",
+    "ALTER TABLE metadata_tables ADD COLUMN IF NOT EXISTS total_bytes BIGINT",
+    "ALTER TABLE metadata_tables ADD COLUMN IF NOT EXISTS table_bytes BIGINT",
+    "ALTER TABLE metadata_tables ADD COLUMN IF NOT EXISTS primary_key JSON",
+    "ALTER TABLE metadata_tables ADD COLUMN IF NOT EXISTS indexes JSON",
+    "ALTER TABLE metadata_columns ADD COLUMN IF NOT EXISTS null_frac FLOAT",
+    "ALTER TABLE metadata_columns ADD COLUMN IF NOT EXISTS n_distinct FLOAT",
+    "ALTER TABLE metadata_columns ADD COLUMN IF NOT EXISTS avg_width INTEGER",
+    # column search, rows are rewritten per changed table on extraction so indexes stay current
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_metadata_columns_name_trgm ON metadata_columns USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_metadata_columns_type ON metadata_columns (type)",
+    "ALTER TABLE column_classifications ADD COLUMN IF NOT EXISTS labels VARCHAR[]",
+    """
+    UPDATE column_classifications SET labels = ARRAY(
+        SELECT key FROM json_each(result)
+        WHERE json_typeof(value) = 'array' AND json_array_length(value) > 0
+    )
+    WHERE labels IS NULL AND result IS NOT NULL
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_column_classifications_labels ON column_classifications USING gin (labels)",
+    "ALTER TABLE jobs ADD COLUMN IF NOT EXISTS claim_token UUID",
+]
+
+
+async def run_migrations(connection):
+    # index builds and backfills may outlast statement timeout of system engine
+    await connection.execute(text("SET LOCAL statement_timeout = 0"))
+    for statement in MIGRATIONS:
+        await connection.execute(text(statement))
@@ -9,4 +9,20 @@ LLM_RESPONSE_SCHEMA = {
         "description": "Grouped classification result where keys are the classes."
     },
     "strict": True
+}
+
+BULK_LLM_RESPONSE_SCHEMA = {
+    "name": "bulk_classification_result",
+    "schema": {
+        "type": "object",
+        "additionalProperties": {
+            "type": "object",
+            "additionalProperties": {
+                "type": "array",
+                "items": {"type": "string"}
+            }
+        },
+        "description": "Grouped classification result per column where keys are the column keys."
+    },
+    "strict": True
 }
\ No newline at end of file
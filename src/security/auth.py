@@ -4,6 +4,7 @@ from fastapi import Request, Depends
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from sqlmodel import select
 
+from src.metrics import time_stage
 from src.security.hash_helpers import verify_password
 from src.models.memberships import MembershipModel
 from src.models.roles import RoleModel
@@ -16,28 +17,69 @@ async def authenticate_and_authorize(credentials: Annotated[HTTPBasicCredentials
     :: Authentication and authorization middleware for required endpoints
     """
 
+    with time_stage("authenticate_and_authorize"):
+        return await _authenticate_and_authorize(credentials, rq)
+
+
+async def load_membership_role(pg_session, username):
+    """
+    :return: (membership, role) row, role is None when membership has no role
+    """
+    async with pg_session() as session:
+        return (await session.exec(
+            select(MembershipModel, RoleModel)
+            .join(RoleModel, RoleModel.name == MembershipModel.role_id, isouter=True)
+            .where(MembershipModel.username == username)
+        )).first()
+
+
+async def _authenticate_and_authorize(credentials, rq):
     # action like create_membership
     # permission --> api.create_membership
     # required permission to access this endpoint
     required_permission = "api." + rq.scope["route"].name
 
-    async with rq.app.pg_session() as session:
-        membership, role = (await session.exec(select(MembershipModel, RoleModel).where(MembershipModel.username == credentials.username))).first()
-        if not membership:
-            raise AppException(
-                error_message="Email or password missmatch",
-                error_code="exceptions.emailOrPasswordMissmatch",
-                status_code=401
-            )
-        if not role or required_permission not in role.permissions:
+    # verified credentials skip db query and argon2 verify
+    auth_cache = rq.app.auth_cache
+    credential_key = auth_cache.credential_key(credentials.username, credentials.password)
+    membership = auth_cache.get_membership(credential_key)
+    if membership:
+        permissions = auth_cache.get_permissions(membership.role_id)
+        if permissions is None:
+            async with rq.app.pg_read_session() as session:
+                role = (await session.exec(select(RoleModel).where(RoleModel.name == membership.role_id))).first()
+            permissions = role.permissions if role else []
+            auth_cache.set_permissions(membership.role_id, permissions)
+        if required_permission not in permissions:
             raise AppException(
                 error_message="Membership has no permission take this action",
                 error_code="exceptions.NotAuthorized",
                 status_code=403
             )
+        return membership
 
-    await verify_password(membership.password, credentials.password, rq.app.thread_pool)
+    row = await load_membership_role(rq.app.pg_read_session, credentials.username)
+    # replica may not have a just created membership yet
+    if not row and rq.app.pg_read_session is not rq.app.pg_session:
+        row = await load_membership_role(rq.app.pg_session, credentials.username)
+    if not row:
+        raise AppException(
+            error_message="Email or password missmatch",
+            error_code="exceptions.emailOrPasswordMissmatch",
+            status_code=401
+        )
+    membership, role = row
+    if not role or required_permission not in role.permissions:
+        raise AppException(
+            error_message="Membership has no permission take this action",
+            error_code="exceptions.NotAuthorized",
+            status_code=403
+        )
 
+    await verify_password(membership.password, credentials.password, rq.app.password_executor)
+
+    auth_cache.set_membership(credential_key, membership)
+    auth_cache.set_permissions(role.name, role.permissions)
     return membership
 
-    
\ No newline at end of file
+
@@ -0,0 +1,68 @@
+import os
+import time
+from collections import OrderedDict
+from hashlib import blake2b
+
+
+class AuthCache:
+    """
+    :: Bounded ttl cache of verified credentials and role permissions
+    lets repeat requests skip membership query and argon2 verify
+    api has no role or membership update paths, roles and passwords
+    change out of band so expiry is ttl only, keep ttl short
+    """
+
+    def __init__(self, max_size=10000, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        # per process secret, digests are useless outside this process
+        self._secret = os.urandom(32)
+        # digest --> (membership, expires at)
+        self._credentials = OrderedDict()
+        # role name --> (permissions, expires at)
+        self._permissions = {}
+        self.stats = {"hits": 0, "misses": 0}
+
+    def credential_key(self, username, password):
+        digest = blake2b(key=self._secret, digest_size=32)
+        # length prefix keeps username/password boundary unambiguous
+        digest.update("{}:{}".format(len(username), username).encode("utf-8"))
+        digest.update(password.encode("utf-8"))
+        return digest.digest()
+
+    def get_membership(self, key):
+        entry = self._credentials.get(key)
+        if not entry:
+            self.stats["misses"] += 1
+            return None
+        membership, expires_at = entry
+        if expires_at < time.monotonic():
+            self._credentials.pop(key, None)
+            self.stats["misses"] += 1
+            return None
+        self._credentials.move_to_end(key)
+        self.stats["hits"] += 1
+        return membership
+
+    def set_membership(self, key, membership):
+        self._credentials[key] = (membership, time.monotonic() + self.ttl)
+        self._credentials.move_to_end(key)
+        while len(self._credentials) > self.max_size:
+            self._credentials.popitem(last=False)
+
+    def get_permissions(self, role_name):
+        entry = self._permissions.get(role_name)
+        if not entry:
+            return None
+        permissions, expires_at = entry
+        if expires_at < time.monotonic():
+            self._permissions.pop(role_name, None)
+            return None
+        return permissions
+
+    def set_permissions(self, role_name, permissions):
+        self._permissions[role_name] = (frozenset(permissions or []), time.monotonic() + self.ttl)
+
+    def clear(self):
+        self._credentials.clear()
+        self._permissions.clear()
@@ -1,8 +1,24 @@
+import os
 import json
-from asyncio import wrap_future
+import time
+import base64
+from hashlib import sha256, blake2b
+from collections import OrderedDict
+
+from cryptography.exceptions import InvalidTag
 from cryptography.hazmat.primitives.asymmetric import rsa, padding
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives import serialization, hashes
 
+from src.metrics import time_stage
+from src.security.exceptions import AppException
+
+OAEP_PADDING = padding.OAEP(
+    mgf=padding.MGF1(algorithm=hashes.SHA256()),
+    algorithm=hashes.SHA256(),
+    label=None
+)
 
 
 def generate_private_key():
@@ -19,16 +35,235 @@ def generate_private_key():
     with open("encryption_private_key.pem", "wb") as f:
         f.write(pem_private)
 
-async def decrypt_text(private_key, cipher, threadpool):
-    ciphertext = bytes.fromhex(cipher)
-    json_text = await wrap_future(
-        threadpool.submit(
-            private_key.decrypt, ciphertext,
-            padding.OAEP(
-                mgf=padding.MGF1(algorithm=hashes.SHA256()),
-                algorithm=hashes.SHA256(),
-                label=None
-            )
+
+def public_key_id(public_key):
+    """
+    :: Short id of public key, sent with envelopes to pick the private key on rotation
+    """
+    der = public_key.public_bytes(
+        encoding=serialization.Encoding.DER,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return sha256(der).hexdigest()[:16]
+
+
+def load_private_keys(paths):
+    """
+    :param paths: pem paths, first one is current key
+    :return: key id --> private key, current key id
+    """
+    keys = {}
+    for path in paths:
+        with open(path, "rb") as f:
+            private_key = serialization.load_pem_private_key(f.read(), password=None)
+        keys[public_key_id(private_key.public_key())] = private_key
+    return keys, public_key_id(keys[next(iter(keys))].public_key()) if keys else None
+
+
+# private keys of executor worker, set by load_worker_private_keys
+# key objects are not picklable so process workers load their own copy
+worker_private_keys = {}
+worker_current_key_id = None
+
+
+def load_worker_private_keys(paths):
+    """
+    :: Executor initializer, runs once per worker thread or process
+    """
+    global worker_private_keys, worker_current_key_id
+    if not worker_private_keys:
+        worker_private_keys, worker_current_key_id = load_private_keys(paths)
+
+
+def oaep_decrypt(ciphertext, key_id=None):
+    """
+    :return: plain bytes, None when key id is unknown
+    """
+    private_key = worker_private_keys.get(key_id or worker_current_key_id)
+    if private_key is None:
+        return None
+    return private_key.decrypt(ciphertext, OAEP_PADDING)
+
+
+class DataKeyCache:
+    """
+    :: Short lived cache of unwrapped envelope data keys
+    clients reusing one data key for several submissions
+    pay the rsa unwrap only once per ttl
+    """
+
+    def __init__(self, max_size=1000, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        # digest of key id and wrapped key --> (data key, expires at)
+        self._keys = OrderedDict()
+
+    @staticmethod
+    def key(key_id, wrapped_key):
+        digest = blake2b(digest_size=32)
+        digest.update(key_id.encode("utf-8"))
+        digest.update(wrapped_key)
+        return digest.digest()
+
+    def get(self, key):
+        entry = self._keys.get(key)
+        if not entry:
+            return None
+        data_key, expires_at = entry
+        if expires_at < time.monotonic():
+            self._keys.pop(key, None)
+            return None
+        return data_key
+
+    def set(self, key, data_key):
+        self._keys[key] = (data_key, time.monotonic() + self.ttl)
+        self._keys.move_to_end(key)
+        while len(self._keys) > self.max_size:
+            self._keys.popitem(last=False)
+
+
+def encrypt_envelope(public_key, data, data_key=None, wrapped_key=None):
+    """
+    :: Client side envelope encryption, reference for api clients
+    :param data: json serializable credentials
+    :param data_key: 32 byte aes key to reuse across submissions, new one when empty
+    :param wrapped_key: wrapped_key of earlier envelope with same data_key,
+    reusing it lets the server skip rsa unwrap while the data key is cached
+    :return: envelope fields of EncryptedMembershipDatabase
+    """
+    key_id = public_key_id(public_key)
+    if not (data_key and wrapped_key):
+        data_key = data_key or AESGCM.generate_key(bit_length=256)
+        wrapped_key = base64.b64encode(public_key.encrypt(data_key, OAEP_PADDING)).decode("ascii")
+    # nonce must never repeat for the same data key
+    nonce = os.urandom(12)
+    return {
+        "key_id": key_id,
+        "wrapped_key": wrapped_key,
+        "nonce": base64.b64encode(nonce).decode("ascii"),
+        # key id bound as associated data
+        "ciphertext": base64.b64encode(
+            AESGCM(data_key).encrypt(nonce, json.dumps(data).encode("utf-8"), key_id.encode("utf-8"))
+        ).decode("ascii"),
+    }
+
+
+class CredentialCipher:
+    """
+    :: Encrypts secrets stored in system database with aes-gcm keys
+    derived from app private keys, stored value keeps key id for rotation
+    format enc:v1:<key id>:<base64 nonce + ciphertext>
+    """
+
+    PREFIX = "enc:v1:"
+
+    def __init__(self, private_keys, current_key_id):
+        # key id --> derived aes key
+        self._keys = {key_id: self.derive_key(private_key) for key_id, private_key in private_keys.items()}
+        self.current_key_id = current_key_id
+
+    @staticmethod
+    def derive_key(private_key):
+        secret = private_key.private_bytes(
+            encoding=serialization.Encoding.DER,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption(),
         )
+        return HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=b"stored-credentials").derive(secret)
+
+    def is_encrypted(self, value):
+        return value is not None and value.startswith(self.PREFIX)
+
+    def encrypt(self, plain, associated_data):
+        """
+        :param associated_data: row id, binds value to its row
+        """
+        nonce = os.urandom(12)
+        ciphertext = AESGCM(self._keys[self.current_key_id]).encrypt(
+            nonce, plain.encode("utf-8"), associated_data.encode("utf-8")
+        )
+        return "{}{}:{}".format(self.PREFIX, self.current_key_id, base64.b64encode(nonce + ciphertext).decode("ascii"))
+
+    def decrypt(self, value, associated_data):
+        # rows written before encryption at rest are still plain
+        if not self.is_encrypted(value):
+            return value
+        key_id, payload = value[len(self.PREFIX):].split(":", 1)
+        payload = base64.b64decode(payload)
+        return AESGCM(self._keys[key_id]).decrypt(
+            payload[:12], payload[12:], associated_data.encode("utf-8")
+        ).decode("utf-8")
+
+
+def invalid_cipher():
+    return AppException(
+        error_message="Encrypted payload can not be decrypted",
+        error_code="exceptions.invalidCipher",
+        status_code=400
     )
+
+
+async def decrypt_text(cipher, executor):
+    """
+    :param cipher: hex of rsa oaep encrypted json, legacy format
+    :param executor: app decryption executor initialized with load_worker_private_keys
+    """
+    ciphertext = bytes.fromhex(cipher)
+    with time_stage("decrypt_text"):
+        json_text = await executor.run(oaep_decrypt, ciphertext)
     return json.loads(json_text.decode("utf-8"))
+
+
+async def decrypt_envelope(key_id, wrapped_key, nonce, ciphertext, executor, data_key_cache):
+    """
+    :: Decrypts rsa wrapped aes-gcm envelope, fields base64 encoded
+    only the data key unwrap runs on executor, body decrypt is cheap
+    """
+    try:
+        wrapped_key = base64.b64decode(wrapped_key, validate=True)
+        nonce = base64.b64decode(nonce, validate=True)
+        ciphertext = base64.b64decode(ciphertext, validate=True)
+    except ValueError:
+        raise invalid_cipher()
+
+    cache_key = data_key_cache.key(key_id, wrapped_key)
+    data_key = data_key_cache.get(cache_key)
+    if data_key is None:
+        with time_stage("decrypt_text"):
+            try:
+                data_key = await executor.run(oaep_decrypt, wrapped_key, key_id)
+            except ValueError:
+                raise invalid_cipher()
+        if data_key is None:
+            raise AppException(
+                error_message="Unknown encryption key id",
+                error_code="exceptions.unknownKeyId",
+                status_code=400
+            )
+        data_key_cache.set(cache_key, data_key)
+
+    try:
+        json_text = AESGCM(data_key).decrypt(nonce, ciphertext, key_id.encode("utf-8"))
+    except (InvalidTag, ValueError):
+        raise invalid_cipher()
+    return json.loads(json_text.decode("utf-8"))
+
+
+async def decrypt_credentials(encrypted_payload, executor, data_key_cache):
+    """
+    :param encrypted_payload: EncryptedMembershipDatabase, envelope or legacy hex cipher
+    """
+    if encrypted_payload.wrapped_key:
+        if not (encrypted_payload.key_id and encrypted_payload.nonce and encrypted_payload.ciphertext):
+            raise invalid_cipher()
+        return await decrypt_envelope(
+            encrypted_payload.key_id,
+            encrypted_payload.wrapped_key,
+            encrypted_payload.nonce,
+            encrypted_payload.ciphertext,
+            executor,
+            data_key_cache
+        )
+    if encrypted_payload.cipher:
+        return await decrypt_text(encrypted_payload.cipher, executor)
+    raise invalid_cipher()
@@ -0,0 +1,60 @@
+import os
+from asyncio import wrap_future
+from multiprocessing import get_context
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from src.security.exceptions import AppException
+
+
+def default_workers(kind):
+    # same sizes concurrent.futures picks when max_workers is None
+    if kind == "thread":
+        return min(32, (os.cpu_count() or 1) + 4)
+    return os.cpu_count() or 1
+
+
+class BoundedExecutor:
+    """
+    :: Thread or process pool of one cpu bound workload class
+    submissions beyond workers + max_queue are shed with 503
+    instead of queueing behind other requests forever
+    process pools need picklable module level functions and arguments,
+    children import only their modules, main.py skips app setup in them
+    """
+
+    def __init__(self, name, kind="thread", workers=None, max_queue=64, initializer=None, initargs=()):
+        self.name = name
+        self.kind = kind
+        self.workers = workers or default_workers(kind)
+        if kind == "process":
+            # spawn, forking a process running event loop and threads is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=get_context("spawn"),
+                initializer=initializer, initargs=initargs
+            )
+        elif kind == "thread":
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix=name,
+                initializer=initializer, initargs=initargs
+            )
+        else:
+            raise ValueError("unknown executor kind {}".format(kind))
+        self.max_pending = self.workers + max_queue
+        # running and queued submissions
+        self.pending = 0
+
+    async def run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            raise AppException(
+                error_message="Server is busy, try again later",
+                error_code="exceptions.serverBusy",
+                status_code=503
+            )
+        self.pending += 1
+        try:
+            return await wrap_future(self._executor.submit(fn, *args))
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
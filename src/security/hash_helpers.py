@@ -1,27 +1,42 @@
-from asyncio import wrap_future
-
 from argon2 import PasswordHasher
+from argon2.exceptions import VerificationError
 
+from src.metrics import time_stage
 from src.security.exceptions import AppException
 
 hasher = PasswordHasher()
 
-async def hash_password(password, threadpool):
+
+# module level so they can run in process pool executor
+def argon2_hash(password):
+    return hasher.hash(password)
+
+
+def argon2_verify(password_hash, provided_password):
+    try:
+        return hasher.verify(password_hash, provided_password)
+    except VerificationError:
+        return False
+
+
+async def hash_password(password, executor):
     """
 
     :param password:
-    :param threadpool: app global threadpool
+    :param executor: app password executor
     :return:hashed password
     """
     # hashing is heavily cpu bound
-    # wrapping this future to
-    # event loop will prevent
-    # api blocking
-    return await wrap_future(threadpool.submit(hasher.hash, password))
+    # running it on executor
+    # will prevent api blocking
+    with time_stage("hash_password"):
+        return await executor.run(argon2_hash, password)
 
 
-async def verify_password(password, provided_password, threadpool):
-    is_verified = await wrap_future(threadpool.submit(hasher.verify, password, provided_password))
+async def verify_password(password, provided_password, executor):
+    # includes wait in executor queue
+    with time_stage("verify_password"):
+        is_verified = await executor.run(argon2_verify, password, provided_password)
     if not is_verified:
         raise AppException(
             error_message="Email or password missmatch",
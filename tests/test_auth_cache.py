@@ -0,0 +1,64 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.security import auth_cache as auth_cache_module
+from src.security.auth_cache import AuthCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(auth_cache_module, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def membership(username):
+    return SimpleNamespace(username=username, role_id="admin")
+
+
+def test_membership_cached_until_ttl(clock):
+    cache = AuthCache(ttl=60)
+    key = cache.credential_key("alice", "secret")
+    assert cache.get_membership(key) is None
+    cache.set_membership(key, membership("alice"))
+
+    clock[0] += 59
+    assert cache.get_membership(key).username == "alice"
+    clock[0] += 2
+    assert cache.get_membership(key) is None
+    assert cache.stats == {"hits": 1, "misses": 2}
+
+
+def test_permissions_cached_until_ttl(clock):
+    cache = AuthCache(ttl=60)
+    cache.set_permissions("admin", ["api.get_metadata"])
+    assert cache.get_permissions("admin") == frozenset(["api.get_metadata"])
+    cache.set_permissions("empty", None)
+    assert cache.get_permissions("empty") == frozenset()
+
+    clock[0] += 61
+    assert cache.get_permissions("admin") is None
+
+
+def test_credential_key_depends_on_username_and_password():
+    cache = AuthCache()
+    key = cache.credential_key("alice", "secret")
+    assert key == cache.credential_key("alice", "secret")
+    assert key != cache.credential_key("alice", "other")
+    # length prefix keeps the boundary unambiguous
+    assert cache.credential_key("ab", "c") != cache.credential_key("a", "bc")
+    # per process secret
+    assert key != AuthCache().credential_key("alice", "secret")
+
+
+def test_least_recently_used_credentials_dropped_over_max_size(clock):
+    cache = AuthCache(max_size=2)
+    keys = [cache.credential_key(name, "secret") for name in ["a", "b", "c"]]
+    cache.set_membership(keys[0], membership("a"))
+    cache.set_membership(keys[1], membership("b"))
+    assert cache.get_membership(keys[0]) is not None
+    cache.set_membership(keys[2], membership("c"))
+    assert cache.get_membership(keys[1]) is None
+    assert cache.get_membership(keys[0]) is not None
+    assert cache.get_membership(keys[2]) is not None
@@ -0,0 +1,59 @@
+from types import SimpleNamespace
+
+from src.api.caching import ResponseCache, etag_matches, not_modified, quote_etag
+from src.db.metadata_store import metadata_etag
+
+
+def request_with(if_none_match=None):
+    headers = {"if-none-match": if_none_match} if if_none_match is not None else {}
+    return SimpleNamespace(headers=headers)
+
+
+def test_etag_matches_if_none_match():
+    quoted = quote_etag("abc")
+    assert quoted == '"abc"'
+    assert etag_matches(request_with('"abc"'), quoted)
+    assert etag_matches(request_with('W/"abc"'), quoted)
+    assert etag_matches(request_with('"old", "abc"'), quoted)
+    assert etag_matches(request_with("*"), quoted)
+    assert not etag_matches(request_with('"old"'), quoted)
+    assert not etag_matches(request_with(), quoted)
+
+
+def test_ndjson_etag_differs_from_json_etag():
+    assert not etag_matches(request_with(quote_etag("abc")), quote_etag("abc", "-ndjson"))
+
+
+def test_not_modified_carries_etag():
+    response = not_modified('"abc"')
+    assert response.status_code == 304
+    assert response.headers["ETag"] == '"abc"'
+    assert response.body == b""
+
+
+def test_metadata_etag_follows_content():
+    items = [{"schema_name": "public", "table_name": "users", "columns": []}]
+    assert metadata_etag(items) == metadata_etag([dict(item) for item in items])
+    assert len(metadata_etag(items)) == 32
+    assert metadata_etag(items) != metadata_etag([{**items[0], "table_name": "orders"}])
+    assert metadata_etag(items) != metadata_etag([])
+
+
+def test_response_cache_evicts_least_recently_used():
+    cache = ResponseCache(max_bytes=40)
+    cache.set("a", b"x" * 10)
+    cache.set("b", b"x" * 10)
+    cache.set("c", b"x" * 10)
+    assert cache.get("a") is not None
+    cache.set("d", b"x" * 10)
+    cache.set("e", b"x" * 10)
+    assert cache.get("b") is None
+    assert [cache.get(key) is not None for key in "acde"] == [True, True, True, True]
+
+
+def test_response_cache_skips_bodies_over_quarter_of_budget():
+    cache = ResponseCache(max_bytes=40)
+    cache.set("small", b"x" * 10)
+    cache.set("large", b"x" * 11)
+    assert cache.get("large") is None
+    assert cache.get("small") == b"x" * 10
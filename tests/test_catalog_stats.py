@@ -0,0 +1,85 @@
+import pytest
+
+from src.db.catalog import apply_stats, stats_drifted
+
+TABLE_STATS = {"estimated_rows": 1000, "total_bytes": 81920, "table_bytes": 65536}
+
+
+def table_info(**extra):
+    return {
+        "schema_name": "public",
+        "table_name": "users",
+        "columns": [{"column_id": "ab" * 16, "name": "id", "type": "integer", "nullable": False, "position": 1}],
+        **extra,
+    }
+
+
+def catalog_stats(stats=TABLE_STATS, column_stats=None, primary_key=("id",), indexes=None):
+    return {
+        "stats": stats,
+        "primary_key": list(primary_key),
+        "indexes": indexes or [{"name": "users_pkey", "columns": ["id"], "unique": True, "primary": True}],
+        "columns": {"id": column_stats or {"null_frac": 0.0, "n_distinct": -1.0, "avg_width": 4}},
+    }
+
+
+@pytest.mark.parametrize("old, new, drifted", [
+    (TABLE_STATS, TABLE_STATS, False),
+    # analyze noise within ten percent
+    (TABLE_STATS, {**TABLE_STATS, "estimated_rows": 1090}, False),
+    (TABLE_STATS, {**TABLE_STATS, "estimated_rows": 1200}, True),
+    (TABLE_STATS, {**TABLE_STATS, "total_bytes": None}, True),
+    ({**TABLE_STATS, "estimated_rows": None}, TABLE_STATS, True),
+    # values near zero compared against one
+    ({"null_frac": 0.0}, {"null_frac": 0.05}, False),
+    ({"n_distinct": -1.0}, {"n_distinct": -0.95}, False),
+    (None, TABLE_STATS, True),
+    (TABLE_STATS, None, True),
+    (None, None, False),
+])
+def test_stats_drifted(old, new, drifted):
+    assert stats_drifted(old, new) is drifted
+
+
+def test_apply_stats_fills_table_without_stats():
+    info = table_info()
+    assert apply_stats(info, catalog_stats())
+    assert info["stats"] == TABLE_STATS
+    assert info["primary_key"] == ["id"]
+    assert info["columns"][0]["stats"] == {"null_frac": 0.0, "n_distinct": -1.0, "avg_width": 4}
+
+
+def test_apply_stats_keeps_stats_within_tolerance():
+    info = table_info()
+    apply_stats(info, catalog_stats())
+    assert not apply_stats(info, catalog_stats(
+        stats={**TABLE_STATS, "estimated_rows": 1050},
+        column_stats={"null_frac": 0.0, "n_distinct": -1.0, "avg_width": 4},
+    ))
+    # stored estimate stays so etag does not change on analyze noise
+    assert info["stats"]["estimated_rows"] == 1000
+
+
+def test_apply_stats_replaces_drifted_stats_and_keys():
+    info = table_info()
+    apply_stats(info, catalog_stats())
+    assert apply_stats(info, catalog_stats(stats={**TABLE_STATS, "estimated_rows": 5000}))
+    assert info["stats"]["estimated_rows"] == 5000
+
+    assert apply_stats(info, catalog_stats(stats={**TABLE_STATS, "estimated_rows": 5000}, primary_key=()))
+    assert info["primary_key"] == []
+
+    assert apply_stats(info, catalog_stats(
+        stats={**TABLE_STATS, "estimated_rows": 5000}, primary_key=(),
+        column_stats={"null_frac": 0.5, "n_distinct": -1.0, "avg_width": 4},
+    ))
+    assert info["columns"][0]["stats"]["null_frac"] == 0.5
+
+
+def test_apply_stats_of_table_missing_from_catalog_stats():
+    info = table_info()
+    assert apply_stats(info, None)
+    assert info["stats"] is None
+    assert info["primary_key"] == [] and info["indexes"] == []
+    assert info["columns"][0]["stats"] is None
+    assert not apply_stats(info, None)
@@ -0,0 +1,152 @@
+import time
+import uuid
+import asyncio
+from types import SimpleNamespace
+from datetime import datetime, timedelta
+
+from src.classification.cache import ClassificationCache
+
+RESULT = {"email": ["a@example.com"], "phone": []}
+
+
+class FakeSessions:
+    """
+    :: pg_session stand in answering every select with the given rows
+    """
+
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+        self.executed = 0
+
+    def __call__(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def execute(self, statement):
+        self.executed += 1
+        return SimpleNamespace(all=lambda: self.rows)
+
+    async def commit(self):
+        pass
+
+
+def test_key_ignores_value_order_and_whitespace():
+    key = ClassificationCache.key("model", "prompt", ["b", " a"])
+    assert key == ClassificationCache.key("model", "prompt", ["a ", "b"])
+    assert key != ClassificationCache.key("other-model", "prompt", ["a", "b"])
+    assert key != ClassificationCache.key("model", "other-prompt", ["a", "b"])
+    assert key != ClassificationCache.key("model", "prompt", ["a", "c"])
+
+
+def test_memory_tier_answers_without_query():
+    async def run():
+        sessions = FakeSessions()
+        cache = ClassificationCache(sessions)
+        await cache.set("k", RESULT)
+        writes = sessions.executed
+        assert await cache.get("k") == RESULT
+        assert sessions.executed == writes
+        assert cache.stats == {"memory_hits": 1, "persistent_hits": 0, "misses": 0}
+
+    asyncio.run(run())
+
+
+def test_persistent_hit_fills_memory_with_remaining_lifetime():
+    async def run():
+        sessions = FakeSessions(rows=[("k", RESULT, datetime.utcnow() + timedelta(seconds=100))])
+        cache = ClassificationCache(sessions, ttl=3600)
+        assert await cache.get_many(["k", "missing"]) == {"k": RESULT}
+        assert cache.stats == {"memory_hits": 0, "persistent_hits": 1, "misses": 1}
+        assert 90 < cache._entries["k"][1] - time.monotonic() <= 100
+
+        sessions.rows = []
+        assert await cache.get("k") == RESULT
+        assert cache.stats["memory_hits"] == 1
+
+    asyncio.run(run())
+
+
+def test_memory_tier_expires_and_drops_least_recently_used(monkeypatch):
+    async def run():
+        sessions = FakeSessions()
+        cache = ClassificationCache(sessions, max_entries=2, ttl=60)
+        await cache.set_many({"a": RESULT, "b": RESULT})
+        assert cache._get_memory("a") == RESULT
+        await cache.set("c", RESULT)
+        assert cache._get_memory("b") is None
+        assert cache._get_memory("a") == RESULT
+
+        later = time.monotonic() + 61
+        monkeypatch.setattr("src.classification.cache.time", SimpleNamespace(monotonic=lambda: later))
+        assert cache._get_memory("a") is None
+        assert cache._get_memory("c") is None
+
+    asyncio.run(run())
+
+
+def with_system_cache(system_db_url, scenario, **options):
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlmodel.ext.asyncio.session import AsyncSession
+
+    async def run():
+        engine = create_async_engine(system_db_url)
+        pg_session = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+        try:
+            return await scenario(pg_session, lambda: ClassificationCache(pg_session, **options))
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(run())
+
+
+def test_persistent_tier_shared_between_processes(system_db_url):
+    async def scenario(pg_session, new_cache):
+        key = uuid.uuid4().hex
+        await new_cache().set(key, RESULT)
+        # fresh cache has empty memory tier like another worker
+        other = new_cache()
+        assert await other.get(key) == RESULT
+        assert other.stats["persistent_hits"] == 1
+
+        await new_cache().set(key, {"email": []})
+        assert await new_cache().get(key) == {"email": []}
+
+    with_system_cache(system_db_url, scenario)
+
+
+def test_expired_and_overflowing_rows_evicted(system_db_url):
+    async def scenario(pg_session, new_cache):
+        from sqlalchemy import select, update
+        from src.models.classification_cache import ClassificationCacheModel
+
+        expired, older, newer = (uuid.uuid4().hex for _ in range(3))
+        cache = new_cache()
+        await cache.set(expired, RESULT)
+        async with pg_session() as session:
+            await session.execute(
+                update(ClassificationCacheModel).where(ClassificationCacheModel.key == expired)
+                .values(expires_at=datetime.utcnow() - timedelta(seconds=1))
+            )
+            await session.commit()
+        assert await new_cache().get(expired) is None
+
+        await cache.set_many({older: RESULT, newer: RESULT})
+        # updated_at has second precision
+        async with pg_session() as session:
+            await session.execute(
+                update(ClassificationCacheModel).where(ClassificationCacheModel.key == older)
+                .values(updated_at=datetime.utcnow() - timedelta(hours=1))
+            )
+            await session.commit()
+        await cache.evict_persistent()
+        async with pg_session() as session:
+            keys = set((await session.execute(select(ClassificationCacheModel.key))).scalars().all())
+        assert keys == {newer}
+
+    with_system_cache(system_db_url, scenario, persistent_max_entries=1)
@@ -0,0 +1,160 @@
+import json
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from src.security import encryption
+from src.security.encryption import (
+    OAEP_PADDING, CredentialCipher, DataKeyCache, decrypt_credentials, encrypt_envelope, public_key_id
+)
+from src.security.exceptions import AppException
+from src.security.executors import BoundedExecutor
+
+
+@pytest.fixture(scope="module")
+def private_keys():
+    # smaller than production keys, only to keep tests fast
+    return [rsa.generate_private_key(public_exponent=65537, key_size=2048) for _ in range(2)]
+
+
+def cipher_of(*keys):
+    key_ids = [public_key_id(key.public_key()) for key in keys]
+    return CredentialCipher(dict(zip(key_ids, keys)), key_ids[0])
+
+
+def test_round_trip_bound_to_row_id(private_keys):
+    cipher = cipher_of(private_keys[0])
+    stored = cipher.encrypt("s3cret", "row-1")
+    assert stored.startswith("{}{}:".format(CredentialCipher.PREFIX, cipher.current_key_id))
+    assert "s3cret" not in stored
+    assert cipher.decrypt(stored, "row-1") == "s3cret"
+    # value copied to another row does not decrypt there
+    with pytest.raises(InvalidTag):
+        cipher.decrypt(stored, "row-2")
+
+
+def test_same_plain_text_encrypts_differently(private_keys):
+    cipher = cipher_of(private_keys[0])
+    assert cipher.encrypt("s3cret", "row-1") != cipher.encrypt("s3cret", "row-1")
+
+
+def test_plain_legacy_values_pass_through(private_keys):
+    cipher = cipher_of(private_keys[0])
+    assert not cipher.is_encrypted("s3cret")
+    assert not cipher.is_encrypted(None)
+    assert cipher.decrypt("s3cret", "row-1") == "s3cret"
+
+
+def test_values_of_previous_key_decrypt_after_rotation(private_keys):
+    old, new = private_keys
+    stored = cipher_of(old).encrypt("s3cret", "row-1")
+
+    rotated = cipher_of(new, old)
+    assert rotated.decrypt(stored, "row-1") == "s3cret"
+    rewritten = rotated.encrypt("s3cret", "row-1")
+    assert rewritten.split(":")[2] == public_key_id(new.public_key())
+
+    # once the old key is dropped only rewritten values decrypt
+    new_only = cipher_of(new)
+    assert new_only.decrypt(rewritten, "row-1") == "s3cret"
+    with pytest.raises(KeyError):
+        new_only.decrypt(stored, "row-1")
+
+
+def test_derived_key_is_stable_per_private_key(private_keys):
+    old, new = private_keys
+    assert CredentialCipher.derive_key(old) == CredentialCipher.derive_key(old)
+    assert CredentialCipher.derive_key(old) != CredentialCipher.derive_key(new)
+    assert len(CredentialCipher.derive_key(old)) == 32
+
+
+CREDENTIALS = {"host": "db.internal", "port": 5432, "username": "reader", "password": "s3cret"}
+
+
+class CountingExecutor(BoundedExecutor):
+    def __init__(self):
+        super().__init__("decryption", workers=1)
+        self.calls = 0
+
+    async def run(self, fn, *args):
+        self.calls += 1
+        return await super().run(fn, *args)
+
+
+@pytest.fixture
+def worker_keys(monkeypatch, private_keys):
+    # what load_worker_private_keys leaves in each executor worker, old key kept for rotation
+    keys = {public_key_id(key.public_key()): key for key in private_keys}
+    monkeypatch.setattr(encryption, "worker_private_keys", keys)
+    monkeypatch.setattr(encryption, "worker_current_key_id", public_key_id(private_keys[0].public_key()))
+    return keys
+
+
+def payload(cipher=None, **envelope):
+    return SimpleNamespace(
+        cipher=cipher, key_id=envelope.get("key_id"), wrapped_key=envelope.get("wrapped_key"),
+        nonce=envelope.get("nonce"), ciphertext=envelope.get("ciphertext")
+    )
+
+
+def decrypt(encrypted_payload, executor, data_key_cache):
+    try:
+        return asyncio.run(decrypt_credentials(encrypted_payload, executor, data_key_cache))
+    finally:
+        executor.shutdown()
+
+
+def test_envelope_round_trip_with_either_key(worker_keys, private_keys):
+    for private_key in private_keys:
+        envelope = encrypt_envelope(private_key.public_key(), CREDENTIALS)
+        assert decrypt(payload(**envelope), CountingExecutor(), DataKeyCache()) == CREDENTIALS
+
+
+def test_reused_data_key_unwrapped_once(worker_keys, private_keys):
+    first = encrypt_envelope(private_keys[0].public_key(), CREDENTIALS)
+    data_key_cache, executor = DataKeyCache(), CountingExecutor()
+
+    async def run():
+        assert await decrypt_credentials(payload(**first), executor, data_key_cache) == CREDENTIALS
+        ((data_key, _),) = data_key_cache._keys.values()
+        # client reuses data key and wrapped key of the first envelope
+        second = encrypt_envelope(
+            private_keys[0].public_key(), {"password": "other"}, data_key=data_key, wrapped_key=first["wrapped_key"]
+        )
+        assert second["nonce"] != first["nonce"]
+        assert await decrypt_credentials(payload(**second), executor, data_key_cache) == {"password": "other"}
+
+    try:
+        asyncio.run(run())
+    finally:
+        executor.shutdown()
+    assert executor.calls == 1
+
+
+def test_legacy_hex_cipher(worker_keys, private_keys):
+    cipher = private_keys[0].public_key().encrypt(json.dumps(CREDENTIALS).encode("utf-8"), OAEP_PADDING).hex()
+    assert decrypt(payload(cipher=cipher), CountingExecutor(), DataKeyCache()) == CREDENTIALS
+
+
+def test_envelope_of_unknown_key_rejected(worker_keys):
+    unknown = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    with pytest.raises(AppException) as raised:
+        decrypt(payload(**encrypt_envelope(unknown.public_key(), CREDENTIALS)), CountingExecutor(), DataKeyCache())
+    assert raised.value.error_code == "exceptions.unknownKeyId"
+
+
+@pytest.mark.parametrize("field, value", [
+    ("ciphertext", None), ("nonce", "not base64!"), ("key_id", "swapped"),
+])
+def test_tampered_envelope_rejected(worker_keys, private_keys, field, value):
+    envelope = encrypt_envelope(private_keys[0].public_key(), CREDENTIALS)
+    if field == "key_id":
+        # key id is associated data, another known key id fails the tag or the unwrap
+        value = public_key_id(private_keys[1].public_key())
+    envelope[field] = value
+    with pytest.raises(AppException) as raised:
+        decrypt(payload(**envelope), CountingExecutor(), DataKeyCache())
+    assert raised.value.status_code == 400
@@ -0,0 +1,61 @@
+import asyncio
+import math
+import threading
+
+import pytest
+
+from src.security.exceptions import AppException
+from src.security.executors import BoundedExecutor, default_workers
+
+
+def test_worker_count_explicit_or_default():
+    executor = BoundedExecutor("explicit", workers=3, max_queue=5)
+    assert executor.workers == 3
+    assert executor.max_pending == 8
+    executor.shutdown()
+
+    executor = BoundedExecutor("default", max_queue=5)
+    assert executor.workers == default_workers("thread")
+    assert executor.max_pending == executor.workers + 5
+    executor.shutdown()
+
+
+def test_unknown_kind_rejected():
+    with pytest.raises(ValueError):
+        BoundedExecutor("unknown", kind="fiber")
+
+
+def test_submissions_over_workers_and_queue_shed_with_503():
+    release = threading.Event()
+    executor = BoundedExecutor("busy", workers=1, max_queue=1)
+
+    async def run():
+        running = asyncio.create_task(executor.run(release.wait))
+        queued = asyncio.create_task(executor.run(release.wait))
+        await asyncio.sleep(0)
+        assert executor.pending == 2
+
+        with pytest.raises(AppException) as raised:
+            await executor.run(release.wait)
+        assert raised.value.status_code == 503
+        assert executor.pending == 2
+
+        release.set()
+        assert await asyncio.gather(running, queued) == [True, True]
+        assert executor.pending == 0
+        # capacity is back once pending work finished
+        assert await executor.run(math.factorial, 5) == 120
+
+    try:
+        asyncio.run(run())
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_process_executor_runs_in_spawned_children():
+    executor = BoundedExecutor("process", kind="process", workers=1, max_queue=1)
+    try:
+        assert asyncio.run(executor.run(math.factorial, 10)) == 3628800
+    finally:
+        executor.shutdown()
@@ -0,0 +1,132 @@
+import uuid
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.sql import text
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.jobs.queue import JobQueue
+from src.models.jobs import JobModel
+from src.models.memberships import MembershipModel
+
+
+async def noop_job(app, membership_id, params, progress):
+    return {}
+
+
+def run_with_queue(system_db_url, scenario, **queue_options):
+    """
+    :: Runs scenario(queue, membership_ids) against system database
+    """
+    async def run():
+        engine = create_async_engine(system_db_url)
+        pg_session = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+        try:
+            async with pg_session() as session:
+                memberships = [
+                    MembershipModel(username="member-{}".format(uuid.uuid4().hex), password="hash")
+                    for _ in range(2)
+                ]
+                session.add_all(memberships)
+                await session.commit()
+            queue = JobQueue(SimpleNamespace(pg_session=pg_session), {"extract": noop_job}, **queue_options)
+            return await scenario(queue, [membership.id for membership in memberships])
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(run())
+
+
+async def job_rows(queue, membership_ids):
+    async with queue.app.pg_session() as session:
+        return (await session.exec(select(JobModel).where(JobModel.membership_id.in_(membership_ids)))).all()
+
+
+def test_claim_marks_job_running_with_token(system_db_url):
+    async def scenario(queue, membership_ids):
+        job = await queue.submit(membership_ids[0], "extract", {"db_id": uuid.uuid4().hex})
+        job_id, claim_token, membership_id, kind, params = await queue._claim()
+        assert (job_id, membership_id, kind) == (job.id, membership_ids[0], "extract")
+        assert await queue._claim() is None
+
+        (row,) = await job_rows(queue, membership_ids)
+        assert row.status == "running"
+        assert row.claim_token == claim_token
+        assert row.heartbeat_at is not None
+
+    run_with_queue(system_db_url, scenario)
+
+
+def test_membership_concurrency_holds_under_concurrent_claims(system_db_url):
+    async def scenario(queue, membership_ids):
+        busy, quiet = membership_ids
+        for _ in range(4):
+            await queue.submit(busy, "extract", {})
+        await queue.submit(quiet, "extract", {})
+
+        # workers woken together by submit
+        await asyncio.gather(*[queue._claim() for _ in range(6)])
+        while await queue._claim():
+            pass
+
+        running = [row.membership_id for row in await job_rows(queue, membership_ids) if row.status == "running"]
+        assert sorted(running) == sorted([busy, quiet])
+
+    run_with_queue(system_db_url, scenario, worker_count=6, membership_concurrency=1)
+
+
+def test_stale_job_is_reclaimed_and_old_claim_loses_ownership(system_db_url):
+    async def scenario(queue, membership_ids):
+        await queue.submit(membership_ids[0], "extract", {})
+        job_id, old_token, *_ = await queue._claim()
+        assert await queue._claim() is None
+
+        async with queue.app.pg_session() as session:
+            await session.execute(
+                text("UPDATE jobs SET heartbeat_at = now() - make_interval(secs => :age) WHERE id = :id"),
+                {"age": queue.stale_timeout * 2, "id": job_id}
+            )
+            await session.commit()
+
+        reclaimed_id, new_token, *_ = await queue._claim()
+        assert reclaimed_id == job_id
+        assert new_token != old_token
+
+        assert not await queue._heartbeat(job_id, old_token)
+        assert await queue._heartbeat(job_id, new_token)
+        await queue._set(job_id, old_token, status="completed", result={"from": "old"})
+        (row,) = await job_rows(queue, membership_ids)
+        assert row.status == "running"
+        assert row.result is None
+
+    run_with_queue(system_db_url, scenario, stale_timeout=60)
+
+
+def test_run_cancels_handler_when_heartbeat_fails():
+    started, cancelled = asyncio.Event(), asyncio.Event()
+
+    async def slow_job(app, membership_id, params, progress):
+        started.set()
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def failing_heartbeat(job_id, claim_token):
+        raise ConnectionError("database unavailable")
+
+    async def run():
+        queue = JobQueue(SimpleNamespace(), {"extract": slow_job}, heartbeat_interval=0.01)
+        queue._heartbeat = failing_heartbeat
+        with pytest.raises(ConnectionError):
+            await queue._run(uuid.uuid4(), uuid.uuid4(), uuid.uuid4(), "extract", {})
+        assert started.is_set()
+        assert cancelled.is_set()
+        assert queue._running == {}
+
+    asyncio.run(run())
@@ -0,0 +1,200 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from src.classification import llm_gateway
+from src.classification.llm_gateway import LlmGateway, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeCompletions:
+    def __init__(self, failures=()):
+        self.calls = []
+        self.cancelled = 0
+        self.failures = list(failures)
+        self.release = asyncio.Event()
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        if self.failures:
+            raise self.failures.pop(0)
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return SimpleNamespace(usage=None, content=kwargs["messages"])
+
+
+async def settle():
+    # callers start their shared upstream task on a later loop iteration
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def make_gateway(completions, **options):
+    options.setdefault("requests_per_minute", 0)
+    return LlmGateway(SimpleNamespace(chat=SimpleNamespace(completions=completions)), **options)
+
+
+def rate_limit_error(retry_after=None):
+    headers = {"retry-after": retry_after} if retry_after is not None else {}
+    response = httpx.Response(
+        429, headers=headers, request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    )
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(llm_gateway, "time", clock)
+    monkeypatch.setattr(llm_gateway, "asyncio", SimpleNamespace(Lock=asyncio.Lock, sleep=clock.sleep))
+    return clock
+
+
+def test_token_bucket_refills_at_rate_up_to_capacity(clock):
+    async def run():
+        bucket = TokenBucket(rate=2, capacity=2)
+        await bucket.acquire()
+        await bucket.acquire()
+        assert clock.sleeps == []
+        await bucket.acquire()
+        assert clock.sleeps == [0.5]
+
+        # long idle refills only up to capacity
+        clock.now += 60
+        clock.sleeps.clear()
+        await bucket.acquire()
+        await bucket.acquire()
+        assert clock.sleeps == []
+        await bucket.acquire()
+        assert clock.sleeps == [0.5]
+
+    asyncio.run(run())
+
+
+def test_identical_concurrent_requests_share_one_call():
+    async def run():
+        completions = FakeCompletions()
+        gateway = make_gateway(completions)
+        callers = [
+            asyncio.create_task(gateway.create_chat_completion(model="m", messages=["same"]))
+            for _ in range(3)
+        ]
+        other = asyncio.create_task(gateway.create_chat_completion(model="m", messages=["other"]))
+        await settle()
+        completions.release.set()
+        responses = await asyncio.gather(*callers)
+        assert (await other).content == ["other"]
+
+        assert len(completions.calls) == 2
+        assert all(response is responses[0] for response in responses)
+        assert gateway._in_flight == {}
+
+    asyncio.run(run())
+
+
+def test_cancelled_caller_does_not_cancel_shared_call():
+    async def run():
+        completions = FakeCompletions()
+        gateway = make_gateway(completions)
+        first = asyncio.create_task(gateway.create_chat_completion(model="m", messages=["same"]))
+        second = asyncio.create_task(gateway.create_chat_completion(model="m", messages=["same"]))
+        await settle()
+
+        first.cancel()
+        await settle()
+        completions.release.set()
+        assert (await second).content == ["same"]
+        assert first.cancelled()
+        assert completions.cancelled == 0
+
+    asyncio.run(run())
+
+
+def test_call_cancelled_when_every_caller_is_gone():
+    async def run():
+        completions = FakeCompletions()
+        gateway = make_gateway(completions)
+        callers = [
+            asyncio.create_task(gateway.create_chat_completion(model="m", messages=["same"]))
+            for _ in range(2)
+        ]
+        await settle()
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await settle()
+
+        assert completions.cancelled == 1
+        assert gateway._in_flight == {}
+        assert gateway.in_flight == 0
+
+    asyncio.run(run())
+
+
+def test_in_flight_counts_requests_holding_a_slot():
+    async def run():
+        completions = FakeCompletions()
+        gateway = make_gateway(completions, max_in_flight=1)
+        callers = [
+            asyncio.create_task(gateway.create_chat_completion(model="m", messages=[index]))
+            for index in range(3)
+        ]
+        await settle()
+        # three distinct requests, one running and two waiting for the slot
+        assert len(gateway._in_flight) == 3
+        assert gateway.in_flight == 1
+
+        completions.release.set()
+        await asyncio.gather(*callers)
+        assert gateway.in_flight == 0
+
+    asyncio.run(run())
+
+
+def test_retry_delay_honours_retry_after():
+    gateway = make_gateway(FakeCompletions(), retry_base_delay=0.5)
+    for _ in range(20):
+        assert 3 <= gateway._retry_delay(rate_limit_error("3"), attempt=1) <= 3.5
+        # backoff with full jitter without provider hint
+        assert 0 <= gateway._retry_delay(rate_limit_error(), attempt=3) <= 2
+
+
+def test_retryable_errors_retried_until_success():
+    async def run():
+        completions = FakeCompletions(failures=[rate_limit_error("0"), rate_limit_error("0")])
+        completions.release.set()
+        gateway = make_gateway(completions, retry_base_delay=0)
+        response = await gateway.create_chat_completion(model="m", messages=["retry"])
+        assert response.content == ["retry"]
+        assert len(completions.calls) == 3
+
+    asyncio.run(run())
+
+
+def test_retries_give_up_after_max_retries():
+    async def run():
+        completions = FakeCompletions(failures=[rate_limit_error("0") for _ in range(3)])
+        gateway = make_gateway(completions, max_retries=2, retry_base_delay=0)
+        with pytest.raises(openai.RateLimitError):
+            await gateway.create_chat_completion(model="m", messages=["fail"])
+        assert len(completions.calls) == 3
+
+    asyncio.run(run())
@@ -0,0 +1,149 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from src.db import membership_engines
+from src.db.membership_engines import MembershipEngineRegistry
+
+
+class FakeEngine:
+    def __init__(self, url):
+        self.url = url
+        self.disposed = False
+
+    async def dispose(self):
+        self.disposed = True
+
+
+class FakeUrlCache:
+    def __init__(self):
+        self.urls = {}
+
+    def get_url(self, membership_db):
+        return self.urls.get(membership_db.id, "postgresql+asyncpg://db/{}".format(membership_db.id.hex))
+
+    def invalidate(self, db_id):
+        self.urls.pop(db_id, None)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(membership_engines, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def make_registry(**options):
+    registry = MembershipEngineRegistry(FakeUrlCache(), **options)
+    registry._create_engine = FakeEngine
+    return registry
+
+
+def membership_db():
+    return SimpleNamespace(id=uuid.uuid4())
+
+
+def engine_of(registry, db):
+    return registry._engines[db.id].engine
+
+
+def test_lease_reuses_engine_of_same_database(clock):
+    async def run():
+        registry = make_registry()
+        db = membership_db()
+        async with registry.lease(db) as first:
+            pass
+        async with registry.lease(db) as second:
+            pass
+        assert first is second
+        assert len(registry) == 1
+
+    asyncio.run(run())
+
+
+def test_idle_engine_evicted_after_timeout(clock):
+    async def run():
+        registry = make_registry(idle_timeout=300)
+        db = membership_db()
+        async with registry.lease(db):
+            pass
+        engine = engine_of(registry, db)
+
+        clock[0] += 200
+        await registry.evict_idle()
+        assert not engine.disposed
+
+        clock[0] += 200
+        await registry.evict_idle()
+        assert engine.disposed
+        assert len(registry) == 0
+
+    asyncio.run(run())
+
+
+def test_leased_engine_not_evicted_while_in_use(clock):
+    async def run():
+        registry = make_registry(idle_timeout=300)
+        db = membership_db()
+        async with registry.lease(db):
+            engine = engine_of(registry, db)
+            clock[0] += 1000
+            await registry.evict_idle()
+            assert not engine.disposed
+        # release refreshes last use
+        await registry.evict_idle()
+        assert not engine.disposed
+
+        clock[0] += 301
+        await registry.evict_idle()
+        assert engine.disposed
+
+    asyncio.run(run())
+
+
+def test_least_recently_used_evicted_over_max_engines(clock):
+    async def run():
+        registry = make_registry(max_engines=2)
+        dbs = [membership_db() for _ in range(3)]
+        engines = []
+        for db in dbs:
+            clock[0] += 1
+            async with registry.lease(db):
+                engines.append(engine_of(registry, db))
+        assert [engine.disposed for engine in engines] == [True, False, False]
+        assert len(registry) == 2
+
+    asyncio.run(run())
+
+
+def test_leased_engines_kept_over_max_engines(clock):
+    async def run():
+        registry = make_registry(max_engines=1)
+        first, second = membership_db(), membership_db()
+        async with registry.lease(first):
+            first_engine = engine_of(registry, first)
+            async with registry.lease(second):
+                assert len(registry) == 2
+            assert not first_engine.disposed
+            assert len(registry) == 1
+        assert not first_engine.disposed
+
+    asyncio.run(run())
+
+
+def test_changed_credentials_dispose_old_engine_after_last_lease(clock):
+    async def run():
+        registry = make_registry()
+        db = membership_db()
+        async with registry.lease(db):
+            old_engine = engine_of(registry, db)
+            registry.url_cache.urls[db.id] = "postgresql+asyncpg://db/rotated"
+            async with registry.lease(db):
+                assert engine_of(registry, db).url == "postgresql+asyncpg://db/rotated"
+            assert not old_engine.disposed
+        assert old_engine.disposed
+        assert not engine_of(registry, db).disposed
+
+    asyncio.run(run())
@@ -0,0 +1,115 @@
+import uuid
+import zlib
+import struct
+
+import orjson
+import pytest
+
+from src.db.metadata_codec import MAGIC, decode_metadata, encode_metadata, storage_values, stored_items
+
+
+def column(position, **extra):
+    return {
+        "column_id": uuid.uuid4().hex,
+        "name": "column_{}".format(position),
+        "type": "integer" if position % 2 else "text",
+        "nullable": bool(position % 3),
+        "position": position,
+        **extra,
+    }
+
+
+def test_round_trip_keeps_values_and_key_order():
+    items = [
+        {
+            "schema_name": "public",
+            "table_name": "users",
+            "columns": [column(1), column(2, stats={"null_frac": 0.5, "n_distinct": -1.0, "avg_width": 4})],
+            "structure_hash": "abc",
+            "stats": {"estimated_rows": 10, "total_bytes": 8192, "table_bytes": 8192},
+            "primary_key": ["column_1"],
+            "indexes": [],
+        },
+        {"schema_name": "sales", "table_name": "empty", "columns": [], "structure_hash": "def"},
+    ]
+    decoded = decode_metadata(encode_metadata(items))
+    assert decoded == items
+    assert [list(table) for table in decoded] == [list(table) for table in items]
+    assert [list(item) for item in decoded[0]["columns"]] == [list(item) for item in items[0]["columns"]]
+
+
+def document_of(blob):
+    payload = zlib.decompress(blob[len(MAGIC):])
+    (length,) = struct.unpack_from("<I", payload)
+    return orjson.loads(payload[4:4 + length]), payload[4 + length:]
+
+
+def test_column_stats_stored_as_arrays():
+    stats = {"null_frac": 0.25, "n_distinct": -1.0, "avg_width": 8}
+    items = [{
+        "schema_name": "public",
+        "table_name": "users",
+        "columns": [column(1, stats=stats), column(2, stats=None), column(3)],
+        "structure_hash": "abc",
+    }]
+    blob = encode_metadata(items)
+    document, _ = document_of(blob)
+    assert document["columns"]["stats"] == [2, 1, 0]
+    assert document["columns"]["null_frac"] == [0.25, None, None]
+    assert document["columns"]["avg_width"] == [8, None, None]
+    assert document["columns"]["extra"] == [None, None, None]
+    assert decode_metadata(blob) == items
+
+
+def test_unusual_column_stats_kept_as_is():
+    items = [{
+        "schema_name": "public",
+        "table_name": "users",
+        "columns": [
+            column(1, stats={"null_frac": 0.5}),
+            {**column(2), "comment": "first", "stats": {"null_frac": 0.0, "n_distinct": 1.0, "avg_width": 4}},
+        ],
+    }]
+    decoded = decode_metadata(encode_metadata(items))
+    assert decoded == items
+    assert [list(item) for item in decoded[0]["columns"]] == [list(item) for item in items[0]["columns"]]
+
+
+def test_blob_written_before_stats_arrays():
+    stats = {"null_frac": 0.5, "n_distinct": 3.0, "avg_width": 4}
+    items = [{"schema_name": "public", "table_name": "t", "columns": [column(1, stats=stats)], "structure_hash": "h"}]
+    document, column_ids = document_of(encode_metadata(items))
+    # earlier encoding kept column stats in extra
+    for field in ("stats", "null_frac", "n_distinct", "avg_width"):
+        del document["columns"][field]
+    document["columns"]["extra"] = [{"stats": stats}]
+    body = orjson.dumps(document)
+    old_blob = MAGIC + zlib.compress(struct.pack("<I", len(body)) + body + column_ids)
+    assert decode_metadata(old_blob) == items
+
+
+def test_legacy_items_without_schema_or_hash():
+    items = [{"table_name": "legacy", "columns": [column(1)]}]
+    assert decode_metadata(encode_metadata(items)) == items
+
+
+def test_empty_metadata():
+    blob = encode_metadata([])
+    assert blob.startswith(MAGIC)
+    assert decode_metadata(blob) == []
+
+
+def test_unknown_encoding_rejected():
+    with pytest.raises(ValueError):
+        decode_metadata(b"JSON[]")
+
+
+def test_storage_values_and_stored_items():
+    items = [{"schema_name": "public", "table_name": "t", "columns": [column(1)], "structure_hash": "h"}]
+    compressed = storage_values(items, compressed=True)
+    assert compressed["metadata_items"] is None
+    assert stored_items(**compressed) == items
+    plain = storage_values(items, compressed=False)
+    assert plain == {"metadata_items": items, "metadata_blob": None}
+    assert stored_items(**plain) == items
+    assert stored_items(None, None) == []
@@ -0,0 +1,41 @@
+from src.db.metadata_store import nullable_stats, table_shape
+
+
+def test_table_shape_fills_keys_of_legacy_items():
+    legacy = {
+        "table_name": "users",
+        "columns": [{"column_id": "ab" * 16, "name": "id", "type": "integer", "nullable": False, "position": 1}],
+    }
+    assert table_shape(legacy) == {
+        "schema_name": "public",
+        "table_name": "users",
+        "columns": [{
+            "column_id": "ab" * 16, "name": "id", "type": "integer", "nullable": False, "position": 1, "stats": None
+        }],
+        "structure_hash": None,
+        "stats": None,
+        "primary_key": None,
+        "indexes": None,
+    }
+
+
+def test_table_shape_keeps_extracted_values():
+    table_info = {
+        "schema_name": "sales",
+        "table_name": "orders",
+        "columns": [{
+            "column_id": "cd" * 16, "name": "id", "type": "bigint", "nullable": False, "position": 1,
+            "stats": {"null_frac": 0.0, "n_distinct": -1.0, "avg_width": 8},
+        }],
+        "structure_hash": "h",
+        "stats": {"estimated_rows": 10, "total_bytes": 16384, "table_bytes": 8192},
+        "primary_key": ["id"],
+        "indexes": [{"name": "orders_pkey", "columns": ["id"], "unique": True, "primary": True}],
+    }
+    assert table_shape(table_info) == table_info
+    assert list(table_shape(table_info)) == list(table_info)
+
+
+def test_nullable_stats():
+    assert nullable_stats(null_frac=None, n_distinct=None, avg_width=None) is None
+    assert nullable_stats(null_frac=0.0, n_distinct=None, avg_width=4) == {"null_frac": 0.0, "n_distinct": None, "avg_width": 4}
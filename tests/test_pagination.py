@@ -0,0 +1,45 @@
+import uuid
+from datetime import datetime
+
+import pytest
+
+from src.api.pagination import decode_cursor, decode_sort_cursor, encode_cursor, encode_sort_cursor
+from src.security.exceptions import AppException
+
+
+def test_cursor_round_trip():
+    created_at, record_id = datetime(2024, 5, 1, 12, 30, 15, 123456), uuid.uuid4()
+    assert decode_cursor(encode_cursor(created_at, record_id)) == (created_at, record_id)
+
+
+@pytest.mark.parametrize("sort_value, sort_type", [
+    ("customer_email", str), (0.4000000059604645, (int, float)), (1, (int, float))
+])
+def test_sort_cursor_round_trip(sort_value, sort_type):
+    record_id = uuid.uuid4()
+    assert decode_sort_cursor(encode_sort_cursor(sort_value, record_id), sort_type) == (sort_value, record_id)
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", "bm90IGEgY3Vyc29y", encode_sort_cursor("x", uuid.uuid4())[:-4]])
+def test_invalid_cursor(cursor):
+    with pytest.raises(AppException) as raised:
+        decode_cursor(cursor)
+    assert raised.value.status_code == 400
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", "bnVsbA==", "WzFd", encode_cursor(datetime(2024, 1, 1), uuid.uuid4())])
+def test_invalid_sort_cursor(cursor):
+    with pytest.raises(AppException) as raised:
+        decode_sort_cursor(cursor, str)
+    assert raised.value.status_code == 400
+
+
+@pytest.mark.parametrize("sort_value, sort_type", [
+    # cursor of fuzzy search used for substring search and the other way round
+    (0.5, str), ("customer_email", (int, float)),
+    (None, str), (True, (int, float)), (["a"], str), ({"a": 1}, (int, float)),
+])
+def test_sort_cursor_of_wrong_type(sort_value, sort_type):
+    with pytest.raises(AppException) as raised:
+        decode_sort_cursor(encode_sort_cursor(sort_value, uuid.uuid4()), sort_type)
+    assert raised.value.status_code == 400
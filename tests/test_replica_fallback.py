@@ -0,0 +1,129 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.db import system_engine
+from src.security import auth
+from src.security.auth_cache import AuthCache
+from src.security.exceptions import AppException
+
+ROLE = SimpleNamespace(name="admin", permissions=["api.get_metadata"])
+
+
+def primary():
+    pass
+
+
+def replica():
+    pass
+
+
+@pytest.fixture
+def lookups(monkeypatch):
+    """
+    :: Stands in for membership queries, rows found per session maker
+    """
+    found = {}
+    queried = []
+
+    async def load_membership_role(pg_session, username):
+        queried.append(pg_session)
+        return found.get(pg_session)
+
+    async def verify_password(password, provided_password, executor):
+        pass
+
+    monkeypatch.setattr(auth, "load_membership_role", load_membership_role)
+    monkeypatch.setattr(auth, "verify_password", verify_password)
+    return found, queried
+
+
+def authenticate(read_session):
+    app = SimpleNamespace(pg_session=primary, pg_read_session=read_session, auth_cache=AuthCache(), password_executor=None)
+    request = SimpleNamespace(app=app, scope={"route": SimpleNamespace(name="get_metadata")})
+    credentials = SimpleNamespace(username="alice", password="s3cret")
+    return asyncio.run(auth._authenticate_and_authorize(credentials, request))
+
+
+def membership_row():
+    return SimpleNamespace(username="alice", password="hash", role_id="admin"), ROLE
+
+
+def test_membership_found_on_replica_skips_primary(lookups):
+    found, queried = lookups
+    found[replica] = found[primary] = membership_row()
+    assert authenticate(replica).username == "alice"
+    assert queried == [replica]
+
+
+def test_membership_missing_on_replica_read_from_primary(lookups):
+    found, queried = lookups
+    # created moments ago, replica has not replayed it yet
+    found[primary] = membership_row()
+    assert authenticate(replica).username == "alice"
+    assert queried == [replica, primary]
+
+
+def test_without_replica_primary_read_once(lookups):
+    found, queried = lookups
+    with pytest.raises(AppException) as raised:
+        authenticate(primary)
+    assert raised.value.status_code == 401
+    assert queried == [primary]
+
+
+def test_membership_missing_everywhere_rejected(lookups):
+    found, queried = lookups
+    with pytest.raises(AppException) as raised:
+        authenticate(replica)
+    assert raised.value.status_code == 401
+    assert queried == [replica, primary]
+
+
+def system_config(**overrides):
+    return {
+        "system_db_pool_size": 10,
+        "system_db_max_overflow": 10,
+        "system_db_pool_recycle": 1800,
+        "system_db_pool_timeout": 10,
+        "system_db_pool_pre_ping": True,
+        "system_db_connect_timeout": 10,
+        "system_db_statement_timeout_ms": 60000,
+        "system_db_statement_cache_size": 256,
+        **overrides,
+    }
+
+
+@pytest.fixture
+def engine_options(monkeypatch):
+    created = []
+
+    def create_async_engine(url, **options):
+        created.append((url, options))
+        return SimpleNamespace(sync_engine=None)
+
+    monkeypatch.setattr(system_engine, "create_async_engine", create_async_engine)
+    monkeypatch.setattr(system_engine, "instrument_engine_connect", lambda engine, stage: None)
+    return created
+
+
+def test_system_engine_tuned_from_config(engine_options):
+    system_engine.create_system_engine("postgresql+asyncpg://replica/system", system_config())
+    ((url, options),) = engine_options
+    assert url == "postgresql+asyncpg://replica/system"
+    assert (options["pool_size"], options["max_overflow"], options["pool_pre_ping"]) == (10, 10, True)
+    assert options["connect_args"]["statement_cache_size"] == 256
+    assert options["connect_args"]["prepared_statement_cache_size"] == 256
+    assert options["connect_args"]["server_settings"] == {"statement_timeout": "60000"}
+
+
+def test_system_engine_behind_pgbouncer(engine_options):
+    system_engine.create_system_engine(
+        "postgresql+asyncpg://bouncer/system",
+        system_config(system_db_statement_cache_size=0, system_db_statement_timeout_ms=0),
+    )
+    ((_, options),) = engine_options
+    assert options["connect_args"]["statement_cache_size"] == 0
+    assert options["connect_args"]["prepared_statement_cache_size"] == 0
+    assert options["connect_args"]["server_settings"] == {}
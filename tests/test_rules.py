@@ -0,0 +1,79 @@
+import random
+from datetime import date
+
+from src.classification.rules import (
+    classify_value, classify_values, has_card_issuer, is_luhn_valid, is_tckn_valid, merge_classifications
+)
+
+
+def test_obvious_values():
+    assert classify_value("jane.doe@example.com") == "email"
+    assert classify_value("123-45-6789") == "ssn"
+    assert classify_value("10000000146") == "tckn"
+    assert classify_value("4111 1111 1111 1111") == "credit_card"
+    assert classify_value("192.168.1.10") == "ip_address"
+    assert classify_value("2024-02-29") == "date"
+    assert classify_value(date(2024, 1, 1)) == "date"
+
+
+def test_values_left_for_llm():
+    assert classify_value("not an email@") is None
+    assert classify_value("2023-02-29") is None
+    assert classify_value("istanbul") is None
+    assert classify_value("   ") is None
+
+
+def test_card_needs_issuer_prefix_and_luhn():
+    assert is_luhn_valid("4111111111111111")
+    assert has_card_issuer("4111111111111111")
+    assert has_card_issuer("378282246310005")
+    # luhn valid but no card network starts with 1
+    assert is_luhn_valid("1700000000004")
+    assert not has_card_issuer("1700000000004")
+    assert classify_value("1700000000004") is None
+
+
+def test_epoch_milliseconds_are_not_cards():
+    rng = random.Random(0)
+    values = [rng.randint(1_600_000_000_000, 1_800_000_000_000) for _ in range(10000)]
+    assert not any(classify_value(value) == "credit_card" for value in values)
+
+
+def test_tckn_checksum():
+    assert is_tckn_valid("10000000146")
+    assert not is_tckn_valid("10000000147")
+
+
+def test_checksum_classes_need_column_agreement():
+    # one checksum passing id among other ids goes to llm
+    values = ["10000000146"] + [str(10000000000 + index) for index in range(9)]
+    grouped, undecided = classify_values(values)
+    assert "tckn" not in grouped
+    assert len(undecided) == 10
+
+
+def test_random_ids_never_trusted_as_checksum_classes():
+    rng = random.Random(1)
+    for _ in range(1000):
+        values = [rng.randint(10 ** 18, 2 ** 63 - 1) for _ in range(10)]
+        grouped, _ = classify_values(values)
+        assert not grouped.keys() & {"credit_card", "tckn"}
+
+
+def test_agreeing_column_is_classified_locally():
+    values = ["4111111111111111", "5555555555554444", "378282246310005", "6011111111111117", None]
+    grouped, undecided = classify_values(values)
+    assert grouped == {"credit_card": values[:4]}
+    assert undecided == []
+
+
+def test_non_checksum_classes_do_not_need_agreement():
+    grouped, undecided = classify_values(["a@example.com", "istanbul", "ankara"])
+    assert grouped == {"email": ["a@example.com"]}
+    assert undecided == ["istanbul", "ankara"]
+
+
+def test_merge_keeps_class_order():
+    merged = merge_classifications({"email": ["a"]}, {"unknown": ["b"], "email": ["c"]})
+    assert list(merged) == ["email", "unknown"]
+    assert merged["email"] == ["a", "c"]
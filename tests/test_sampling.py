@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+from sqlalchemy.exc import DBAPIError
+
+from src.db.sampling import STATEMENT_TIMEOUT_QUERY, STATS_QUERY, ColumnSampler
+
+
+class QueryCanceled(Exception):
+    sqlstate = "57014"
+
+
+class UndefinedTable(Exception):
+    sqlstate = "42P01"
+
+
+class Result(list):
+    def all(self):
+        return list(self)
+
+
+class FakeMembershipSession:
+    """
+    :: Answers catalog stats query with stats_rows and sampling query with sample_rows
+    """
+
+    def __init__(self, stats_rows, sample_rows=(), sample_error=None):
+        self.stats_rows = stats_rows
+        self.sample_rows = sample_rows
+        self.sample_error = sample_error
+        self.timeouts = []
+        self.sample_queries = []
+
+    async def execute(self, statement, params=None):
+        if statement is STATEMENT_TIMEOUT_QUERY:
+            self.timeouts.append(params["timeout"])
+            return Result()
+        if statement is STATS_QUERY:
+            return Result(self.stats_rows)
+        self.sample_queries.append((str(statement), params))
+        if self.sample_error:
+            raise self.sample_error
+        return Result(self.sample_rows)
+
+
+def sample(session, column_names, count, **options):
+    sampler = ColumnSampler(timeout_ms=1500, **options)
+    return asyncio.run(sampler.sample(session, "users", column_names, count))
+
+
+def test_common_values_from_stats_skip_table_access():
+    session = FakeMembershipSession([
+        (500.0, "r", "email", ["a@example.com", "b@example.com", "c@example.com"]),
+        (500.0, "r", "city", ["Ankara", "Izmir"]),
+    ])
+    assert sample(session, ["email", "city"], 2) == {
+        "email": ["a@example.com", "b@example.com"],
+        "city": ["Ankara", "Izmir"],
+    }
+    assert session.timeouts == ["1500"]
+    assert session.sample_queries == []
+
+
+def test_columns_short_of_values_sampled_from_table():
+    session = FakeMembershipSession(
+        [(500.0, "r", "email", ["a@example.com"]), (500.0, "r", "city", ["Ankara", "Izmir"])],
+        sample_rows=[("a@example.com",), (None,), ("b@example.com",), ("c@example.com",)],
+    )
+    assert sample(session, ["email", "city"], 2) == {
+        "email": ["a@example.com", "b@example.com"],
+        "city": ["Ankara", "Izmir"],
+    }
+    (query, params), = session.sample_queries
+    # only the column without enough common values is read
+    assert '"email"' in query and '"city"' not in query
+    assert "TABLESAMPLE" not in query
+    assert params["limit"] == 10
+
+
+def test_table_without_stats_sampled_with_tablesample():
+    session = FakeMembershipSession(
+        [(5000000.0, "r", None, None)],
+        sample_rows=[("x" * 300, "1"), ("y", None)],
+    )
+    assert sample(session, ["note", "code"], 5, max_value_chars=100) == {
+        "note": ["x" * 100, "y"],
+        "code": ["1"],
+    }
+    (query, params), = session.sample_queries
+    assert "TABLESAMPLE BERNOULLI" in query
+    assert '"note" IS NOT NULL OR "code" IS NOT NULL' in query
+    assert params["max_chars"] == 100
+
+
+def test_sampling_timeout_keeps_values_from_stats():
+    session = FakeMembershipSession(
+        [(500.0, "r", "email", ["a@example.com"])],
+        sample_error=DBAPIError("SELECT", {}, QueryCanceled()),
+    )
+    assert sample(session, ["email", "city"], 3) == {"email": ["a@example.com"], "city": []}
+
+
+def test_other_sampling_errors_raised():
+    session = FakeMembershipSession([(500.0, "r", None, None)], sample_error=DBAPIError("SELECT", {}, UndefinedTable()))
+    with pytest.raises(DBAPIError):
+        sample(session, ["email"], 3)
+
+
+@pytest.mark.parametrize("reltuples, relkind, expected", [
+    (-1, "r", ""),
+    (1000, "r", ""),
+    (200000, "v", ""),
+    (200000, "r", "TABLESAMPLE BERNOULLI (0.100000)"),
+    (20000000, "m", "TABLESAMPLE SYSTEM (0.001000)"),
+])
+def test_sample_clause_by_table_size(reltuples, relkind, expected):
+    assert ColumnSampler()._sample_clause(reltuples, relkind, 100) == expected
@@ -0,0 +1,72 @@
+from src.db.schema_diff import diff_lines, diff_summary, diff_table_informations, structure_hashes
+
+
+def table(name, columns, structure_hash, schema="public"):
+    return {
+        "schema_name": schema,
+        "table_name": name,
+        "columns": [
+            {"name": column_name, "type": column_type, "nullable": nullable}
+            for column_name, column_type, nullable in columns
+        ],
+        "structure_hash": structure_hash,
+    }
+
+
+BASE = [
+    table("users", [("id", "integer", False), ("email", "text", True), ("legacy", "text", True)], "u1"),
+    table("orders", [("id", "integer", False)], "o1"),
+    table("events", [("id", "bigint", False)], "e1", schema="audit"),
+]
+TARGET = [
+    table("users", [("id", "bigint", False), ("email", "text", False), ("phone", "text", True)], "u2"),
+    table("orders", [("id", "integer", False)], "o1"),
+    table("logins", [("id", "bigint", False)], "l1", schema="audit"),
+]
+
+
+def test_added_removed_and_changed():
+    diff = diff_table_informations(BASE, TARGET)
+    assert diff["added_tables"] == ["audit.logins"]
+    assert diff["removed_tables"] == ["audit.events"]
+    assert diff["changed_tables"] == [{
+        "table": "users",
+        "added_columns": [{"name": "phone", "type": "text", "nullable": True}],
+        "removed_columns": ["legacy"],
+        "changed_columns": [
+            {"name": "id", "type": ["integer", "bigint"]},
+            {"name": "email", "nullable": [True, False]},
+        ],
+    }]
+
+
+def test_identical_metadata_has_no_changes():
+    diff = diff_table_informations(BASE, BASE)
+    assert diff == {"added_tables": [], "removed_tables": [], "changed_tables": []}
+
+
+def test_position_only_change_is_not_reported():
+    base = [table("t", [("a", "text", True), ("b", "text", True)], "h1")]
+    target = [table("t", [("b", "text", True), ("a", "text", True)], "h2")]
+    assert diff_table_informations(base, target)["changed_tables"] == []
+
+
+def test_legacy_items_without_hash_are_compared():
+    base = [{"table_name": "t", "columns": [{"name": "a", "type": "text", "nullable": True}]}]
+    target = [table("t", [("a", "integer", True)], "h")]
+    assert diff_table_informations(base, target)["changed_tables"][0]["changed_columns"] == [
+        {"name": "a", "type": ["text", "integer"]}
+    ]
+
+
+def test_summary_and_lines():
+    diff = diff_table_informations(BASE, TARGET)
+    assert diff_summary(diff) == {
+        "added_tables": 1, "removed_tables": 1, "changed_tables": 1,
+        "added_columns": 1, "removed_columns": 1, "changed_columns": 2,
+    }
+    assert [line["change"] for line in diff_lines(diff)] == ["added_table", "removed_table", "changed_table"]
+
+
+def test_structure_hashes():
+    assert structure_hashes(BASE) == {("public", "users"): "u1", ("public", "orders"): "o1", ("audit", "events"): "e1"}